@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Synthetic inputs for the benchmarks: bait x proteome accession TSVs, multi-entry FASTA files,
+and rank_af.py summary JSONs of the three modes. All data is derived from a seed, so the same
+scale always produces the same files.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+import tarfile
+from pathlib import Path
+from typing import List, Optional
+
+# Compressed summaries are written with the helpers rank_af.py reads them with
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "bin"))
+from compressed_io import COMPRESSION_SUFFIXES, add_compression, open_text  # noqa: E402
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+UNIPROT_PREFIXES = "OPQ"
+
+
+def uniprot_ids(count: int, seed: int = 0) -> List[str]:
+    """Return `count` unique accessions in the UniProt format (e.g. P12345)."""
+    rng = random.Random(seed)
+    ids = set()
+    while len(ids) < count:
+        ids.add(rng.choice(UNIPROT_PREFIXES) + str(rng.randint(0, 9))
+                + "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789") for _ in range(3))
+                + str(rng.randint(0, 9)))
+    return sorted(ids)
+
+
+def sequence(name: str, min_length: int = 100, max_length: int = 1000) -> str:
+    """Return a deterministic protein sequence for a name."""
+    rng = random.Random(hashlib.sha1(name.encode()).hexdigest())
+    return "".join(rng.choice(AMINO_ACIDS) for _ in range(rng.randint(min_length, max_length)))
+
+
+def write_fasta(path: Path, names: List[str]) -> None:
+    """Write a FASTA file with one deterministic sequence per name."""
+    with open(path, "w") as f:
+        for name in names:
+            seq = sequence(name)
+            f.write(f">{name}\n")
+            for i in range(0, len(seq), 80):
+                f.write(seq[i:i + 80] + "\n")
+
+
+def write_accessions(path: Path, baits: List[str], preys: List[str]) -> None:
+    """Write an accession TSV with bait and prey entries."""
+    with open(path, "w") as f:
+        f.write('"Entry"\t"bait"\n')
+        for entry in baits:
+            f.write(f'"{entry}"\t1\n')
+        for entry in preys:
+            f.write(f'"{entry}"\t0\n')
+
+
+def write_screen(out_dir: Path, num_baits: int, proteome: int, fasta_entries: int = 0, seed: int = 0) -> Path:
+    """Write a bait x proteome screen.
+
+    Baits and preys are UniProt accessions. With fasta_entries, a two chain FASTA bait and a
+    multi-entry FASTA prey file with that many entries are added.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    ids = uniprot_ids(num_baits + proteome, seed)
+    baits, preys = ids[:num_baits], ids[num_baits:]
+    if fasta_entries:
+        write_fasta(out_dir / "baits.fasta", ["bait_complex_A", "bait_complex_B"])
+        write_fasta(out_dir / "preys.fasta", [f"prey_{i}" for i in range(fasta_entries)])
+        baits = baits + [str(out_dir / "baits.fasta")]
+        preys = preys + [str(out_dir / "preys.fasta")]
+    path = out_dir / "acclist.tsv"
+    write_accessions(path, baits, preys)
+    return path
+
+
+def write_sequence_cache(path: Path, accessions: List[str]) -> None:
+    """Write a tsv2json.py --sequence-cache file with the sequences the UniProt stand-in serves."""
+    with open(path, "w") as f:
+        json.dump({accession: sequence(accession) for accession in accessions}, f)
+
+
+def write_summaries(out_dir: Path, mode: str, count: int, seed: int = 0, compression: Optional[str] = None) -> None:
+    """Write `count` summary JSONs in the file layout rank_af.py reads for a mode, optionally compressed."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    for i in range(count):
+        foldid = f"bait{i % 97}_prey{i}"
+        score = round(rng.random(), 4)
+        if mode == "alphafold3":
+            path = out_dir / f"{foldid}_summary_confidences.json"
+            data = {
+                "chain_iptm": [score, score],
+                "chain_pair_iptm": [[0.8, score], [score, 0.8]],
+                "chain_pair_pae_min": [[0.8, 30 * (1 - score)], [30 * (1 - score), 0.8]],
+                "chain_ptm": [0.8, 0.7],
+                "fraction_disordered": round(rng.random() * 0.3, 2),
+                "has_clash": 0.0,
+                "iptm": score,
+                "num_recycles": 10.0,
+                "ptm": round(0.5 + score / 2, 4),
+                "ranking_score": round(0.8 * score + 0.2 * rng.random(), 4),
+            }
+        elif mode == "boltz":
+            path = out_dir / f"confidence_{foldid}_model_0.json"
+            data = {
+                "confidence_score": round(0.8 * score + 0.2 * rng.random(), 4),
+                "ptm": round(0.5 + score / 2, 4),
+                "iptm": score,
+                "ligand_iptm": 0.0,
+                "protein_iptm": score,
+                "complex_plddt": round(0.5 + score / 2, 4),
+                "complex_iplddt": round(0.5 + score / 2, 4),
+                "complex_pde": round(2 - score, 4),
+                "complex_ipde": round(4 - score, 4),
+                "chains_ptm": {"0": 0.8, "1": 0.7},
+                "pair_chains_iptm": {"0": {"0": 0.8, "1": score}, "1": {"0": score, "1": 0.7}},
+            }
+        elif mode == "colabfold":
+            path = out_dir / f"{foldid}.json"
+            data = {"max_pae": 31.75, "ptm": round(0.5 + score / 2, 4), "iptm": score}
+        else:
+            raise ValueError(f"Unknown mode {mode}")
+        with open_text(add_compression(path, compression), "w") as f:
+            json.dump(data, f)
+
+
+def write_models(out_dir: Path, count: int, residues: int = 300, seed: int = 0) -> None:
+    """Write `count` two chain Alphafold3 mmCIF models (N, CA, C, O, CB per residue) in the folds layout.
+
+    Both chains are random walks starting next to each other, so the models have an interface.
+    """
+    rng = random.Random(seed)
+    header = ["group_PDB", "id", "type_symbol", "label_atom_id", "label_alt_id", "label_comp_id", "label_asym_id",
+              "label_entity_id", "label_seq_id", "pdbx_PDB_ins_code", "Cartn_x", "Cartn_y", "Cartn_z", "occupancy",
+              "B_iso_or_equiv", "auth_seq_id", "auth_asym_id", "pdbx_PDB_model_num"]
+    for i in range(count):
+        foldid = f"bait{i % 97}_prey{i}"
+        lines = [f"data_{foldid}", "#", "loop_"] + [f"_atom_site.{field}" for field in header]
+        atom_id = 0
+        for entity, (chain, start) in enumerate([("A", 0.0), ("B", 6.0)], 1):
+            x, y, z = start, 0.0, 0.0
+            for seq_id in range(1, residues + 1):
+                x, y, z = x + rng.uniform(-2.2, 2.2), y + rng.uniform(-2.2, 2.2), z + rng.uniform(-2.2, 2.2)
+                plddt = round(rng.uniform(30, 95), 2)
+                for atom, element in [("N", "N"), ("CA", "C"), ("C", "C"), ("O", "O"), ("CB", "C")]:
+                    atom_id += 1
+                    lines.append(f"ATOM {atom_id} {element} {atom} . ALA {chain} {entity} {seq_id} ? "
+                                 f"{x + rng.uniform(-1, 1):.3f} {y + rng.uniform(-1, 1):.3f} "
+                                 f"{z + rng.uniform(-1, 1):.3f} 1.00 {plddt} {seq_id} {chain} 1")
+        lines.append("#")
+        fold_dir = out_dir / foldid
+        fold_dir.mkdir(parents=True, exist_ok=True)
+        (fold_dir / f"{foldid}_model.cif").write_text("\n".join(lines) + "\n")
+
+
+def write_model_files(out_dir: Path, size_mb: float, num_mols: int = 100) -> None:
+    """Write stand-in Boltz downloads: ccd.pkl, mols.tar and the checkpoints."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(0)
+    size = int(size_mb * (1 << 20))
+    for name in ["ccd.pkl", "boltz1_conf.ckpt", "boltz2_conf.ckpt", "boltz2_aff.ckpt"]:
+        with open(out_dir / name, "wb") as f:
+            f.write(rng.randbytes(size))
+
+    mols_dir = out_dir / "mols"
+    mols_dir.mkdir(exist_ok=True)
+    for i in range(num_mols):
+        (mols_dir / f"M{i:04d}.pkl").write_bytes(rng.randbytes(2048))
+    with tarfile.open(out_dir / "mols.tar", "w") as tar:
+        tar.add(mols_dir, arcname="mols")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic benchmark inputs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    screen_parser = subparsers.add_parser("screen", help="Bait x proteome accession TSV")
+    screen_parser.add_argument("out_dir", help="Output directory")
+    screen_parser.add_argument("--baits", type=int, default=10, help="Number of UniProt baits (default: 10)")
+    screen_parser.add_argument("--proteome", type=int, default=1000, help="Number of UniProt preys (default: 1000)")
+    screen_parser.add_argument("--fasta-entries", type=int, default=0,
+                               help="Also add multi-entry bait/prey FASTA files with this many entries (default: 0)")
+    screen_parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+
+    summary_parser = subparsers.add_parser("summaries", help="Summary JSONs for rank_af.py")
+    summary_parser.add_argument("out_dir", help="Output directory")
+    summary_parser.add_argument("--mode", required=True, choices=["alphafold3", "boltz", "colabfold"])
+    summary_parser.add_argument("--count", type=int, default=1000, help="Number of JSON files (default: 1000)")
+    summary_parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    summary_parser.add_argument("--compress", choices=sorted(COMPRESSION_SUFFIXES),
+                                help="Write gzip (.gz) or zstd (.zst) compressed JSON files (default: off)")
+
+    model_parser = subparsers.add_parser("models", help="Two chain mmCIF models for interface_scores.py")
+    model_parser.add_argument("out_dir", help="Output directory")
+    model_parser.add_argument("--count", type=int, default=100, help="Number of models (default: 100)")
+    model_parser.add_argument("--residues", type=int, default=300, help="Residues per chain (default: 300)")
+    model_parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+
+    args = parser.parse_args()
+
+    if args.command == "screen":
+        path = write_screen(Path(args.out_dir), args.baits, args.proteome, args.fasta_entries, args.seed)
+        print(f"Wrote {path}")
+    elif args.command == "models":
+        write_models(Path(args.out_dir), args.count, args.residues, args.seed)
+        print(f"Wrote {args.count} models to {args.out_dir}")
+    else:
+        write_summaries(Path(args.out_dir), args.mode, args.count, args.seed, args.compress)
+        print(f"Wrote {args.count} {args.mode} summaries to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Benchmarks the Python tools of the pipeline on synthetic data.
+`run` generates a screen at the chosen scale, starts the local UniProt and model download
+stand-ins, and runs every stage as a subprocess, recording wall time, CPU time, throughput and
+peak RSS as JSON. `compare` reports the change between two such JSON files, e.g. of two commits.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+import generate
+import servers
+
+BIN_DIR = Path(__file__).resolve().parents[1] / "bin"
+MODES = ["alphafold3", "boltz", "colabfold"]
+# Interval of the peak RSS polling of a running stage
+HWM_POLL_SECONDS = 0.005
+
+# baits x proteome is the number of pairs written by tsv2json.py
+SCALES = {
+    "small": {"baits": 2, "proteome": 500, "fasta_entries": 5, "summaries": 1000, "prefetch": 200, "model_mb": 5,
+              "models": 50},
+    "medium": {"baits": 10, "proteome": 2000, "fasta_entries": 20, "summaries": 10000, "prefetch": 500,
+               "model_mb": 50, "models": 500},
+    "large": {"baits": 20, "proteome": 5000, "fasta_entries": 50, "summaries": 100000, "prefetch": 1000,
+              "model_mb": 200, "models": 2000},
+    "xlarge": {"baits": 50, "proteome": 20000, "fasta_entries": 100, "summaries": 1000000, "prefetch": 1000,
+               "model_mb": 500, "models": 10000},
+}
+
+
+class Stage:
+    """One benchmarked command. Its output paths are removed before every repeat.
+
+    items is the amount of work the throughput is reported for, or a callable that counts it
+    from the outputs of the last run. metrics is the --metrics JSON of tools that write one.
+    Stages shorter than the timer noise set a minimum number of repeats. The size on disk of
+    data (the files read or written) is reported to compare compressed and plain I/O.
+    """
+
+    def __init__(self, name: str, cmd: List[str], items: Union[int, Callable[[], int]], unit: str,
+                 outputs: List[Path], metrics: Optional[Path] = None, repeat: int = 1,
+                 data: Optional[Path] = None) -> None:
+        self.name = name
+        self.cmd = cmd + ["--metrics", str(metrics)] if metrics else cmd
+        self.items = items
+        self.unit = unit
+        self.outputs = outputs
+        self.metrics = metrics
+        self.repeat = repeat
+        self.data = data
+
+    def clean(self) -> None:
+        for path in self.outputs + ([self.metrics] if self.metrics else []):
+            if path.is_dir():
+                shutil.rmtree(path)
+            elif path.exists():
+                path.unlink()
+
+
+def read_hwm_mb(pid: int) -> Optional[float]:
+    """Return the memory high-water mark (VmHWM) of a running process in MB, None without /proc."""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def measure(cmd: List[str], cwd: Path, env: Dict[str, str], log_file: Path) -> Dict[str, float]:
+    """Run a command and return its wall time, CPU time, peak RSS and exit code.
+
+    ru_maxrss of a child starts out at the RSS of this process at fork time, so on Linux the
+    peak RSS is the VmHWM of the child, polled while it runs.
+    """
+    hwm = []
+    with open(log_file, "w") as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        stop = threading.Event()
+
+        def poll() -> None:
+            while not stop.is_set():
+                value = read_hwm_mb(proc.pid)
+                if value is not None:
+                    hwm.append(value)
+                stop.wait(HWM_POLL_SECONDS)
+
+        poller = threading.Thread(target=poll, daemon=True)
+        poller.start()
+        # wait4 returns the resource usage of this child alone
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - start
+        stop.set()
+        poller.join()
+    if hwm:
+        peak_rss = max(hwm)
+    else:
+        # ru_maxrss is in KB on Linux and in bytes on macOS
+        peak_rss = usage.ru_maxrss / (1 << 20) if sys.platform == "darwin" else usage.ru_maxrss / 1024
+    return {
+        "wall_s": wall,
+        "user_s": usage.ru_utime,
+        "sys_s": usage.ru_stime,
+        "peak_rss_mb": peak_rss,
+        "returncode": os.waitstatus_to_exitcode(status),
+    }
+
+
+def disk_mb(path: Path) -> float:
+    """Return the size of a file or of the files below a directory in MB."""
+    files = path.rglob("*") if path.is_dir() else [path]
+    return sum(file.stat().st_size for file in files if file.is_file()) / (1 << 20)
+
+
+def compressions() -> List[str]:
+    """Return the compressions the tools can use here, zstd needs the zstandard package."""
+    return ["gzip"] + (["zstd"] if importlib.util.find_spec("zstandard") else [])
+
+
+def git_commit() -> str:
+    """Return the current commit of the repository, marked if the tree has changes."""
+    repo = BIN_DIR.parent
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=repo, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=repo,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def startup_stages(data: Path, uniprot_url: str) -> List[Stage]:
+    """Stages for the cold start latency: the bare interpreter, importing each tool, and a run of
+    each tool on a screen small enough that startup dominates."""
+    python = sys.executable
+    startup = data / "startup"
+    screen = generate.write_screen(startup, 1, 5)
+    generate.write_sequence_cache(startup / "sequences.json", generate.uniprot_ids(6))
+    generate.write_summaries(startup / "summaries", "alphafold3", 10)
+
+    stages = [Stage("startup_python", [python, "-c", "pass"], 1, "runs", [], repeat=10)]
+    for tool in ["tsv2json", "rank_af"]:
+        stages.append(Stage(f"startup_import_{tool}",
+                            [python, "-c", f"import sys; sys.path.insert(0, {str(BIN_DIR)!r}); import {tool}"],
+                            1, "runs", [], repeat=10))
+    stages.append(Stage("startup_tsv2json",
+                        [python, str(BIN_DIR / "tsv2json.py"), "--sequence-cache", str(startup / "sequences.json"),
+                         "--uniprot-url", uniprot_url, "--output-dir", str(startup / "inputs"), str(screen)],
+                        1, "runs", [startup / "inputs"], repeat=10))
+    stages.append(Stage("startup_rank_af",
+                        [python, str(BIN_DIR / "rank_af.py"), "--input-dir", str(startup / "summaries"), "--mode",
+                         "alphafold3", "--output", str(startup / "ranked_results.tsv")],
+                        1, "runs", [startup / "ranked_results.tsv"], repeat=10))
+    return stages
+
+
+def build_stages(data: Path, scale: Dict[str, int], uniprot_url: str, files_url: str) -> List[Stage]:
+    """Generate the inputs of every stage and return the stages."""
+    python = sys.executable
+    screen = generate.write_screen(data / "screen", scale["baits"], scale["proteome"], scale["fasta_entries"])
+    accessions = generate.uniprot_ids(scale["baits"] + scale["proteome"])
+    generate.write_sequence_cache(data / "sequences.json", accessions)
+
+    # Prefetching goes through the UniProt stand-in, including the pause between batches
+    prefetch_ids = accessions[:scale["prefetch"]]
+    generate.write_accessions(data / "prefetch.tsv", prefetch_ids[:1], prefetch_ids[1:])
+
+    stages = startup_stages(data, uniprot_url)
+    stages.append(Stage("tsv2json_prefetch",
+                    [python, str(BIN_DIR / "tsv2json.py"), "--prefetch-only", "--uniprot-url", uniprot_url,
+                     "--sequence-cache", str(data / "prefetched.json"), str(data / "prefetch.tsv")],
+                    len(prefetch_ids), "sequences", [data / "prefetched.json"],
+                    data / "tsv2json_prefetch.metrics.json"))
+
+    for mode in MODES:
+        out_dir = data / f"tsv2json_{mode}"
+        stages.append(Stage(f"tsv2json_{mode}",
+                            [python, str(BIN_DIR / "tsv2json.py"), "--mode", mode, "--sequence-cache",
+                             str(data / "sequences.json"), "--uniprot-url", uniprot_url,
+                             "--output-dir", str(out_dir), str(screen)],
+                            lambda out_dir=out_dir: len(list(out_dir.iterdir())), "inputs", [out_dir],
+                            data / f"tsv2json_{mode}.metrics.json", data=out_dir))
+
+    # Compressed outputs, compared with the plain tsv2json_alphafold3 stage
+    for compression in compressions():
+        out_dir = data / f"tsv2json_alphafold3_{compression}"
+        stages.append(Stage(f"tsv2json_alphafold3_{compression}",
+                            [python, str(BIN_DIR / "tsv2json.py"), "--mode", "alphafold3", "--sequence-cache",
+                             str(data / "sequences.json"), "--uniprot-url", uniprot_url, "--compress", compression,
+                             "--output-dir", str(out_dir), str(screen)],
+                            lambda out_dir=out_dir: len(list(out_dir.iterdir())), "inputs", [out_dir],
+                            data / f"tsv2json_alphafold3_{compression}.metrics.json", data=out_dir))
+
+    for mode in MODES:
+        summaries = data / f"summaries_{mode}"
+        generate.write_summaries(summaries, mode, scale["summaries"])
+        output = data / f"{mode}_ranked_results.tsv"
+        stages.append(Stage(f"rank_af_{mode}",
+                            [python, str(BIN_DIR / "rank_af.py"), "--input-dir", str(summaries), "--mode", mode,
+                             "--output", str(output)],
+                            scale["summaries"], "files", [output], data / f"rank_af_{mode}.metrics.json",
+                            data=summaries))
+
+    # Compressed summaries and ranked TSV, compared with the plain rank_af_alphafold3 stage
+    for compression in compressions():
+        summaries = data / f"summaries_alphafold3_{compression}"
+        generate.write_summaries(summaries, "alphafold3", scale["summaries"], compression=compression)
+        output = generate.add_compression(data / f"alphafold3_{compression}_ranked_results.tsv", compression)
+        stages.append(Stage(f"rank_af_alphafold3_{compression}",
+                            [python, str(BIN_DIR / "rank_af.py"), "--input-dir", str(summaries), "--mode",
+                             "alphafold3", "--output", str(output)],
+                            scale["summaries"], "files", [output],
+                            data / f"rank_af_alphafold3_{compression}.metrics.json", data=summaries))
+
+    # One worker, so the throughput is that of the parsing and contact search on one core
+    models = data / "models_alphafold3"
+    generate.write_models(models, scale["models"])
+    stages.append(Stage("interface_scores_alphafold3",
+                        [python, str(BIN_DIR / "interface_scores.py"), "--input-dir", str(models), "--mode",
+                         "alphafold3", "--workers", "1", "--output", str(data / "interface_scores.tsv")],
+                        scale["models"], "models", [data / "interface_scores.tsv"], data=models))
+
+    generate.write_model_files(data / "model_files", scale["model_mb"])
+    for model, files in [("boltz1", ["ccd.pkl", "boltz1_conf.ckpt"]),
+                         ("boltz2", ["mols.tar", "boltz2_conf.ckpt", "boltz2_aff.ckpt"])]:
+        cache = data / f"cache_{model}"
+        size_mb = sum((data / "model_files" / name).stat().st_size for name in files) / (1 << 20)
+        stages.append(Stage(f"prepare_boltz_cache_{model}",
+                            [python, str(BIN_DIR / "prepare_boltz_cache.py"), str(cache), model,
+                             "--mirror", files_url],
+                            round(size_mb), "MB", [cache]))
+    return stages
+
+
+def run(args: argparse.Namespace) -> None:
+    scale = dict(SCALES[args.scale])
+    for key in ["baits", "proteome", "summaries"]:
+        if getattr(args, key) is not None:
+            scale[key] = getattr(args, key)
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="proteinfold_bench_"))
+    data = workdir / "data"
+    data.mkdir(parents=True, exist_ok=True)
+
+    uniprot = servers.start_uniprot()
+    files = servers.start_files(str(data / "model_files"))
+    env = dict(os.environ, NO_PROXY="127.0.0.1,localhost", no_proxy="127.0.0.1,localhost")
+
+    print(f"Generating {args.scale} inputs in {data}")
+    stages = build_stages(data, scale, servers.url(uniprot), servers.url(files))
+    if args.stages:
+        stages = [stage for stage in stages if any(stage.name.startswith(name) for name in args.stages)]
+
+    results = {}
+    for stage in stages:
+        runs = []
+        for _ in range(max(args.repeat, stage.repeat)):
+            stage.clean()
+            result = measure(stage.cmd, workdir, env, workdir / f"{stage.name}.log")
+            if stage.metrics and stage.metrics.exists():
+                # The peak RSS a tool reports for itself also covers a peak after the last poll
+                with open(stage.metrics) as f:
+                    result["peak_rss_mb"] = json.load(f).get("peak_rss_mb", result["peak_rss_mb"])
+            runs.append(result)
+        failed = [result for result in runs if result["returncode"] != 0]
+        wall = statistics.median(result["wall_s"] for result in runs)
+        if callable(stage.items):
+            items = 0 if failed else stage.items()
+        else:
+            items = stage.items
+        results[stage.name] = {
+            "items": items,
+            "unit": stage.unit,
+            "wall_s": wall,
+            "wall_runs": [result["wall_s"] for result in runs],
+            "user_s": statistics.median(result["user_s"] for result in runs),
+            "sys_s": statistics.median(result["sys_s"] for result in runs),
+            "peak_rss_mb": max(result["peak_rss_mb"] for result in runs),
+            "throughput": items / wall if wall else None,
+            "returncode": failed[0]["returncode"] if failed else 0,
+        }
+        if stage.data and stage.data.exists():
+            results[stage.name]["data_mb"] = disk_mb(stage.data)
+        if stage.metrics and stage.metrics.exists():
+            # Phase timings and counters of the last run
+            with open(stage.metrics) as f:
+                metrics = json.load(f)
+            results[stage.name]["phases"] = metrics["phases"]
+            results[stage.name]["counters"] = metrics["counters"]
+        status = f"FAILED ({workdir / f'{stage.name}.log'})" if failed else "ok"
+        data_mb = f"{results[stage.name]['data_mb']:8.1f} MB on disk" if "data_mb" in results[stage.name] else ""
+        print(f"{stage.name:32s} {wall:8.2f} s {items / wall:12.1f} {stage.unit}/s "
+              f"{results[stage.name]['peak_rss_mb']:8.1f} MB {data_mb:>19s}  {status}")
+
+    uniprot.shutdown()
+    files.shutdown()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": {"name": args.scale, **scale},
+        "repeat": args.repeat,
+        "stages": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if not args.keep:
+        shutil.rmtree(workdir)
+    if any(result["returncode"] for result in results.values()):
+        sys.exit(1)
+
+
+def compare(args: argparse.Namespace) -> None:
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    changed = sorted(key for key in set(base["scale"]) | set(new["scale"])
+                     if base["scale"].get(key) != new["scale"].get(key))
+    if changed:
+        print(f"Warning: scales differ in {', '.join(changed)}, comparing throughput instead of wall time")
+
+    print(f"{'stage':32s} {base['commit']:>12s} {new['commit']:>12s} {'ratio':>7s} "
+          f"{'rss base':>9s} {'rss new':>9s}")
+    regressions = []
+    for name, new_stage in new["stages"].items():
+        base_stage = base["stages"].get(name)
+        if base_stage is None:
+            print(f"{name:32s} {'-':>12s} {new_stage['wall_s']:11.2f}s")
+            continue
+        # Ratio of the time per item, above 1 is slower
+        if base_stage["throughput"] and new_stage["throughput"]:
+            ratio = base_stage["throughput"] / new_stage["throughput"]
+        else:
+            ratio = new_stage["wall_s"] / base_stage["wall_s"] if base_stage["wall_s"] else float("inf")
+        flag = ""
+        if ratio > 1 + args.threshold:
+            flag = "slower"
+            regressions.append(name)
+        elif ratio < 1 - args.threshold:
+            flag = "faster"
+        print(f"{name:32s} {base_stage['wall_s']:11.2f}s {new_stage['wall_s']:11.2f}s {ratio:7.2f} "
+              f"{base_stage['peak_rss_mb']:8.1f}M {new_stage['peak_rss_mb']:8.1f}M {flag}")
+
+    if regressions and args.fail_on_regression:
+        print(f"Regressions beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline's Python tools on synthetic data")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmark stages")
+    run_parser.add_argument("--scale", choices=SCALES, default="small", help="Input size preset (default: small)")
+    run_parser.add_argument("--baits", type=int, help="Override the number of UniProt baits")
+    run_parser.add_argument("--proteome", type=int, help="Override the number of UniProt preys")
+    run_parser.add_argument("--summaries", type=int, help="Override the number of summary JSONs per mode")
+    run_parser.add_argument("--stages", nargs="+", help="Only run stages starting with these names, e.g. rank_af")
+    run_parser.add_argument("--repeat", type=int, default=1, help="Runs per stage, the median is reported (default: 1)")
+    run_parser.add_argument("--workdir", help="Directory for the generated data (default: a temporary directory)")
+    run_parser.add_argument("--keep", action="store_true", help="Keep the generated data and stage logs")
+    run_parser.add_argument("--output", "-o", default="benchmark.json", help="Output JSON (default: benchmark.json)")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two benchmark JSON files")
+    compare_parser.add_argument("base", help="Baseline benchmark JSON")
+    compare_parser.add_argument("new", help="New benchmark JSON")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="Relative change of the time per item reported as slower/faster (default: 0.1)")
+    compare_parser.add_argument("--fail-on-regression", action="store_true",
+                                help="Exit with an error if a stage got slower than the threshold")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run(args)
+    else:
+        compare(args)
+
+
+if __name__ == "__main__":
+    main()
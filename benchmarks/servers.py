@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the HTTP services the tools download from, so benchmarks measure the
+tools and not the network: a UniProt REST server that answers accession queries with
+deterministic sequences, a ColabFold MSA server, and a file server for the Boltz model downloads.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import re
+import tarfile
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, parse_qsl, urlparse
+
+from generate import sequence
+
+ACCESSION_RE = re.compile(r"accession:(\w+)")
+
+
+class UniProtHandler(BaseHTTPRequestHandler):
+    """Answers /uniprotkb/stream?query=accession:X OR accession:Y&format=fasta."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/uniprotkb/stream":
+            self.send_error(404)
+            return
+        query = parse_qs(url.query).get("query", [""])[0]
+        body = []
+        for accession in ACCESSION_RE.findall(query):
+            body.append(f">sp|{accession}|{accession}_BENCH Benchmark protein OS=Synthetic\n")
+            seq = sequence(accession)
+            body += [seq[i:i + 60] + "\n" for i in range(0, len(seq), 60)]
+        data = "".join(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MSAServerHandler(BaseHTTPRequestHandler):
+    """Answers the ColabFold MSA server API (ticket/msa, ticket/pair, ticket/<id>, result/download/<id>).
+
+    Jobs complete `delay` seconds after their submission. Results hold one a3m block per query
+    sequence with a deterministic hit, like the real server. The submitted queries are
+    recorded in `submissions`.
+    """
+
+    delay = 0.1
+    lock = threading.Lock()
+    submissions: List[Tuple[str, str]] = []
+    jobs: Dict[str, Tuple[float, str]] = {}
+
+    def send_json(self, payload: dict) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = dict(parse_qsl(self.rfile.read(length).decode()))
+        endpoint = self.path.strip("/")
+        ticket = hashlib.sha1(f"{endpoint}\0{form.get('q', '')}\0{time.time()}".encode()).hexdigest()
+        with self.lock:
+            self.submissions.append((endpoint, form.get("q", "")))
+            self.jobs[ticket] = (time.time() + self.delay, form.get("q", ""))
+        self.send_json({"id": ticket, "status": "PENDING"})
+
+    def do_GET(self):
+        path = self.path.strip("/")
+        ticket = path.rsplit("/", 1)[-1]
+        with self.lock:
+            job = self.jobs.get(ticket)
+        if job is None:
+            self.send_json({"id": ticket, "status": "UNKNOWN"})
+        elif path.startswith("ticket/"):
+            self.send_json({"id": ticket, "status": "COMPLETE" if time.time() >= job[0] else "RUNNING"})
+        elif path.startswith("result/download/"):
+            data = self.result(job[1])
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self.send_error(404)
+
+    @staticmethod
+    def result(query: str) -> bytes:
+        """Return the result archive of a query: uniref.a3m and pdb70.m8 with one entry per sequence."""
+        entries = re.findall(r">(\S+)\n([A-Z]+)", query)
+        a3m = "".join(f">{seq_id}\n{seq}\n>hit_{hashlib.sha1(seq.encode()).hexdigest()[:8]}\n{seq[::-1]}\n\x00"
+                      for seq_id, seq in entries)
+        m8 = "".join(f"{seq_id}\t1abc_A\t0.9\t{len(seq)}\n" for seq_id, seq in entries)
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+            for name, text in [("uniref.a3m", a3m), ("pdb70.m8", m8)]:
+                info = tarfile.TarInfo(name)
+                info.size = len(text.encode())
+                tar.addfile(info, io.BytesIO(text.encode()))
+        return buffer.getvalue()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietFileHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(handler) -> ThreadingHTTPServer:
+    """Start a server on a free localhost port in a daemon thread."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_uniprot() -> ThreadingHTTPServer:
+    return start_server(UniProtHandler)
+
+
+def start_msa_server(delay: float = 0.1) -> ThreadingHTTPServer:
+    handler = type("MSAServer", (MSAServerHandler,), {"delay": delay, "lock": threading.Lock(),
+                                                     "submissions": [], "jobs": {}})
+    return start_server(handler)
+
+
+def start_files(directory: str) -> ThreadingHTTPServer:
+    return start_server(partial(QuietFileHandler, directory=directory))
+
+
+def url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark stand-in servers in the foreground")
+    parser.add_argument("--files", help="Also serve this directory, e.g. Boltz model files")
+    args = parser.parse_args()
+
+    uniprot = start_uniprot()
+    print(f"UniProt stand-in: {url(uniprot)}")
+    print(f"MSA server stand-in: {url(start_msa_server())}")
+    if args.files:
+        print(f"File server: {url(start_files(args.files))}")
+    threading.Event().wait()
+
+
+if __name__ == "__main__":
+    main()
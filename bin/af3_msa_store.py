@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Deduplicates the MSA and template blocks of Alphafold3 *_data.json files.
+Each unpairedMsa, pairedMsa and templates block is written once to a content-addressed
+store and the data JSON is replaced by a small manifest that references the blocks.
+Manifests can be rehydrated back to the full *_data.json files on demand.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, IO, List, Tuple, Union
+
+# Fields of a polymer chain that are moved to the block store
+TEXT_BLOCK_FIELDS = ["unpairedMsa", "pairedMsa"]
+JSON_BLOCK_FIELDS = ["templates"]
+BLOCK_KEY = "$block"
+MANIFEST_SUFFIX = ".manifest.json"
+CHUNK_SIZE = 1 << 20
+
+
+class MSAStore:
+    def __init__(self, store_dir: Union[str, Path]) -> None:
+        self.store_dir = Path(store_dir)
+        self.blocks_dir = self.store_dir / "blocks"
+        self.blocks_dir.mkdir(parents=True, exist_ok=True)
+
+    def block_path(self, digest: str) -> Path:
+        """Return the path of a block, sharded by the first two hex characters."""
+        return self.blocks_dir / digest[:2] / digest
+
+    def put(self, content: str) -> Tuple[str, int]:
+        """Store a block if it is not present yet.
+
+        Returns:
+            Tuple of (sha256 digest, number of bytes newly written to the store)
+        """
+        data = content.encode()
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.block_path(digest)
+        if path.exists():
+            return digest, 0
+
+        path.parent.mkdir(exist_ok=True)
+        # Write to a temporary file first so concurrent packers never see partial blocks
+        tmp_path = path.with_name(f".{digest}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return digest, len(data)
+
+    def pack(self, data_json: Union[str, Path], manifest_dir: Union[str, Path]) -> Dict[str, int]:
+        """Move the blocks of one *_data.json file to the store and write its manifest."""
+        data_json = Path(data_json)
+        with open(data_json, "r") as f:
+            data = json.load(f)
+
+        stored_bytes = 0
+        num_blocks = 0
+        for entry in data.get("sequences", []):
+            for chain in entry.values():
+                if not isinstance(chain, dict):
+                    continue
+                for field in TEXT_BLOCK_FIELDS + JSON_BLOCK_FIELDS:
+                    value = chain.get(field)
+                    if value is None or (isinstance(value, dict) and BLOCK_KEY in value):
+                        continue
+                    if field in JSON_BLOCK_FIELDS:
+                        content = json.dumps(value, separators=(",", ":"))
+                    else:
+                        content = value
+                    digest, written = self.put(content)
+                    chain[field] = {BLOCK_KEY: digest, "json": field in JSON_BLOCK_FIELDS}
+                    stored_bytes += written
+                    num_blocks += 1
+
+        manifest = {"source": data_json.name, "data": data}
+        manifest_path = Path(manifest_dir) / (data_json.name.removesuffix(".json") + MANIFEST_SUFFIX)
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, separators=(",", ":"))
+
+        return {
+            "original_bytes": data_json.stat().st_size,
+            "stored_bytes": stored_bytes,
+            "manifest_bytes": manifest_path.stat().st_size,
+            "blocks": num_blocks,
+        }
+
+    def rehydrate(self, manifest_file: Union[str, Path], output_dir: Union[str, Path]) -> Path:
+        """Write the full *_data.json file described by a manifest.
+
+        Blocks are streamed from the store in chunks, so the large MSA strings are never
+        held in memory as a whole.
+        """
+        with open(manifest_file, "r") as f:
+            manifest = json.load(f)
+
+        output_path = Path(output_dir) / manifest["source"]
+        with open(output_path, "w") as out:
+            self._write_json(manifest["data"], out)
+        return output_path
+
+    def _write_json(self, obj: Any, out: IO[str]) -> None:
+        """Serialize obj to out, expanding block references from the store."""
+        if isinstance(obj, dict) and BLOCK_KEY in obj:
+            self._write_block(obj[BLOCK_KEY], obj.get("json", False), out)
+        elif isinstance(obj, dict):
+            out.write("{")
+            for i, (key, value) in enumerate(obj.items()):
+                if i:
+                    out.write(", ")
+                out.write(json.dumps(key) + ": ")
+                self._write_json(value, out)
+            out.write("}")
+        elif isinstance(obj, list):
+            out.write("[")
+            for i, value in enumerate(obj):
+                if i:
+                    out.write(", ")
+                self._write_json(value, out)
+            out.write("]")
+        else:
+            out.write(json.dumps(obj))
+
+    def _write_block(self, digest: str, is_json: bool, out: IO[str]) -> None:
+        """Copy a block to out, either verbatim (JSON blocks) or as an escaped JSON string."""
+        path = self.block_path(digest)
+        if not path.exists():
+            raise FileNotFoundError(f"Block {digest} is missing from store {self.store_dir}")
+
+        with open(path, "r", newline="") as f:
+            if not is_json:
+                out.write('"')
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                # Escaping is per character, so chunks can be escaped independently
+                out.write(chunk if is_json else json.dumps(chunk)[1:-1])
+            if not is_json:
+                out.write('"')
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of blocks and bytes held by the store."""
+        blocks = [p for p in self.blocks_dir.glob("*/*") if not p.name.startswith(".")]
+        return {"blocks": len(blocks), "bytes": sum(p.stat().st_size for p in blocks)}
+
+
+def format_bytes(num_bytes: float) -> str:
+    """Format a byte count for log output."""
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(num_bytes) < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+
+def pack_files(store: MSAStore, data_jsons: List[str], manifest_dir: str, remove: bool) -> None:
+    """Pack a list of *_data.json files and report the space saved."""
+    Path(manifest_dir).mkdir(parents=True, exist_ok=True)
+
+    totals = {"original_bytes": 0, "stored_bytes": 0, "manifest_bytes": 0, "blocks": 0}
+    for data_json in data_jsons:
+        try:
+            result = store.pack(data_json, manifest_dir)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Error packing {data_json}: {e}")
+            continue
+        for key, value in result.items():
+            totals[key] += value
+        if remove:
+            os.remove(data_json)
+
+    packed = totals["stored_bytes"] + totals["manifest_bytes"]
+    saved = totals["original_bytes"] - packed
+    print(f"Packed {len(data_jsons)} files with {totals['blocks']} blocks")
+    print(f"Original size : {format_bytes(totals['original_bytes'])}")
+    print(f"New blocks    : {format_bytes(totals['stored_bytes'])}")
+    print(f"Manifests     : {format_bytes(totals['manifest_bytes'])}")
+    if totals["original_bytes"]:
+        print(f"Saved         : {format_bytes(saved)} ({100 * saved / totals['original_bytes']:.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Deduplicate MSA/template blocks of Alphafold3 *_data.json files"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pack_parser = subparsers.add_parser("pack", help="Move blocks to the store and write manifests")
+    pack_parser.add_argument("store", help="Block store directory")
+    pack_parser.add_argument("data_json", nargs="+", help="Alphafold3 *_data.json files")
+    pack_parser.add_argument(
+        "--manifest-dir", "-m", default=".", help="Output directory for manifests (default: .)"
+    )
+    pack_parser.add_argument(
+        "--remove", action="store_true", help="Remove the original files after packing"
+    )
+
+    unpack_parser = subparsers.add_parser("unpack", help="Rehydrate *_data.json files from manifests")
+    unpack_parser.add_argument("store", help="Block store directory")
+    unpack_parser.add_argument("manifests", nargs="+", help="Manifest files written by pack")
+    unpack_parser.add_argument(
+        "--output-dir", "-o", default=".", help="Output directory for *_data.json files (default: .)"
+    )
+
+    stats_parser = subparsers.add_parser("stats", help="Report the size of the store")
+    stats_parser.add_argument("store", help="Block store directory")
+
+    args = parser.parse_args()
+
+    if args.command != "pack" and not os.path.isdir(args.store):
+        print(f"Error: Store directory '{args.store}' does not exist")
+        sys.exit(1)
+
+    store = MSAStore(args.store)
+
+    if args.command == "pack":
+        pack_files(store, args.data_json, args.manifest_dir, args.remove)
+    elif args.command == "unpack":
+        Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+        for manifest in args.manifests:
+            output_path = store.rehydrate(manifest, args.output_dir)
+            print(f"Wrote {output_path}")
+    elif args.command == "stats":
+        stats = store.stats()
+        print(f"{stats['blocks']} blocks, {format_bytes(stats['bytes'])}")
+
+
+if __name__ == "__main__":
+    main()
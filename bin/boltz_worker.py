@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Long-lived Boltz worker that loads the model once and consumes a queue of input FASTA
+files (as written by tsv2json.py --mode boltz), writing results to the usual
+folds/predictions layout.
+
+Jobs are claimed from <queue>/pending by an atomic rename into <queue>/running/<worker>,
+so several workers can share one queue directory. The outputs of a finished job are copied
+to <queue>/folds and the job is recorded in the ledger of its worker (<queue>/claimed)
+before it moves to done, so a restarted worker can emit the jobs an earlier attempt finished.
+The stub backend writes deterministic scores and CA/CB models without model weights, to run
+and test the worker on a CPU.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+QUEUE_DIRS = ["pending", "running", "done", "failed", "claimed", "folds/predictions"]
+CLAIMED_HEADERS = ["foldid", "status", "input"]
+
+THREE_LETTER = {
+    "A": "ALA", "R": "ARG", "N": "ASN", "D": "ASP", "C": "CYS", "Q": "GLN", "E": "GLU", "G": "GLY",
+    "H": "HIS", "I": "ILE", "L": "LEU", "K": "LYS", "M": "MET", "F": "PHE", "P": "PRO", "S": "SER",
+    "T": "THR", "W": "TRP", "Y": "TYR", "V": "VAL",
+}
+
+
+class JobQueue:
+    def __init__(self, queue_dir: str) -> None:
+        self.queue_dir = Path(queue_dir)
+        self.create()
+
+    def create(self) -> None:
+        for name in QUEUE_DIRS:
+            (self.queue_dir / name).mkdir(parents=True, exist_ok=True)
+
+    def reset(self) -> None:
+        """Remove the jobs, outputs and ledgers of an earlier run."""
+        for name in QUEUE_DIRS:
+            shutil.rmtree(self.queue_dir / name.split("/")[0], ignore_errors=True)
+        self.create()
+
+    def enqueue(self, fasta_files: List[str]) -> int:
+        """Copy input files to the queue, renaming them into place so workers never see partial files."""
+        pending = self.queue_dir / "pending"
+        for fasta in fasta_files:
+            tmp_path = pending / f".{Path(fasta).name}.{os.getpid()}.tmp"
+            shutil.copyfile(fasta, tmp_path)
+            os.replace(tmp_path, pending / Path(fasta).name)
+        return len(fasta_files)
+
+    def claim(self, worker_id: str, batch_size: int) -> List[Path]:
+        """Claim up to batch_size pending jobs. A rename fails if another worker got there first."""
+        running = self.queue_dir / "running" / worker_id
+        running.mkdir(exist_ok=True)
+        claimed = []
+        for path in sorted((self.queue_dir / "pending").glob("*.fasta")):
+            try:
+                os.rename(path, running / path.name)
+            except FileNotFoundError:
+                continue
+            claimed.append(running / path.name)
+            if len(claimed) == batch_size:
+                break
+        return claimed
+
+    def publish(self, out_dir: Path, foldid: str) -> None:
+        """Copy the outputs of a finished job to the shared folds directory of the queue."""
+        target = self.queue_dir / "folds" / "predictions" / foldid
+        tmp_path = target.with_name(f".{foldid}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        shutil.copytree(out_dir / "predictions" / foldid, tmp_path)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp_path, target)
+
+    def finish(self, worker_id: str, paths: List[Path], ok: bool) -> None:
+        """Record the jobs in the ledger of the worker, then move them out of running/."""
+        status = "done" if ok else "failed"
+        with open(self.queue_dir / "claimed" / f"{worker_id}.tsv", "a") as f:
+            for path in paths:
+                f.write(f"{path.stem}\t{status}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        for path in paths:
+            os.replace(path, self.queue_dir / status / path.name)
+
+    def ledger(self, worker_id: str) -> Dict[str, str]:
+        """Return the status of every job the worker finished, by foldid."""
+        ledger = {}
+        path = self.queue_dir / "claimed" / f"{worker_id}.tsv"
+        if path.exists():
+            with open(path, "r") as f:
+                for line in f:
+                    foldid, status = line.rstrip("\n").split("\t")
+                    ledger[foldid] = status
+        return ledger
+
+    def recover(self, worker_id: str) -> int:
+        """Return the jobs a previous run of this worker left in running/ to the queue.
+
+        A job is recorded in the ledger before it leaves running/, so entries of jobs still
+        running were never finished and are dropped.
+        """
+        running = self.queue_dir / "running" / worker_id
+        stale = list(running.glob("*.fasta")) if running.exists() else []
+        if stale:
+            ledger = self.ledger(worker_id)
+            for path in stale:
+                ledger.pop(path.stem, None)
+            with open(self.queue_dir / "claimed" / f"{worker_id}.tsv", "w") as f:
+                f.writelines(f"{foldid}\t{status}\n" for foldid, status in ledger.items())
+        for path in stale:
+            os.replace(path, self.queue_dir / "pending" / path.name)
+        return len(stale)
+
+    def restore(self, worker_id: str, out_dir: Path) -> List[Path]:
+        """Copy the shared outputs of jobs an earlier attempt of this worker finished into out_dir."""
+        restored = []
+        for foldid, status in self.ledger(worker_id).items():
+            target = out_dir / "predictions" / foldid
+            if status != "done" or target.exists():
+                continue
+            shutil.copytree(self.queue_dir / "folds" / "predictions" / foldid, target)
+            restored.append(self.queue_dir / "done" / f"{foldid}.fasta")
+        return restored
+
+    def copy_failed(self, worker_id: str, failed_dir: Path) -> int:
+        """Copy the inputs of the jobs the worker failed to failed_dir."""
+        failed_dir.mkdir(parents=True, exist_ok=True)
+        failed = [foldid for foldid, status in self.ledger(worker_id).items() if status == "failed"]
+        for foldid in failed:
+            shutil.copyfile(self.queue_dir / "failed" / f"{foldid}.fasta", failed_dir / f"{foldid}.fasta")
+        return len(failed)
+
+    def counts(self) -> Dict[str, int]:
+        counts = {name: len(list((self.queue_dir / name).glob("*.fasta"))) for name in ["pending", "done", "failed"]}
+        counts["running"] = len(list((self.queue_dir / "running").glob("*/*.fasta")))
+        return counts
+
+
+class ClaimedLog:
+    """
+    Jobs of one worker run, appended as they are claimed and finished, so a killed run still
+    lists the jobs it was predicting. The last row of a job holds its status: running, done,
+    failed or restored (finished by an earlier run of the worker).
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with open(path, "w") as f:
+            f.write("\t".join(CLAIMED_HEADERS) + "\n")
+
+    def add(self, paths: List[Path], status: str) -> None:
+        with open(self.path, "a") as f:
+            for path in paths:
+                f.write(f"{path.stem}\t{status}\t{path.resolve()}\n")
+
+
+def read_boltz_fasta(path: Path) -> List[Tuple[str, str, str]]:
+    """Read (chain id, entity type, sequence) records of a Boltz FASTA file."""
+    records = []
+    header, sequence = None, []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith(">"):
+                if header is not None:
+                    records.append((*header, "".join(sequence)))
+                parts = line[1:].split("|")
+                header, sequence = (parts[0], parts[1] if len(parts) > 1 else "protein"), []
+            elif line:
+                sequence.append(line)
+    if header is not None:
+        records.append((*header, "".join(sequence)))
+    return records
+
+
+class StubBackend:
+    """CPU stand-in for Boltz with deterministic outputs, for testing the worker and the pipeline."""
+
+    def __init__(self, load_seconds: float = 0.0) -> None:
+        # Simulates loading the model weights once per worker
+        time.sleep(load_seconds)
+
+    def predict(self, fasta_files: List[Path], out_dir: Path) -> Dict[Path, bool]:
+        results = {}
+        for fasta in fasta_files:
+            foldid = fasta.stem
+            records = read_boltz_fasta(fasta)
+            digest = hashlib.sha256("".join(seq for _, _, seq in records).encode()).digest()
+            score = digest[0] / 255
+
+            prediction_dir = out_dir / "predictions" / foldid
+            prediction_dir.mkdir(parents=True, exist_ok=True)
+            confidence = {
+                "confidence_score": round(score, 4),
+                "ptm": round(score, 4),
+                "iptm": round(score, 4),
+                "ligand_iptm": 0.0,
+                "protein_iptm": round(score, 4),
+                "complex_plddt": round(0.5 + score / 2, 4),
+                "complex_iplddt": round(0.5 + score / 2, 4),
+                "complex_pde": round(2 - score, 4),
+                "complex_ipde": round(4 - score, 4),
+            }
+            with open(prediction_dir / f"confidence_{foldid}_model_0.json", "w") as f:
+                json.dump(confidence, f, indent=4)
+            self.write_model(records, prediction_dir / f"{foldid}_model_0.cif", 100 * confidence["complex_plddt"])
+            results[fasta] = True
+        return results
+
+    @staticmethod
+    def write_model(records: List[Tuple[str, str, str]], path: Path, plddt: float) -> None:
+        """Write straight, parallel chains 6 Å apart with CA (and CB) atoms."""
+        lines = ["data_stub", "loop_"] + [f"_atom_site.{field}" for field in [
+            "group_PDB", "id", "label_atom_id", "label_comp_id", "label_asym_id", "label_seq_id",
+            "Cartn_x", "Cartn_y", "Cartn_z", "B_iso_or_equiv", "auth_asym_id", "pdbx_PDB_model_num"]]
+        atom_id = 0
+        chains = [(chain, seq) for chain, entity, seq in records if entity == "protein"]
+        for offset, (chain, seq) in enumerate(chains):
+            for i, residue in enumerate(seq, 1):
+                comp = THREE_LETTER.get(residue.upper(), "UNK")
+                atoms = [("CA", 0.0)] if comp == "GLY" else [("CA", 0.0), ("CB", 1.5)]
+                for name, shift in atoms:
+                    atom_id += 1
+                    lines.append(f"ATOM {atom_id} {name} {comp} {chain} {i} {3.8 * i:.3f} "
+                                 f"{6.0 * offset + shift:.3f} 0.000 {plddt:.2f} {chain} 1")
+        lines.append("#")
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+class BoltzBackend:
+    """
+    Runs `boltz predict` in-process for each batch. The checkpoint is loaded on the first
+    batch and reused, and compiled kernels stay warm in the long-lived process.
+    """
+
+    def __init__(self, cache: str, predict_args: List[str]) -> None:
+        from boltz import main as boltz_main
+        from boltz.model.models.boltz1 import Boltz1
+        from boltz.model.models.boltz2 import Boltz2
+
+        self.boltz_main = boltz_main
+        self.cache = cache
+        self.predict_args = predict_args
+        for model_class in (Boltz1, Boltz2):
+            self.cache_checkpoint(model_class)
+
+    @staticmethod
+    def cache_checkpoint(model_class) -> None:
+        """Make load_from_checkpoint return the already loaded model for the same checkpoint."""
+        load = model_class.load_from_checkpoint
+        loaded = {}
+
+        def load_once(checkpoint, *args, **kwargs):
+            if checkpoint not in loaded:
+                start = time.time()
+                loaded[checkpoint] = load(checkpoint, *args, **kwargs)
+                logging.info(f"Loaded {model_class.__name__} from {checkpoint} in {time.time() - start:.1f} seconds")
+            return loaded[checkpoint]
+
+        model_class.load_from_checkpoint = load_once
+
+    def predict(self, fasta_files: List[Path], out_dir: Path) -> Dict[Path, bool]:
+        with tempfile.TemporaryDirectory(dir=out_dir, prefix=".batch_") as tmp:
+            batch_dir = Path(tmp) / "input"
+            batch_dir.mkdir()
+            for fasta in fasta_files:
+                shutil.copyfile(fasta, batch_dir / fasta.name)
+
+            args = [str(batch_dir), "--out_dir", tmp, "--cache", self.cache] + self.predict_args
+            try:
+                self.boltz_main.predict.main(args=args, standalone_mode=False)
+            except Exception as e:  # noqa: BLE001
+                logging.error(f"Boltz failed on batch {[fasta.name for fasta in fasta_files]}: {e}")
+
+            results = {}
+            predictions = Path(tmp) / "boltz_results_input" / "predictions"
+            for fasta in fasta_files:
+                source = predictions / fasta.stem
+                ok = any(source.glob("confidence_*_model_0.json"))
+                if ok:
+                    target = out_dir / "predictions" / fasta.stem
+                    if target.exists():
+                        shutil.rmtree(target)
+                    shutil.move(str(source), target)
+                results[fasta] = ok
+        return results
+
+
+def serve(queue: JobQueue, backend, out_dir: Path, worker_id: str, batch_size: int,
+          idle_timeout: float, poll_interval: float, claimed: Optional[ClaimedLog] = None) -> Dict[str, float]:
+    """Process batches from the queue until it stayed empty for idle_timeout seconds."""
+    stats = {"batches": 0, "done": 0, "failed": 0, "predict_seconds": 0.0}
+    idle_since = time.time()
+    while True:
+        batch = queue.claim(worker_id, batch_size)
+        if not batch:
+            if time.time() - idle_since >= idle_timeout:
+                break
+            time.sleep(poll_interval)
+            continue
+        if claimed:
+            claimed.add(batch, "running")
+
+        start = time.time()
+        results = backend.predict(batch, out_dir)
+        elapsed = time.time() - start
+        done = [fasta for fasta in batch if results.get(fasta)]
+        failed = [fasta for fasta in batch if not results.get(fasta)]
+        for fasta in done:
+            queue.publish(out_dir, fasta.stem)
+        queue.finish(worker_id, done, ok=True)
+        queue.finish(worker_id, failed, ok=False)
+        if claimed:
+            claimed.add([queue.queue_dir / "done" / fasta.name for fasta in done], "done")
+            claimed.add([queue.queue_dir / "failed" / fasta.name for fasta in failed], "failed")
+
+        stats["batches"] += 1
+        stats["done"] += len(done)
+        stats["failed"] += len(failed)
+        stats["predict_seconds"] += elapsed
+        logging.info(f"Batch of {len(batch)} in {elapsed:.1f} seconds ({len(failed)} failed), queue: {queue.counts()}")
+        idle_since = time.time()
+    return stats
+
+
+def main():
+    # No abbreviations, so `boltz predict` options are never taken for worker options
+    parser = argparse.ArgumentParser(description="Persistent Boltz worker consuming a queue of input FASTA files",
+                                     allow_abbrev=False)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = subparsers.add_parser("enqueue", help="Add input FASTA files to the queue", allow_abbrev=False)
+    enqueue_parser.add_argument("queue", help="Queue directory")
+    enqueue_parser.add_argument("fasta", nargs="+", help="Boltz input FASTA files")
+    enqueue_parser.add_argument("--reset", action="store_true",
+                                help="Remove the jobs, outputs and ledgers of an earlier run first")
+
+    serve_parser = subparsers.add_parser("serve", help="Load the model once and process the queue", allow_abbrev=False)
+    serve_parser.add_argument("queue", help="Queue directory")
+    serve_parser.add_argument("--out-dir", "-o", default="folds", help="Output directory (default: folds)")
+    serve_parser.add_argument("--backend", choices=["boltz", "stub"], default="boltz",
+                              help="Prediction backend, stub runs without model weights (default: boltz)")
+    serve_parser.add_argument("--cache", default="~/.boltz", help="Boltz cache directory with the model weights")
+    serve_parser.add_argument("--batch-size", type=int, default=10, help="Inputs per prediction batch (default: 10)")
+    serve_parser.add_argument("--idle-timeout", type=float, default=60,
+                              help="Exit after the queue was empty for this many seconds (default: 60)")
+    serve_parser.add_argument("--poll-interval", type=float, default=5,
+                              help="Seconds between checks of an empty queue (default: 5)")
+    serve_parser.add_argument("--worker-id", default=f"{socket.gethostname()}_{os.getpid()}",
+                              help="Worker name, a restarted worker with the same name reclaims its jobs")
+    serve_parser.add_argument("--claimed", default="claimed.tsv",
+                              help="Write the jobs this worker claimed and their status here (default: claimed.tsv)")
+    serve_parser.add_argument("--failed-dir", default="failed",
+                              help="Copy the inputs of the jobs this worker failed here (default: failed)")
+    serve_parser.add_argument("--stub-load-seconds", type=float, default=0.0,
+                              help="Simulated model load time of the stub backend (default: 0)")
+
+    args, predict_args = parser.parse_known_args()
+
+    queue = JobQueue(args.queue)
+
+    if args.command == "enqueue":
+        if predict_args:
+            parser.error(f"unrecognized arguments: {' '.join(predict_args)}")
+        if args.reset:
+            queue.reset()
+        added = queue.enqueue(args.fasta)
+        print(f"Added {added} jobs to {args.queue}: {queue.counts()}")
+        return
+
+    # Remaining arguments are passed on to `boltz predict`
+    predict_args = [arg for arg in predict_args if arg != "--"]
+
+    recovered = queue.recover(args.worker_id)
+    if recovered:
+        logging.info(f"Returned {recovered} unfinished jobs of worker {args.worker_id} to the queue")
+
+    out_dir = Path(args.out_dir)
+    (out_dir / "predictions").mkdir(parents=True, exist_ok=True)
+    claimed = ClaimedLog(Path(args.claimed))
+    restored = queue.restore(args.worker_id, out_dir)
+    claimed.add(restored, "restored")
+    if restored:
+        logging.info(f"Restored the outputs of {len(restored)} jobs finished by an earlier run of worker {args.worker_id}")
+
+    start = time.time()
+    if args.backend == "stub":
+        backend = StubBackend(args.stub_load_seconds)
+    else:
+        try:
+            backend = BoltzBackend(os.path.expanduser(args.cache), predict_args)
+        except ImportError as e:
+            logging.error(f"Boltz is not available ({e}), use --backend stub to run without it")
+            sys.exit(1)
+    logging.info(f"Worker {args.worker_id} ready in {time.time() - start:.1f} seconds")
+
+    stats = serve(queue, backend, out_dir, args.worker_id, args.batch_size, args.idle_timeout, args.poll_interval,
+                  claimed)
+    queue.copy_failed(args.worker_id, Path(args.failed_dir))
+    logging.info(f"Worker {args.worker_id} finished: {stats['done']} done, {stats['failed']} failed in "
+                 f"{stats['batches']} batches ({stats['predict_seconds']:.1f} seconds predicting)")
+
+
+if __name__ == "__main__":
+    main()
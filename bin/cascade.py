@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Plans a cheap-to-expensive engine cascade (colabfold -> boltz -> alphafold3).
+`plan` selects the pairs of a finished ranked table that pass the threshold (or top
+fraction) of its engine and writes reduced accession files, or inputs, for the next
+engine. `merge` joins the ranked tables of several engines by bait:prey pair and records
+which engine scored what.
+"""
+
+import argparse
+import csv
+import logging
+import math
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from compressed_io import open_text
+from screen import bait_flag, pair_key, read_accessions, write_accessions
+from tsv2json import TSV2AFConverter
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Engines from cheapest to most expensive
+ENGINES = ["colabfold", "boltz", "alphafold3"]
+# Default pass thresholds on the ranked score (ipTM, confidence_score, ranking_score)
+DEFAULT_THRESHOLDS = {"colabfold": 0.3, "boltz": 0.5, "alphafold3": 0.6}
+
+
+def parse_thresholds(value: str) -> Dict[str, float]:
+    """Parse 'engine=value,...' into per engine thresholds on top of the defaults."""
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    for item in filter(None, value.split(',')):
+        engine, _, threshold = item.partition('=')
+        if engine not in ENGINES:
+            raise argparse.ArgumentTypeError(f"Unknown engine '{engine}'. Options: {', '.join(ENGINES)}")
+        try:
+            thresholds[engine] = float(threshold)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Threshold must be given as engine=value, got '{item}'")
+    return thresholds
+
+
+def read_ranked(ranked_file: str) -> Tuple[str, List[Tuple[str, float]]]:
+    """Read a rank_af.py TSV, returning the score column name and (foldid, score) rows."""
+    rows = []
+    with open_text(ranked_file) as f:
+        reader = csv.reader(f, delimiter='\t')
+        header = next(reader)
+        for row in reader:
+            try:
+                score = float(row[-1])
+            except (ValueError, IndexError):
+                score = -math.inf
+            rows.append((row[0], score))
+    return header[-1], rows
+
+
+def pair_index(converter: TSV2AFConverter, rows: List[Dict[str, str]]) -> Dict[str, Tuple[str, str]]:
+    """Map the normalized foldid of every bait x prey sequence pair to its (bait, prey) entries."""
+    baits = [row['entry'] for row in rows if bait_flag(row['bait']) == 1]
+    preys = [row['entry'] for row in rows if bait_flag(row['bait']) == 0]
+    prey_names = {prey: converter.entry_names(prey) for prey in preys}
+
+    index = {}
+    for bait in baits:
+        for bait_name in converter.entry_names(bait):
+            for prey in preys:
+                for prey_name in prey_names[prey]:
+                    index[converter.output_stem(bait_name, prey_name).lower()] = (bait, prey)
+    return index
+
+
+def select(rows: List[Tuple[str, float]], threshold: Optional[float], top_fraction: Optional[float]) -> List[Tuple[str, float]]:
+    """Select ranked rows passing the threshold, or the top fraction of rows if given."""
+    ranked = sorted(rows, key=lambda row: row[1], reverse=True)
+    if top_fraction is not None:
+        return ranked[:math.ceil(len(ranked) * top_fraction)]
+    return [row for row in ranked if row[1] >= threshold]
+
+
+def plan(args: argparse.Namespace) -> None:
+    converter = TSV2AFConverter(args.workdir)
+    header, rows = read_accessions(args.input_tsv)
+    index = pair_index(converter, rows)
+
+    score_name, ranked = read_ranked(args.ranked)
+    threshold = args.thresholds[args.mode]
+    selected = select(ranked, threshold, args.top_fraction)
+
+    preys_by_bait: Dict[str, List[str]] = {}
+    with open(f"{args.prefix}_selected.tsv", 'w') as f:
+        f.write(f"foldid\tbait\tprey\t{args.mode}_{score_name}\n")
+        for foldid, score in selected:
+            pair = index.get(pair_key(foldid))
+            if pair is None:
+                logging.warning(f"Could not match {foldid} to an accession pair")
+                continue
+            bait, prey = pair
+            f.write(f"{foldid}\t{bait}\t{prey}\t{score}\n")
+            if prey not in preys_by_bait.setdefault(bait, []):
+                preys_by_bait[bait].append(prey)
+
+    criterion = f"top {args.top_fraction:.0%}" if args.top_fraction is not None else f"{score_name} >= {threshold}"
+    logging.info(f"Selected {len(selected)} of {len(ranked)} {args.mode} pairs ({criterion})")
+    if not preys_by_bait:
+        logging.info("No pair passed, no accession files written")
+
+    # Baits with the same selected preys share one accession file
+    groups: Dict[Tuple[str, ...], List[str]] = {}
+    for bait, preys in preys_by_bait.items():
+        groups.setdefault(tuple(sorted(preys)), []).append(bait)
+
+    entry_rows = {}
+    for row in rows:
+        entry_rows.setdefault((row['entry'], bait_flag(row['bait'])), row)
+
+    for i, (preys, baits) in enumerate(groups.items(), 1):
+        output = f"{args.prefix}_{i}.tsv"
+        group_rows = [entry_rows[(bait, 1)] for bait in baits] + [entry_rows[(prey, 0)] for prey in preys]
+        write_accessions(output, header, group_rows)
+        logging.info(f"Wrote {len(baits)} baits x {len(preys)} preys to {output}")
+
+        if args.write_inputs:
+            output_dir = f"{args.prefix}_{i}_{args.write_inputs}"
+            converter.convert(output, output_dir, args.write_inputs)
+
+
+def merge(args: argparse.Namespace) -> None:
+    converter = TSV2AFConverter(args.workdir)
+    _, rows = read_accessions(args.input_tsv)
+    index = pair_index(converter, rows)
+
+    engines = sorted(args.ranked, key=ENGINES.index)
+    merged: Dict[Tuple[str, str], Dict[str, str]] = {}
+    score_columns = {}
+    for engine in engines:
+        score_name, ranked = read_ranked(args.ranked[engine])
+        score_columns[engine] = f"{engine}_{score_name}"
+        for foldid, score in ranked:
+            pair = index.get(pair_key(foldid))
+            if pair is None:
+                logging.warning(f"Could not match {engine} foldid {foldid} to an accession pair")
+                continue
+            entry = merged.setdefault(pair, {"bait": pair[0], "prey": pair[1]})
+            # Keep the best scoring sequence pair of multi-sequence entries
+            if score > entry.get(score_columns[engine], -math.inf):
+                entry[f"{engine}_foldid"] = foldid
+                entry[score_columns[engine]] = score
+
+    headers = ["bait", "prey", "engines", "final_engine"]
+    for engine in engines:
+        headers += [f"{engine}_foldid", score_columns[engine]]
+    headers.append("final_score")
+
+    for entry in merged.values():
+        scored = [engine for engine in engines if score_columns[engine] in entry]
+        entry["engines"] = ",".join(scored)
+        # The most expensive engine that scored a pair has the final say
+        entry["final_engine"] = scored[-1]
+        entry["final_score"] = entry[score_columns[scored[-1]]]
+
+    results = sorted(merged.values(), key=lambda entry: (ENGINES.index(entry["final_engine"]), entry["final_score"]),
+                     reverse=True)
+    with open(args.output, 'w') as f:
+        f.write("\t".join(headers) + "\n")
+        for entry in results:
+            f.write("\t".join(str(entry.get(header, "")) for header in headers) + "\n")
+    logging.info(f"Merged {len(results)} pairs scored by {', '.join(engines)} into {args.output}")
+
+
+def parse_ranked(value: str) -> Tuple[str, str]:
+    """Parse an 'engine=ranked.tsv' argument."""
+    engine, _, path = value.partition('=')
+    if engine not in ENGINES or not path:
+        raise argparse.ArgumentTypeError(f"Ranked tables must be given as engine=file with engine one of "
+                                         f"{', '.join(ENGINES)}, got '{value}'")
+    return engine, path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan and merge cheap-to-expensive engine cascades")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    plan_parser = subparsers.add_parser("plan", help="Select pairs for the next engine")
+    plan_parser.add_argument("input_tsv", help="Accession TSV file of the finished run")
+    plan_parser.add_argument("--ranked", required=True, help="Ranked TSV file from rank_af.py")
+    plan_parser.add_argument("--mode", required=True, choices=ENGINES, help="Engine that produced the ranked TSV")
+    plan_parser.add_argument("--thresholds", type=parse_thresholds, default=dict(DEFAULT_THRESHOLDS),
+                             help="Per engine pass thresholds as engine=value,... "
+                                  "(default: colabfold=0.3,boltz=0.5,alphafold3=0.6)")
+    plan_parser.add_argument("--top-fraction", type=float,
+                             help="Select this fraction of the best ranked pairs instead of using a threshold")
+    plan_parser.add_argument("--prefix", default="cascade", help="Output file prefix (default: cascade)")
+    plan_parser.add_argument("--write-inputs", choices=ENGINES,
+                             help="Also write the inputs of this engine for each accession file")
+    plan_parser.add_argument("--workdir", default=".", help="Work directory for relative paths (default: .)")
+
+    merge_parser = subparsers.add_parser("merge", help="Merge ranked TSVs of several engines")
+    merge_parser.add_argument("input_tsv", help="Accession TSV file of the first engine")
+    merge_parser.add_argument("--ranked", type=parse_ranked, nargs="+", required=True,
+                              help="Ranked TSV files as engine=file")
+    merge_parser.add_argument("-o", "--output", default="cascade_ranked_results.tsv",
+                              help="Output TSV file (default: cascade_ranked_results.tsv)")
+    merge_parser.add_argument("--workdir", default=".", help="Work directory for relative paths (default: .)")
+
+    args = parser.parse_args()
+
+    if not Path(args.input_tsv).exists():
+        logging.error(f"Error: Input file {args.input_tsv} does not exist")
+        sys.exit(1)
+
+    if args.command == "plan":
+        if args.top_fraction is not None and not 0 < args.top_fraction <= 1:
+            parser.error("--top-fraction must be between 0 and 1")
+        plan(args)
+    else:
+        args.ranked = dict(args.ranked)
+        merge(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Verifies that the shard manifests written by `tsv2json.py --shard i/N --shard-manifest`
+together cover every bait-prey combination of the input TSV exactly once.
+Exits with a non-zero status if a combination is missing, duplicated, or unexpected.
+"""
+
+import argparse
+import csv
+import sys
+from collections import Counter
+from pathlib import Path
+
+from compressed_io import open_text
+from screen import bait_flag
+
+
+def read_expected_combinations(tsv_file: str) -> set:
+    """Return the set of (bait, prey) entry pairs defined by the input TSV."""
+    baits = []
+    preys = []
+    with open_text(tsv_file) as f:
+        reader = csv.DictReader(f, delimiter="\t")
+        reader.fieldnames = [name.lower() for name in reader.fieldnames]
+        if "entry" not in reader.fieldnames or "bait" not in reader.fieldnames:
+            raise ValueError("TSV must contain 'Entry' and 'Bait' columns")
+        for row in reader:
+            bait = bait_flag(row["bait"])
+            if bait == 1:
+                baits.append(row["entry"])
+            elif bait == 0:
+                preys.append(row["entry"])
+
+    return {(bait, prey) for bait in baits for prey in preys}
+
+
+def check_shards(tsv_file: str, manifests: list, num_shards: int) -> bool:
+    """
+    Compare the shard manifests against the combinations in the input TSV.
+
+    Args:
+        tsv_file (str): Input accession TSV given to tsv2json.py
+        manifests (list): Shard manifest TSV files
+        num_shards (int): Expected number of shards (N)
+
+    Returns:
+        bool: True if every combination was written by exactly one shard
+    """
+    expected = read_expected_combinations(tsv_file)
+    seen = Counter()
+    shards_seen = set()
+    ok = True
+
+    for manifest in manifests:
+        with open_text(manifest) as f:
+            for row in csv.DictReader(f, delimiter="\t"):
+                if int(row["num_shards"]) != num_shards:
+                    print(f"{manifest}: written for {row['num_shards']} shards, expected {num_shards}")
+                    ok = False
+                shards_seen.add(int(row["shard"]))
+                seen[(row["bait"], row["prey"])] += 1
+
+    missing = expected - set(seen)
+    unexpected = set(seen) - expected
+    duplicated = [pair for pair, count in seen.items() if count > 1]
+
+    for bait, prey in sorted(missing):
+        print(f"Missing combination: {bait} - {prey}")
+    for bait, prey in sorted(unexpected):
+        print(f"Unexpected combination: {bait} - {prey}")
+    for bait, prey in sorted(duplicated):
+        print(f"Combination written by {seen[(bait, prey)]} shards: {bait} - {prey}")
+
+    if len(manifests) != num_shards:
+        print(f"Found {len(manifests)} shard manifests, expected {num_shards}")
+        ok = False
+
+    ok = ok and not missing and not unexpected and not duplicated
+    print(
+        f"Checked {len(expected)} combinations across {len(shards_seen)} non-empty shards: "
+        f"{len(missing)} missing, {len(duplicated)} duplicated, {len(unexpected)} unexpected"
+    )
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify tsv2json.py shard coverage")
+    parser.add_argument("input_tsv", help="Input TSV file given to tsv2json.py")
+    parser.add_argument("manifests", nargs="+", help="Shard manifest TSV files")
+    parser.add_argument(
+        "--num-shards", "-n", type=int, required=True, help="Expected number of shards"
+    )
+
+    args = parser.parse_args()
+
+    for path in [args.input_tsv] + args.manifests:
+        if not Path(path).exists():
+            print(f"Error: File '{path}' does not exist")
+            sys.exit(1)
+
+    if not check_shards(args.input_tsv, args.manifests, args.num_shards):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Clusters redundant preys (paralogs, isoforms) by k-mer MinHash similarity so a first
+round only folds cluster representatives against each bait. After the first round,
+members of clusters whose representative scored above a threshold are expanded into
+accession files for a second round.
+"""
+
+import argparse
+import csv
+import logging
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from compressed_io import open_text
+from screen import bait_flag, pair_key, read_accessions, write_accessions
+from tsv2json import TSV2AFConverter
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Hash functions h(x) = (a * x + b) mod P; with P < 2^31 the products fit in uint64
+MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+CLUSTER_HEADERS = ["cluster", "representative", "member", "representative_name", "member_name", "length",
+                   "identity"]
+
+
+class MinHasher:
+    def __init__(self, kmer_size: int = 5, num_hashes: int = 128, seed: int = 1) -> None:
+        self.kmer_size = kmer_size
+        self.num_hashes = num_hashes
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, int(MERSENNE_PRIME), size=num_hashes, dtype=np.uint64)
+        self.b = rng.integers(0, int(MERSENNE_PRIME), size=num_hashes, dtype=np.uint64)
+
+    def kmers(self, sequence: str) -> np.ndarray:
+        """Return the distinct k-mers of a sequence encoded as integers."""
+        codes = np.frombuffer(sequence.upper().encode(), dtype=np.uint8).astype(np.uint64)
+        k = min(self.kmer_size, len(codes))
+        values = np.zeros(len(codes) - k + 1, dtype=np.uint64)
+        for i in range(k):
+            values = values * np.uint64(256) + codes[i:len(codes) - k + 1 + i]
+        return np.unique(values)
+
+    def signature(self, sequence: str) -> np.ndarray:
+        """Return the MinHash signature of a sequence."""
+        kmers = self.kmers(sequence) % MERSENNE_PRIME
+        hashes = (self.a[:, None] * kmers[None, :] + self.b[:, None]) % MERSENNE_PRIME
+        return hashes.min(axis=1)
+
+    def identity_to_jaccard(self, identity: float) -> float:
+        """Approximate k-mer Jaccard similarity of two sequences with the given identity.
+
+        With mismatches spread along the sequence a k-mer is conserved with probability
+        identity^k, so J = s / (2 - s) with s = identity^k.
+        """
+        shared = identity ** self.kmer_size
+        return shared / (2 - shared)
+
+    def jaccard_to_identity(self, jaccard: float) -> float:
+        """Inverse of identity_to_jaccard."""
+        return (2 * jaccard / (1 + jaccard)) ** (1 / self.kmer_size)
+
+    def lsh_rows(self, jaccard: float, recall: float = 0.99) -> int:
+        """Choose the most selective band width that still finds pairs at `jaccard` with `recall`."""
+        for rows in sorted((r for r in range(1, self.num_hashes + 1) if self.num_hashes % r == 0), reverse=True):
+            bands = self.num_hashes // rows
+            if 1 - (1 - jaccard ** rows) ** bands >= recall:
+                return rows
+        return 1
+
+
+def cluster_sequences(sequences: Dict[str, str], identity: float, hasher: MinHasher) -> Dict[str, Tuple[str, float]]:
+    """
+    Greedily cluster sequences, longest first, by estimated identity.
+
+    Candidate representatives are found by LSH banding of the MinHash signatures and
+    verified on the full signature.
+
+    Returns:
+        dict: name -> (representative name, estimated identity to the representative)
+    """
+    threshold = hasher.identity_to_jaccard(identity)
+    rows = hasher.lsh_rows(threshold)
+    logging.info(f"Clustering {len(sequences)} sequences at {identity:.2f} identity "
+                 f"(Jaccard {threshold:.3f}, {hasher.num_hashes // rows} bands of {rows})")
+
+    order = sorted(sequences, key=lambda name: (-len(sequences[name]), name))
+    signatures = {name: hasher.signature(sequences[name]) for name in order}
+
+    buckets: Dict[Tuple[int, bytes], List[str]] = {}
+    assignment = {}
+    for name in order:
+        signature = signatures[name]
+        keys = [(band, signature[band * rows:(band + 1) * rows].tobytes())
+                for band in range(hasher.num_hashes // rows)]
+
+        best, best_jaccard = None, threshold
+        candidates = {rep for key in keys for rep in buckets.get(key, [])}
+        for rep in sorted(candidates):
+            jaccard = float(np.mean(signatures[rep] == signature))
+            if jaccard >= best_jaccard:
+                best, best_jaccard = rep, jaccard
+
+        if best is None:
+            # New representative, only representatives are indexed
+            assignment[name] = (name, 1.0)
+            for key in keys:
+                buckets.setdefault(key, []).append(name)
+        else:
+            assignment[name] = (best, hasher.jaccard_to_identity(best_jaccard))
+    return assignment
+
+
+def clusterable_sequence(converter: TSV2AFConverter, entry: str) -> Optional[str]:
+    """Return the protein sequence of single-sequence entries; other entries are not clustered."""
+    entry_type = converter.get_entry_type(entry)
+    if entry_type == 'uniprot':
+        return converter.fetch_uniprot_sequence(entry)
+    if entry_type == 'fasta_file':
+        sequences = converter.read_fasta(entry)
+        if len(sequences) == 1:
+            sequence = next(iter(sequences.values()))
+            if not converter.is_dna_sequence(sequence) and not converter.is_rna_sequence(sequence):
+                return sequence
+    return None
+
+
+def cluster(args: argparse.Namespace) -> None:
+    converter = TSV2AFConverter(args.workdir)
+    if args.sequence_cache and Path(args.sequence_cache).exists():
+        converter.load_sequence_cache(args.sequence_cache)
+
+    header, rows = read_accessions(args.input_tsv)
+    preys = list(dict.fromkeys(row['entry'] for row in rows if bait_flag(row['bait']) == 0))
+    uniprot_ids = [prey for prey in preys if converter.get_entry_type(prey) == 'uniprot'
+                   and prey not in converter.sequence_cache]
+    if uniprot_ids:
+        converter.fetch_uniprot_sequences_batch(uniprot_ids)
+
+    sequences = {}
+    for prey in preys:
+        sequence = clusterable_sequence(converter, prey)
+        if sequence:
+            sequences[prey] = sequence
+
+    hasher = MinHasher(args.kmer_size, args.num_hashes)
+    assignment = cluster_sequences(sequences, args.identity, hasher)
+    for prey in preys:
+        assignment.setdefault(prey, (prey, 1.0))
+
+    representatives = list(dict.fromkeys(rep for rep, _ in assignment.values()))
+    cluster_ids = {rep: i for i, rep in enumerate(representatives, 1)}
+    with open(args.clusters, 'w') as f:
+        f.write("\t".join(CLUSTER_HEADERS) + "\n")
+        for prey in sorted(preys, key=lambda p: (cluster_ids[assignment[p][0]], p != assignment[p][0], p)):
+            rep, member_identity = assignment[prey]
+            f.write(f"{cluster_ids[rep]}\t{rep}\t{prey}\t{converter.entry_names(rep)[0]}\t"
+                    f"{converter.entry_names(prey)[0]}\t{len(sequences.get(prey, ''))}\t{member_identity:.3f}\n")
+
+    kept = set(representatives)
+    write_accessions(args.output, header, [row for row in rows if bait_flag(row['bait']) != 0
+                                           or row['entry'] in kept])
+    logging.info(f"{len(preys)} preys in {len(representatives)} clusters. "
+                 f"Representatives written to {args.output}, clusters to {args.clusters}")
+
+
+def read_ranked_scores(ranked_files: List[str]) -> Dict[str, float]:
+    """Read foldid -> score from rank_af.py TSV files; the score is the last column."""
+    scores = {}
+    for ranked_file in ranked_files:
+        with open_text(ranked_file) as f:
+            reader = csv.reader(f, delimiter='\t')
+            next(reader, None)
+            for row in reader:
+                try:
+                    score = float(row[-1])
+                except (ValueError, IndexError):
+                    continue
+                foldid = pair_key(row[0])
+                scores[foldid] = max(score, scores.get(foldid, score))
+    return scores
+
+
+def expand(args: argparse.Namespace) -> None:
+    converter = TSV2AFConverter(args.workdir)
+    header, rows = read_accessions(args.input_tsv)
+    baits = [row for row in rows if bait_flag(row['bait']) == 1]
+
+    members: Dict[str, List[str]] = {}
+    with open(args.clusters, 'r', newline='') as f:
+        for row in csv.DictReader(f, delimiter='\t'):
+            if row['member'] != row['representative']:
+                members.setdefault(row['representative'], []).append(row['member'])
+
+    # Map the foldids of every bait x representative pair back to the entries
+    pairs: Dict[str, Tuple[str, str]] = {}
+    for bait in baits:
+        for rep in members:
+            for bait_name in converter.entry_names(bait['entry']):
+                for rep_name in converter.entry_names(rep):
+                    pairs[converter.output_stem(bait_name, rep_name).lower()] = (bait['entry'], rep)
+
+    expanded: Dict[str, set] = {}
+    for foldid, score in read_ranked_scores(args.ranked).items():
+        if score >= args.threshold and foldid in pairs:
+            bait, rep = pairs[foldid]
+            expanded.setdefault(bait, set()).update(members[rep])
+
+    # Baits with the same member set share one accession file
+    groups: Dict[frozenset, List[str]] = {}
+    for bait, bait_members in expanded.items():
+        groups.setdefault(frozenset(bait_members), []).append(bait)
+
+    bait_rows = {bait['entry']: bait for bait in baits}
+    prey_rows = {row['entry']: row for row in rows if bait_flag(row['bait']) == 0}
+    for i, (group_members, group_baits) in enumerate(groups.items(), 1):
+        output = f"{args.prefix}_{i}.tsv"
+        group_rows = [bait_rows[bait] for bait in group_baits]
+        group_rows += [prey_rows.get(member, {'entry': member, 'bait': '0'}) for member in sorted(group_members)]
+        write_accessions(output, header, group_rows)
+        logging.info(f"Wrote {len(group_baits)} baits x {len(group_members)} cluster members to {output}")
+
+    if not groups:
+        logging.info(f"No representative scored at least {args.threshold}, nothing to expand")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster redundant preys and expand clusters of hits")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    cluster_parser = subparsers.add_parser("cluster", help="Cluster preys and keep the representatives")
+    cluster_parser.add_argument("input_tsv", help="Input accession TSV file")
+    cluster_parser.add_argument("-o", "--output", default="representatives.tsv",
+                                help="Accession TSV with baits and representative preys (default: representatives.tsv)")
+    cluster_parser.add_argument("--clusters", default="clusters.tsv", help="Cluster membership TSV (default: clusters.tsv)")
+    cluster_parser.add_argument("--identity", type=float, default=0.9,
+                                help="Sequence identity threshold for clustering (default: 0.9)")
+    cluster_parser.add_argument("--kmer-size", type=int, default=5, help="k-mer size (default: 5)")
+    cluster_parser.add_argument("--num-hashes", type=int, default=128, help="MinHash signature size (default: 128)")
+    cluster_parser.add_argument("--sequence-cache", help="JSON file of prefetched UniProt sequences")
+    cluster_parser.add_argument("--workdir", default=".", help="Work directory for relative paths (default: .)")
+
+    expand_parser = subparsers.add_parser("expand", help="Write accession files with the members of hit clusters")
+    expand_parser.add_argument("input_tsv", help="Original accession TSV file")
+    expand_parser.add_argument("--clusters", required=True, help="Cluster membership TSV written by cluster")
+    expand_parser.add_argument("--ranked", nargs="+", required=True, help="Ranked TSV files from rank_af.py")
+    expand_parser.add_argument("--threshold", type=float, default=0.5,
+                               help="Expand clusters whose representative scored at least this (default: 0.5)")
+    expand_parser.add_argument("--prefix", default="expanded", help="Output accession TSV prefix (default: expanded)")
+    expand_parser.add_argument("--workdir", default=".", help="Work directory for relative paths (default: .)")
+
+    args = parser.parse_args()
+
+    if not Path(args.input_tsv).exists():
+        logging.error(f"Error: Input file {args.input_tsv} does not exist")
+        sys.exit(1)
+
+    if args.command == "cluster":
+        if not 0 < args.identity <= 1:
+            parser.error("--identity must be between 0 and 1")
+        cluster(args)
+    else:
+        expand(args)
+
+
+if __name__ == "__main__":
+    main()
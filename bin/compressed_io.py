@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Transparent gzip/zstd compression for the pipeline's Python tools.
+The compression of a file follows from its suffix: .gz (gzip) or .zst (zstd, which needs the
+zstandard package). Files are read and written as streams, so a compressed file is never
+held in memory next to its decompressed text.
+"""
+
+from pathlib import Path
+from typing import IO, Optional, Union
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+# Faster than the gzip default of 9 at nearly the same size for JSON and FASTA text
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def compression_of(path: Union[str, Path]) -> Optional[str]:
+    """Return the compression of a file from its suffix, or None."""
+    suffix = Path(path).suffix
+    for compression, compression_suffix in COMPRESSION_SUFFIXES.items():
+        if suffix == compression_suffix:
+            return compression
+    return None
+
+
+def strip_compression(path: Union[str, Path]) -> Path:
+    """Return the path without its compression suffix, e.g. x.json for x.json.gz."""
+    path = Path(path)
+    return path.with_suffix("") if compression_of(path) else path
+
+
+def add_compression(path: Union[str, Path], compression: Optional[str]) -> Path:
+    """Return the path with the suffix of the compression appended, e.g. x.json.gz."""
+    path = Path(path)
+    return path.with_name(path.name + COMPRESSION_SUFFIXES[compression]) if compression else path
+
+
+def open_text(path: Union[str, Path], mode: str = "r", level: Optional[int] = None) -> IO[str]:
+    """Open a text file for reading ('r') or writing ('w'), compressed according to its suffix."""
+    # The codecs are imported on first use to keep the startup of the tools short
+    compression = compression_of(path)
+    # Line endings are left to the csv module when reading, as with open(..., newline='')
+    newline = "" if mode == "r" else None
+    if compression == "gzip":
+        import gzip
+
+        return gzip.open(path, mode + "t", compresslevel=level or GZIP_LEVEL, encoding="utf-8", newline=newline)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError(f"Reading or writing {path} needs the zstandard package")
+        if mode == "r":
+            return zstandard.open(path, "rt", encoding="utf-8", newline=newline)
+        return zstandard.open(path, mode + "t", cctx=zstandard.ZstdCompressor(level=level or ZSTD_LEVEL),
+                              encoding="utf-8")
+    return open(path, mode, newline=newline)
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Packs the embedding and distogram arrays of Alphafold3 (--save_embeddings, --save_distogram)
+and Boltz (--write_embeddings) into one store indexed by complex.
+Arrays are split into chunks along their first axis and zlib compressed, or written as plain
+.npy files that can be memory-mapped, optionally downcast to float16. One complex's array, or
+a range of its rows, can be read without loading the rest of the store.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+INDEX_FILE = "index.json"
+FORMAT_VERSION = 1
+CODECS = ["zlib", "npy"]
+# Array file names written by each engine, mapped to (complex, array name)
+FILE_PATTERNS = [
+    # Alphafold3: <job>_seed-<seed>_embeddings.npz and <job>_seed-<seed>_distogram.npz
+    re.compile(r"^(?P<complex>.+)_(?P<name>seed-\d+_(?:embeddings|distogram))$"),
+    # Boltz: embeddings_<id>.npz
+    re.compile(r"^(?P<name>embeddings)_(?P<complex>.+)$"),
+]
+FLOAT16_MAX = float(np.finfo(np.float16).max)
+
+
+def array_id(path: Path) -> Tuple[str, str]:
+    """Return the (complex, array name) of an .npz file, falling back to its directory name."""
+    for pattern in FILE_PATTERNS:
+        match = pattern.match(path.stem)
+        if match:
+            return match.group("complex").lower(), match.group("name")
+    return path.parent.name.lower(), path.stem
+
+
+def find_arrays(inputs: List[str]) -> List[Path]:
+    """Expand files and directories into the .npz files to pack."""
+    paths = []
+    for item in inputs:
+        item = Path(item)
+        paths += sorted(item.rglob("*.npz")) if item.is_dir() else [item]
+    return paths
+
+
+class EmbeddingStore:
+    def __init__(self, store_dir: Union[str, Path]) -> None:
+        self.store_dir = Path(store_dir)
+        self.index_path = self.store_dir / INDEX_FILE
+        self.index = {"format": FORMAT_VERSION, "complexes": {}}
+        if self.index_path.exists():
+            with open(self.index_path, "r") as f:
+                self.index = json.load(f)
+
+    @property
+    def complexes(self) -> Dict[str, Dict[str, dict]]:
+        return self.index["complexes"]
+
+    def put(self, complex_id: str, name: str, array: np.ndarray, float16: bool = False,
+            codec: str = "zlib", level: int = 6, chunk_bytes: int = 4 << 20) -> dict:
+        """Write one array to the store and add it to the (unsaved) index."""
+        source_dtype = str(array.dtype)
+        if float16 and np.issubdtype(array.dtype, np.floating) and array.dtype != np.float16:
+            # Values beyond the float16 range would turn into inf, keep those arrays as they are
+            if array.size and np.nanmax(np.abs(array)) > FLOAT16_MAX:
+                print(f"Keeping {complex_id}/{name} as {source_dtype}, values exceed the float16 range")
+            else:
+                array = array.astype(np.float16)
+
+        data_dir = self.store_dir / "data" / complex_id
+        data_dir.mkdir(parents=True, exist_ok=True)
+        file_name = f"{name.replace('/', '.')}.{'npy' if codec == 'npy' else 'zc'}"
+        path = data_dir / file_name
+        # Write to a temporary file first so readers never see partial arrays
+        tmp_path = path.with_name(f".{file_name}.{os.getpid()}.tmp")
+
+        entry = {
+            "file": str(path.relative_to(self.store_dir)),
+            "codec": codec,
+            "dtype": str(array.dtype),
+            "source_dtype": source_dtype,
+            "shape": list(array.shape),
+            "sha256": hashlib.sha256(array.tobytes()).hexdigest(),
+        }
+        if codec == "npy":
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+        else:
+            # Scalars and 1D arrays are one row per element. The row size is given explicitly, as
+            # reshape cannot infer it for empty arrays
+            rows = array.reshape(array.shape[0] if array.ndim else 1, int(np.prod(array.shape[1:])))
+            row_bytes = max(rows[0].nbytes if len(rows) else 1, 1)
+            chunk_rows = max(1, chunk_bytes // row_bytes)
+            chunks = []
+            offset = 0
+            with open(tmp_path, "wb") as f:
+                for start in range(0, len(rows), chunk_rows):
+                    compressed = zlib.compress(rows[start:start + chunk_rows].tobytes(), level)
+                    f.write(compressed)
+                    chunks.append([offset, len(compressed)])
+                    offset += len(compressed)
+            entry["chunk_rows"] = chunk_rows
+            entry["chunks"] = chunks
+        os.replace(tmp_path, path)
+        entry["bytes"] = path.stat().st_size
+
+        self.complexes.setdefault(complex_id, {})[name] = entry
+        return entry
+
+    def entry(self, complex_id: str, name: str) -> dict:
+        try:
+            return self.complexes[complex_id.lower()][name]
+        except KeyError:
+            raise KeyError(f"{complex_id}/{name} is not in store {self.store_dir}")
+
+    def read(self, complex_id: str, name: str, rows: Optional[slice] = None) -> np.ndarray:
+        """Read an array, or a slice of its first axis, decompressing only the chunks it covers.
+
+        Arrays of the npy codec are memory-mapped, so slices are read lazily from disk.
+        """
+        entry = self.entry(complex_id, name)
+        path = self.store_dir / entry["file"]
+        if entry["codec"] == "npy":
+            array = np.load(path, mmap_mode="r")
+            return array if rows is None else array[rows]
+
+        shape = entry["shape"]
+        dtype = np.dtype(entry["dtype"])
+        num_rows = shape[0] if shape else 1
+        start, stop, step = (rows or slice(None)).indices(num_rows)
+        if start >= stop:
+            return np.empty([0] + shape[1:], dtype=dtype)
+        if 0 in shape:
+            return np.empty(shape, dtype=dtype)[start:stop:step]
+        chunk_rows = entry["chunk_rows"]
+        first, last = start // chunk_rows, (stop - 1) // chunk_rows
+
+        parts = []
+        with open(path, "rb") as f:
+            for offset, length in entry["chunks"][first:last + 1]:
+                f.seek(offset)
+                parts.append(np.frombuffer(zlib.decompress(f.read(length)), dtype=dtype))
+        block = np.concatenate(parts).reshape([-1] + shape[1:]) if shape else parts[0].reshape(())
+        if not shape:
+            return block
+        offset = first * chunk_rows
+        return block[start - offset:stop - offset:step]
+
+    def save(self) -> None:
+        """Write the index atomically."""
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_name(f".{INDEX_FILE}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+
+def format_bytes(num_bytes: float) -> str:
+    """Format a byte count for log output."""
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(num_bytes) < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+
+def parse_rows(value: str) -> slice:
+    """Parse 'start:stop' into a slice of the first axis."""
+    start, _, stop = value.partition(":")
+    try:
+        return slice(int(start) if start else None, int(stop) if stop else None)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Rows must be given as start:stop, got '{value}'")
+
+
+def pack_files(store: EmbeddingStore, paths: List[Path], args: argparse.Namespace) -> None:
+    """Pack .npz files into the store and report the space saved."""
+    original_bytes = 0
+    stored_bytes = 0
+    num_arrays = 0
+    for path in paths:
+        complex_id, name = array_id(path)
+        try:
+            with np.load(path) as npz:
+                for key in npz.files:
+                    entry = store.put(complex_id, f"{name}/{key}", npz[key], args.float16,
+                                      args.codec, args.level, int(args.chunk_mb * (1 << 20)))
+                    stored_bytes += entry["bytes"]
+                    num_arrays += 1
+        except (OSError, ValueError) as e:
+            print(f"Error packing {path}: {e}")
+            continue
+        original_bytes += path.stat().st_size
+        if args.remove:
+            os.remove(path)
+    store.save()
+
+    print(f"Packed {num_arrays} arrays of {len(paths)} files for {len(store.complexes)} complexes")
+    print(f"Original size : {format_bytes(original_bytes)}")
+    print(f"Stored size   : {format_bytes(stored_bytes)}")
+    if original_bytes:
+        saved = original_bytes - stored_bytes
+        print(f"Saved         : {format_bytes(saved)} ({100 * saved / original_bytes:.1f}%)")
+
+
+def verify(store: EmbeddingStore, paths: List[Path], max_rel_error: float) -> bool:
+    """Check the stored arrays against their checksums, and against the original .npz files if given.
+
+    Arrays stored in their source dtype must match exactly. Downcast arrays may differ by up
+    to max_rel_error relative to the largest absolute value of the array.
+    """
+    ok = True
+    for complex_id, arrays in sorted(store.complexes.items()):
+        for name, entry in sorted(arrays.items()):
+            array = np.asarray(store.read(complex_id, name))
+            if hashlib.sha256(array.tobytes()).hexdigest() != entry["sha256"]:
+                print(f"{complex_id}/{name}: checksum mismatch")
+                ok = False
+
+    for path in paths:
+        complex_id, name = array_id(path)
+        with np.load(path) as npz:
+            for key in npz.files:
+                original = npz[key]
+                try:
+                    stored = np.asarray(store.read(complex_id, f"{name}/{key}"))
+                except KeyError as e:
+                    print(f"{e.args[0]}")
+                    ok = False
+                    continue
+                if stored.shape != original.shape:
+                    print(f"{complex_id}/{name}/{key}: shape {stored.shape} != {original.shape}")
+                    ok = False
+                    continue
+                if stored.dtype == original.dtype:
+                    exact = np.array_equal(stored, original, equal_nan=np.issubdtype(original.dtype, np.floating))
+                    if not exact:
+                        print(f"{complex_id}/{name}/{key}: stored values differ from the original")
+                        ok = False
+                    continue
+                error = np.abs(stored.astype(np.float64) - original.astype(np.float64))
+                max_error = float(np.nanmax(error)) if error.size else 0.0
+                scale = np.nanmax(np.abs(original)) if original.size else 0
+                rel_error = max_error / scale if scale else 0.0
+                status = "ok" if rel_error <= max_rel_error else "FAILED"
+                print(f"{complex_id}/{name}/{key}: {stored.dtype} max abs error {max_error:.3g}, "
+                      f"max relative error {rel_error:.3g} ({status})")
+                ok = ok and rel_error <= max_rel_error
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunked, compressed store for AF3/Boltz embeddings and distograms")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pack_parser = subparsers.add_parser("pack", help="Add .npz files to the store")
+    pack_parser.add_argument("store", help="Store directory")
+    pack_parser.add_argument("inputs", nargs="+", help=".npz files, or directories to search for them")
+    pack_parser.add_argument("--float16", action="store_true", help="Downcast floating point arrays to float16")
+    pack_parser.add_argument("--codec", choices=CODECS, default="zlib",
+                             help="zlib compressed chunks, or .npy files that can be memory-mapped (default: zlib)")
+    pack_parser.add_argument("--level", type=int, default=6, help="zlib compression level (default: 6)")
+    pack_parser.add_argument("--chunk-mb", type=float, default=4, help="Uncompressed chunk size in MB (default: 4)")
+    pack_parser.add_argument("--remove", action="store_true", help="Remove the original files after packing")
+
+    list_parser = subparsers.add_parser("list", help="List the arrays in the store")
+    list_parser.add_argument("store", help="Store directory")
+    list_parser.add_argument("complex", nargs="?", help="Only list the arrays of this complex")
+
+    get_parser = subparsers.add_parser("get", help="Write one array, or a range of its rows, to a .npy file")
+    get_parser.add_argument("store", help="Store directory")
+    get_parser.add_argument("complex", help="Complex (foldid)")
+    get_parser.add_argument("array", help="Array name, e.g. seed-1_embeddings/pair_embeddings or embeddings/z")
+    get_parser.add_argument("--rows", type=parse_rows, help="Rows of the first axis as start:stop")
+    get_parser.add_argument("--output", "-o", required=True, help="Output .npy file")
+
+    verify_parser = subparsers.add_parser("verify", help="Check the store, and its round trip against the originals")
+    verify_parser.add_argument("store", help="Store directory")
+    verify_parser.add_argument("inputs", nargs="*", help="Original .npz files or directories to compare with")
+    verify_parser.add_argument("--max-rel-error", type=float, default=1e-3,
+                               help="Largest error of downcast arrays relative to their largest value (default: 0.001)")
+
+    args = parser.parse_args()
+
+    if args.command != "pack" and not (Path(args.store) / INDEX_FILE).exists():
+        print(f"Error: Store '{args.store}' does not exist")
+        sys.exit(1)
+
+    store = EmbeddingStore(args.store)
+
+    if args.command == "pack":
+        pack_files(store, find_arrays(args.inputs), args)
+    elif args.command == "list":
+        for complex_id, arrays in sorted(store.complexes.items()):
+            if args.complex and complex_id != args.complex.lower():
+                continue
+            for name, entry in sorted(arrays.items()):
+                print(f"{complex_id}\t{name}\t{entry['dtype']}\t{'x'.join(map(str, entry['shape']))}\t"
+                      f"{format_bytes(entry['bytes'])}")
+    elif args.command == "get":
+        try:
+            array = store.read(args.complex, args.array, args.rows)
+        except KeyError as e:
+            print(f"Error: {e.args[0]}")
+            sys.exit(1)
+        np.save(args.output, array)
+        print(f"Wrote {args.output} {array.dtype} {'x'.join(map(str, array.shape))}")
+    elif args.command == "verify":
+        if not verify(store, find_arrays(args.inputs), args.max_rel_error):
+            sys.exit(1)
+        print("Store verified")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Indexes the a3m MSAs written by the ColabFold screen by foldid and stages the MSAs of the
+top ranked pairs as colabfold_batch inputs, so a refold skips MSA generation.
+"""
+
+import argparse
+import csv
+import glob
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+
+def index_a3m_files(screen_dir: str) -> Dict[str, dict]:
+    """
+    Index the a3m files below a ColabFold screen directory.
+
+    Returns:
+        dict: foldid -> {"a3m", "query_lengths", "num_sequences"}
+    """
+    index = {}
+    for a3m in sorted(glob.glob(os.path.join(screen_dir, "**", "*.a3m"), recursive=True)):
+        query_lengths = ""
+        num_sequences = 0
+        with open(a3m, "r") as f:
+            for line in f:
+                if line.startswith("#") and not num_sequences:
+                    # Complex MSAs start with '#<len1>,<len2>\t<copies>'
+                    query_lengths = line[1:].split("\t")[0].strip()
+                elif line.startswith(">"):
+                    num_sequences += 1
+        index[Path(a3m).stem] = {
+            "a3m": os.path.abspath(a3m),
+            "query_lengths": query_lengths,
+            "num_sequences": num_sequences,
+        }
+    return index
+
+
+def write_index(index: Dict[str, dict], output_file: str) -> None:
+    """Write the a3m index as a TSV file."""
+    with open(output_file, "w") as f:
+        f.write("foldid\ta3m\tquery_lengths\tnum_sequences\n")
+        for foldid, entry in index.items():
+            f.write(f"{foldid}\t{entry['a3m']}\t{entry['query_lengths']}\t{entry['num_sequences']}\n")
+
+
+def read_top_foldids(ranked_file: str, top: int) -> List[str]:
+    """Read the foldids of the top ranked pairs from a rank_af.py TSV."""
+    with open(ranked_file, "r", newline="") as f:
+        rows = list(csv.DictReader(f, delimiter="\t"))
+    # Pairs recombined from prey windows refold their best window
+    return [row.get("window_foldid") or row["foldid"] for row in rows[:top]]
+
+
+def stage_top(index: Dict[str, dict], foldids: List[str], stage_dir: str, copy: bool) -> List[str]:
+    """
+    Place the a3m files of the given foldids in stage_dir as <foldid>.a3m.
+
+    Returns:
+        list: foldids without an a3m file, which need MSA generation from FASTA
+    """
+    Path(stage_dir).mkdir(parents=True, exist_ok=True)
+    missing = []
+    for foldid in foldids:
+        entry = index.get(foldid)
+        if entry is None:
+            missing.append(foldid)
+            continue
+        target = Path(stage_dir) / f"{foldid}.a3m"
+        if target.exists() or target.is_symlink():
+            target.unlink()
+        if copy:
+            shutil.copyfile(entry["a3m"], target)
+        else:
+            target.symlink_to(entry["a3m"])
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index ColabFold screen MSAs and stage them for a refold")
+    parser.add_argument("screen_dir", help="ColabFold screen result directory (<outdir>/colabfold/screen)")
+    parser.add_argument(
+        "--output", "-o", default="a3m_index.tsv", help="Output index TSV filename (default: a3m_index.tsv)"
+    )
+    parser.add_argument("--ranked", help="Ranked TSV from rank_af.py to select the pairs to stage")
+    parser.add_argument("--top", type=int, default=10, help="Number of top ranked pairs to stage (default: 10)")
+    parser.add_argument("--stage-dir", default="toprank_a3m", help="Directory for staged a3m files (default: toprank_a3m)")
+    parser.add_argument("--copy", action="store_true", help="Copy the a3m files instead of symlinking them")
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.screen_dir):
+        print(f"Error: Screen directory '{args.screen_dir}' does not exist")
+        sys.exit(1)
+
+    index = index_a3m_files(args.screen_dir)
+    write_index(index, args.output)
+    print(f"Indexed {len(index)} a3m files in {args.output}")
+
+    if args.ranked:
+        foldids = read_top_foldids(args.ranked, args.top)
+        missing = stage_top(index, foldids, args.stage_dir, args.copy)
+        print(f"Staged {len(foldids) - len(missing)} a3m files in {args.stage_dir}")
+        for foldid in missing:
+            print(f"No a3m file found for {foldid}, it needs MSA generation")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Script to compute coordinate based interface scores from predicted Colabfold, Boltz, or Alphafold3 models.
+Parses the top ranked mmCIF/PDB model of every fold, finds inter-chain contacts with a cell list
+and reports interface residue counts, interface pLDDT and pDockQ for each fold.
+Optionally joins the scores into the ranked TSV written by rank_af.py.
+"""
+
+import argparse
+import glob
+import math
+import os
+import re
+import sys
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from compressed_io import open_text
+
+# Top ranked model file of each fold per mode
+MODEL_PATTERNS = {
+    "alphafold3": ["*_model.cif"],
+    "boltz": ["*_model_0.cif", "*_model_0.pdb"],
+    "colabfold": ["*_unrelaxed_rank_001_*.pdb"],
+}
+
+# Suffixes stripped from model file names and rank_af.py foldids to match them
+FOLDID_SUFFIX_RE = {
+    "alphafold3": re.compile(r"(_model|_summary_confidences)$"),
+    "boltz": re.compile(r"_model_0$"),
+    "colabfold": re.compile(r"(_unrelaxed_rank_001_.*|_toprank)$"),
+}
+
+AMINO_ACIDS = {
+    "ALA", "ARG", "ASN", "ASP", "CYS", "GLN", "GLU", "GLY", "HIS", "ILE",
+    "LEU", "LYS", "MET", "PHE", "PRO", "SER", "THR", "TRP", "TYR", "VAL", "MSE",
+}
+
+SCORE_HEADERS = ["num_chains", "num_contacts", "interface_residues", "interface_plddt", "pdockq"]
+
+
+def normalize_foldid(name: str, mode: str) -> str:
+    """Strip mode specific suffixes so model files and ranked foldids can be matched."""
+    return FOLDID_SUFFIX_RE[mode].sub("", name).lower()
+
+
+def parse_cif_atoms(path: str) -> List[Tuple[str, str, str, str, float, float, float, float]]:
+    """Read (chain, residue number, residue name, atom name, x, y, z, B-factor) of the first model of a mmCIF file."""
+    atoms = []
+    fields: List[str] = []
+    index: Optional[Dict[str, int]] = None
+    in_loop = False
+    first_model = None
+    with open(path, "r") as f:
+        for line in f:
+            if line.startswith("_atom_site."):
+                fields.append(line.strip().split(".", 1)[1])
+                in_loop = True
+                continue
+            if not in_loop:
+                continue
+            if not line.startswith(("ATOM", "HETATM")):
+                if atoms or line.startswith(("#", "loop_", "_")):
+                    break
+                continue
+            if not fields:
+                continue
+            if index is None:
+                # Column positions are looked up once, the atom lines are then split and indexed
+                index = {name: i for i, name in enumerate(fields)}
+                missing = [name for name in ("Cartn_x", "Cartn_y", "Cartn_z") if name not in index]
+                if missing:
+                    raise KeyError(", ".join(missing))
+                model_col = index.get("pdbx_PDB_model_num")
+                chain_col = index.get("auth_asym_id", index.get("label_asym_id"))
+                seq_col = index.get("label_seq_id")
+                auth_seq_col = index.get("auth_seq_id")
+                comp_col = index.get("label_comp_id")
+                atom_col = index.get("label_atom_id")
+                x_col, y_col, z_col = index["Cartn_x"], index["Cartn_y"], index["Cartn_z"]
+                b_col = index.get("B_iso_or_equiv")
+            values = line.split()
+            if model_col is not None:
+                if first_model is None:
+                    first_model = values[model_col]
+                elif values[model_col] != first_model:
+                    break
+            seq_id = values[seq_col] if seq_col is not None else "."
+            if seq_id in (".", "?"):
+                seq_id = values[auth_seq_col] if auth_seq_col is not None else "0"
+            atoms.append((
+                values[chain_col] if chain_col is not None else None,
+                seq_id,
+                values[comp_col] if comp_col is not None else "",
+                values[atom_col].strip('"') if atom_col is not None else "",
+                float(values[x_col]),
+                float(values[y_col]),
+                float(values[z_col]),
+                float(values[b_col]) if b_col is not None else 0.0,
+            ))
+    return atoms
+
+
+def parse_pdb_atoms(path: str) -> List[Tuple[str, str, str, str, float, float, float, float]]:
+    """Read (chain, residue number, residue name, atom name, x, y, z, B-factor) of the first model of a PDB file."""
+    atoms = []
+    with open(path, "r") as f:
+        for line in f:
+            if line.startswith("ENDMDL"):
+                break
+            if not line.startswith(("ATOM", "HETATM")):
+                continue
+            atoms.append((
+                line[21],
+                line[22:27].strip(),
+                line[17:20].strip(),
+                line[12:16].strip(),
+                float(line[30:38]),
+                float(line[38:46]),
+                float(line[46:54]),
+                float(line[60:66] or 0.0),
+            ))
+    return atoms
+
+
+def representative_points(atoms: list) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Reduce atoms to the points used for contacts.
+
+    Amino acids are represented by CB (CA for glycine). Nucleic acids and ligands keep all
+    heavy atoms. Returns coordinates, chain index, residue index and pLDDT per point.
+    """
+    coords = []
+    chain_index = []
+    residue_index = []
+    plddt = []
+    chains: Dict[str, int] = {}
+    residues: Dict[Tuple[str, str], int] = {}
+
+    for chain, seq_id, res_name, atom_name, x, y, z, bfactor in atoms:
+        if res_name in AMINO_ACIDS:
+            if atom_name != ("CA" if res_name == "GLY" else "CB"):
+                continue
+        elif atom_name.startswith("H"):
+            continue
+        chain_id = chains.setdefault(chain, len(chains))
+        residue_id = residues.setdefault((chain, seq_id), len(residues))
+        coords.append((x, y, z))
+        chain_index.append(chain_id)
+        residue_index.append(residue_id)
+        plddt.append(bfactor)
+
+    plddt = np.asarray(plddt, dtype=float)
+    # Some writers store pLDDT in 0-1 instead of 0-100
+    if plddt.size and plddt.max() <= 1.0:
+        plddt = plddt * 100
+    return (
+        np.asarray(coords, dtype=float).reshape(-1, 3),
+        np.asarray(chain_index, dtype=np.int64),
+        np.asarray(residue_index, dtype=np.int64),
+        plddt,
+    )
+
+
+def find_interchain_contacts(coords: np.ndarray, chain_index: np.ndarray, cutoff: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return index pairs (i, j) of points on different chains closer than cutoff.
+
+    Points are binned into a grid of cutoff sized cells, so only points in the same or
+    neighbouring cells are compared instead of all N^2 pairs.
+    """
+    cells: Dict[Tuple[int, int, int], List[int]] = {}
+    for i, cell in enumerate(map(tuple, np.floor(coords / cutoff).astype(np.int64))):
+        cells.setdefault(cell, []).append(i)
+    cells = {cell: np.asarray(members) for cell, members in cells.items()}
+
+    # Half of the 26 neighbours plus the cell itself visits every cell pair once
+    offsets = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1) if (dx, dy, dz) > (0, 0, 0)]
+
+    cutoff_sq = cutoff * cutoff
+    pairs_i = []
+    pairs_j = []
+    for (cx, cy, cz), members in cells.items():
+        for offset in [(0, 0, 0)] + offsets:
+            neighbours = cells.get((cx + offset[0], cy + offset[1], cz + offset[2]))
+            if neighbours is None:
+                continue
+            diff = coords[members][:, None, :] - coords[neighbours][None, :, :]
+            close = (np.einsum("ijk,ijk->ij", diff, diff) <= cutoff_sq)
+            close &= chain_index[members][:, None] != chain_index[neighbours][None, :]
+            if offset == (0, 0, 0):
+                close = np.triu(close, k=1)
+            i, j = np.nonzero(close)
+            pairs_i.append(members[i])
+            pairs_j.append(neighbours[j])
+
+    if not pairs_i:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(pairs_i), np.concatenate(pairs_j)
+
+
+def pdockq(interface_plddt: float, num_contacts: int) -> float:
+    """pDockQ from Bryant et al. 2022 (Nat Commun 13, 6028)."""
+    if num_contacts == 0:
+        return 0.0
+    x = interface_plddt * math.log10(num_contacts)
+    return 0.724 / (1 + math.exp(-0.052 * (x - 152.611))) + 0.018
+
+
+def score_model(model_file: str, cutoff: float = 8.0) -> Optional[dict]:
+    """Compute interface scores for one model file."""
+    try:
+        if model_file.endswith(".cif"):
+            atoms = parse_cif_atoms(model_file)
+        else:
+            atoms = parse_pdb_atoms(model_file)
+    except (IOError, ValueError, KeyError, IndexError) as e:
+        print(f"Error processing {model_file}: {e}")
+        return None
+
+    coords, chain_index, residue_index, plddt = representative_points(atoms)
+    i, j = find_interchain_contacts(coords, chain_index, cutoff)
+
+    # Count contacts between residues, not between representative points
+    residue_pairs = {(a, b) if a < b else (b, a) for a, b in zip(residue_index[i].tolist(), residue_index[j].tolist())}
+    interface_points = np.unique(np.concatenate([i, j]))
+    interface_residues = np.unique(residue_index[interface_points])
+    interface_plddt = float(plddt[interface_points].mean()) if interface_points.size else 0.0
+
+    return {
+        "model": model_file,
+        "num_chains": int(np.unique(chain_index).size),
+        "num_contacts": len(residue_pairs),
+        "interface_residues": int(interface_residues.size),
+        "interface_plddt": round(interface_plddt, 2),
+        "pdockq": round(pdockq(interface_plddt, len(residue_pairs)), 4),
+    }
+
+
+def find_models(input_dir: str, mode: str) -> List[str]:
+    """Find the top ranked model of every fold below input_dir."""
+    models = []
+    for pattern in MODEL_PATTERNS[mode]:
+        models.extend(glob.glob(os.path.join(input_dir, "**", pattern), recursive=True))
+    # Alphafold3 also writes *_model.cif files for each seed/sample, keep the top ranked one
+    return sorted(m for m in models if not re.search(r"seed-\d+_sample-\d+", m))
+
+
+def write_scores(scores: List[dict], output_file: str, mode: str) -> None:
+    """Write the interface scores of every model to a TSV file."""
+    headers = ["foldid"] + SCORE_HEADERS
+    with open(output_file, "w") as f:
+        f.write("\t".join(headers) + "\n")
+        for row in scores:
+            foldid = FOLDID_SUFFIX_RE[mode].sub("", Path(row["model"]).stem)
+            f.write("\t".join([foldid] + [str(row[header]) for header in SCORE_HEADERS]) + "\n")
+
+
+def join_ranked(scores: List[dict], ranked_file: str, output_file: str, mode: str) -> None:
+    """Add the interface scores to the rows of a rank_af.py TSV, keeping its order.
+
+    The score columns are inserted before the last column, so the rank score stays last.
+    """
+    by_foldid = {normalize_foldid(Path(row["model"]).stem, mode): row for row in scores}
+
+    matched = 0
+    with open_text(ranked_file) as f_in, open_text(output_file, "w") as f_out:
+        header = f_in.readline().rstrip("\n").split("\t")
+        # Rows recombined from prey windows point to the model of their best window
+        key_column = header.index("window_foldid") if "window_foldid" in header else 0
+        f_out.write("\t".join(header[:-1] + SCORE_HEADERS + header[-1:]) + "\n")
+        for line in f_in:
+            values = line.rstrip("\n").split("\t")
+            row = by_foldid.get(normalize_foldid(values[key_column], mode))
+            if row:
+                matched += 1
+                scores_values = [str(row[header]) for header in SCORE_HEADERS]
+            else:
+                scores_values = [""] * len(SCORE_HEADERS)
+            f_out.write("\t".join(values[:-1] + scores_values + values[-1:]) + "\n")
+
+    print(f"Joined interface scores for {matched} folds into {output_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute interface scores from predicted models")
+    parser.add_argument(
+        "--input-dir",
+        "-i",
+        default=".",
+        help="Directory searched recursively for model files (default: current directory)",
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        default="interface_scores.tsv",
+        help="Output TSV filename (default: interface_scores.tsv)",
+    )
+    parser.add_argument(
+        "--mode", required=True, help="Set the input format. Options: colabfold, alphafold3, boltz"
+    )
+    parser.add_argument("--ranked", help="Ranked TSV from rank_af.py to join the scores into")
+    parser.add_argument(
+        "--ranked-output",
+        default="interface_ranked_results.tsv",
+        help="Output filename for the joined ranked TSV (default: interface_ranked_results.tsv)",
+    )
+    parser.add_argument(
+        "--cutoff", type=float, default=8.0, help="Contact distance cutoff in Angstrom (default: 8.0)"
+    )
+    parser.add_argument(
+        "--workers", "-w", type=int, default=os.cpu_count(), help="Number of parallel workers (default: all CPUs)"
+    )
+
+    args = parser.parse_args()
+
+    if args.mode not in MODEL_PATTERNS:
+        print(f"Error: --mode must be one of {', '.join(MODEL_PATTERNS)}")
+        sys.exit(1)
+
+    if not os.path.isdir(args.input_dir):
+        print(f"Error: Input directory '{args.input_dir}' does not exist")
+        sys.exit(1)
+
+    models = find_models(args.input_dir, args.mode)
+    if not models:
+        print(f"No model files found in {args.input_dir}")
+        return
+
+    print(f"Found {len(models)} model files")
+
+    with Pool(processes=args.workers) as pool:
+        jobs = [(model, args.cutoff) for model in models]
+        scores = [row for row in pool.starmap(score_model, jobs, chunksize=16) if row]
+
+    scores.sort(key=lambda row: row["pdockq"], reverse=True)
+    write_scores(scores, args.output, args.mode)
+    print(f"Successfully wrote {len(scores)} rows to {args.output}")
+
+    if args.ranked:
+        join_ranked(scores, args.ranked, args.ranked_output, args.mode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+Caching proxy for the ColabFold MMseqs2 MSA server API used by ColabFold (--host-url)
+and Boltz (--msa_server_url).
+Unpaired MSA queries are split into one upstream job per sequence, so the bait shared by all
+pairs of a screen is searched once; the combined result is assembled from the per-sequence
+results. Identical jobs are coalesced, results are cached on disk by query hash with LRU
+eviction, and the number of concurrent upstream jobs is limited.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import tarfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Statuses that make the MSA clients resubmit their query
+RETRY_STATUSES = {"RATELIMIT", "UNKNOWN"}
+
+# Results used within this many seconds are never evicted, so clients still polling
+# for a result can download it
+EVICTION_GRACE_SECONDS = 600
+
+# The MSA clients number the sequences of a query from 101, per-sequence jobs use the first id
+FIRST_ID = "101"
+
+
+class Job:
+    """An upstream MSA job shared by all clients submitting the same query."""
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.status = "PENDING"
+        self.error: Optional[str] = None
+
+
+class MSABroker:
+    def __init__(self, upstream: str, cache_dir: str, max_cache_bytes: int, max_concurrent: int,
+                 poll_interval: float = 5.0, timeout: float = 60.0) -> None:
+        self.upstream = upstream.rstrip("/")
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_cache_bytes = max_cache_bytes
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.upstream_slots = threading.BoundedSemaphore(max_concurrent)
+        self.lock = threading.Lock()
+        self.jobs: Dict[str, Job] = {}
+        # Split queries: ticket id -> (client sequence id, per-sequence key) of every sequence
+        self.composites: Dict[str, List[Tuple[str, str]]] = {}
+        # Per-sequence key -> (endpoint, form), to restart jobs whose result was lost
+        self.queries: Dict[str, Tuple[str, Dict[str, str]]] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "upstream_jobs": 0, "errors": 0, "evictions": 0,
+                      "split_queries": 0}
+
+        # Least recently used entries first
+        self.cache_index: "OrderedDict[str, int]" = OrderedDict()
+        entries = sorted(self.cache_dir.glob("*/*.tar.gz"), key=lambda p: p.stat().st_mtime)
+        for path in entries:
+            self.cache_index[path.name.removesuffix(".tar.gz")] = path.stat().st_size
+        logging.info(f"Loaded {len(self.cache_index)} cached MSA results from {self.cache_dir}")
+
+    @staticmethod
+    def query_key(endpoint: str, form: Dict[str, str]) -> str:
+        """Hash of the submission endpoint and the query fields that determine the result."""
+        parts = [endpoint] + [f"{name}={form[name]}" for name in sorted(form) if name != "email"]
+        return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+    def cache_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.tar.gz"
+
+    def lookup(self, key: str) -> Optional[Path]:
+        """Return the cached result of a key and mark it as recently used."""
+        with self.lock:
+            if key not in self.cache_index:
+                return None
+            self.cache_index.move_to_end(key)
+        path = self.cache_path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self.lock:
+                self.cache_index.pop(key, None)
+            return None
+        return path
+
+    def add_to_cache(self, key: str, tmp_path: Path) -> None:
+        """Move a downloaded result into the cache and evict least recently used results."""
+        path = self.cache_path(key)
+        path.parent.mkdir(exist_ok=True)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.cache_index[key] = path.stat().st_size
+            self.cache_index.move_to_end(key)
+            total = sum(self.cache_index.values())
+            while total > self.max_cache_bytes:
+                old_key, size = next(iter(self.cache_index.items()))
+                old_path = self.cache_path(old_key)
+                if old_path.exists() and time.time() - old_path.stat().st_mtime < EVICTION_GRACE_SECONDS:
+                    break
+                del self.cache_index[old_key]
+                old_path.unlink(missing_ok=True)
+                total -= size
+                self.stats["evictions"] += 1
+
+    @staticmethod
+    def parse_query(query: str) -> List[Tuple[str, str]]:
+        """Return the (id, sequence) entries of the FASTA formatted query field."""
+        entries: List[List[str]] = []
+        for line in query.splitlines():
+            line = line.strip()
+            if line.startswith(">"):
+                entries.append([line[1:].strip(), ""])
+            elif line and entries:
+                entries[-1][1] += line
+        return [(seq_id, seq) for seq_id, seq in entries]
+
+    def submit(self, endpoint: str, form: Dict[str, str]) -> Dict[str, str]:
+        """Handle a ticket submission.
+
+        Unpaired MSA queries are split into one job per sequence. Paired MSAs depend on all
+        sequences of the complex and are run as one job.
+        """
+        entries = self.parse_query(form.get("q", "")) if endpoint == "ticket/msa" else []
+        if not entries:
+            key = self.query_key(endpoint, form)
+            return {"id": key, "status": self.start(key, endpoint, form)}
+
+        parts = []
+        for seq_id, seq in entries:
+            single = dict(form, q=f">{FIRST_ID}\n{seq}\n")
+            key = self.query_key(endpoint, single)
+            with self.lock:
+                self.queries[key] = (endpoint, single)
+            self.start(key, endpoint, single)
+            parts.append((seq_id, key))
+        # Prefixed so a single sequence query does not share its id with its per-sequence job
+        ticket = self.query_key(f"split/{endpoint}", form)
+        with self.lock:
+            self.composites[ticket] = parts
+            self.stats["split_queries"] += 1
+        return self.status(ticket)
+
+    def start(self, key: str, endpoint: str, form: Dict[str, str]) -> str:
+        """Serve a job from cache, join the running job, or start a new one, returning its status."""
+        if self.lookup(key):
+            with self.lock:
+                self.stats["hits"] += 1
+            return "COMPLETE"
+
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is not None and job.status != "ERROR":
+                self.stats["coalesced"] += 1
+                return job.status
+            job = Job(key)
+            self.jobs[key] = job
+            self.stats["misses"] += 1
+
+        threading.Thread(target=self.run_job, args=(job, endpoint, form), daemon=True).start()
+        return job.status
+
+    def composite_status(self, ticket: str, parts: List[Tuple[str, str]]) -> Dict[str, str]:
+        """Status of a split query: complete once every sequence is, failed if any sequence failed."""
+        statuses = []
+        for _, key in parts:
+            if self.lookup(key):
+                statuses.append("COMPLETE")
+                continue
+            with self.lock:
+                job = self.jobs.get(key)
+                query = self.queries.get(key)
+            if job is None and query:
+                # Evicted or failed before, run it again
+                statuses.append(self.start(key, *query))
+            else:
+                statuses.append(job.status if job else "UNKNOWN")
+        if "ERROR" in statuses:
+            with self.lock:
+                for _, key in parts:
+                    job = self.jobs.get(key)
+                    if job is not None and job.status == "ERROR":
+                        del self.jobs[key]
+                self.composites.pop(ticket, None)
+            return {"id": ticket, "status": "ERROR"}
+        if all(status == "COMPLETE" for status in statuses):
+            return {"id": ticket, "status": "COMPLETE"}
+        return {"id": ticket, "status": "RUNNING" if "RUNNING" in statuses else "PENDING"}
+
+    def composite_result(self, ticket: str) -> Optional[bytes]:
+        """Assemble the result archive of a split query from its per-sequence results.
+
+        The a3m files hold one block per sequence, headed by its id and ended by a null byte;
+        the m8 template hits start with the id. Both are renumbered to the ids of the client.
+        """
+        with self.lock:
+            parts = self.composites.get(ticket)
+        if parts is None:
+            return None
+        files: Dict[str, List[bytes]] = {}
+        for seq_id, key in parts:
+            path = self.lookup(key)
+            if path is None:
+                return None
+            with tarfile.open(path) as tar:
+                for member in tar.getmembers():
+                    if not member.isfile():
+                        continue
+                    data = tar.extractfile(member).read()
+                    if member.name.endswith(".a3m"):
+                        text = data.decode().replace("\x00", "")
+                        text = re.sub(rf"^>{FIRST_ID}\b", f">{seq_id}", text, count=1)
+                        data = (text if text.endswith("\n") else text + "\n").encode() + b"\x00"
+                    elif member.name.endswith(".m8"):
+                        lines = [line.split("\t", 1) for line in data.decode().splitlines()]
+                        data = "".join("\t".join([seq_id] + fields[1:]) + "\n" if fields[0] == FIRST_ID
+                                       else "\t".join(fields) + "\n" for fields in lines).encode()
+                    elif member.name in files:
+                        # Other files do not depend on the sequence, keep the first
+                        continue
+                    files.setdefault(member.name, []).append(data)
+
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+            for name, blocks in files.items():
+                data = b"".join(blocks)
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = int(time.time())
+                tar.addfile(info, io.BytesIO(data))
+        return buffer.getvalue()
+
+    def status(self, key: str) -> Dict[str, str]:
+        """Status of a ticket as reported to the clients."""
+        with self.lock:
+            parts = self.composites.get(key)
+        if parts is not None:
+            return self.composite_status(key, parts)
+        if self.lookup(key):
+            return {"id": key, "status": "COMPLETE"}
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is None:
+                return {"id": key, "status": "UNKNOWN"}
+            if job.status == "ERROR":
+                # Report the error once, a later submission retries the query
+                del self.jobs[key]
+            return {"id": key, "status": job.status}
+
+    def run_job(self, job: Job, endpoint: str, form: Dict[str, str]) -> None:
+        """Run one upstream job, limited by the number of upstream slots."""
+        with self.upstream_slots:
+            try:
+                job.status = "RUNNING"
+                ticket = self.upstream_submit(endpoint, form)
+                self.upstream_wait(ticket)
+                self.upstream_download(ticket, job.key)
+                with self.lock:
+                    job.status = "COMPLETE"
+                    self.jobs.pop(job.key, None)
+            except Exception as e:  # noqa: BLE001
+                logging.error(f"MSA job {job.key[:12]} failed: {e}")
+                with self.lock:
+                    job.status = "ERROR"
+                    job.error = str(e)
+                    self.stats["errors"] += 1
+
+    def _request(self, path: str, data: Optional[Dict[str, str]] = None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(f"{self.upstream}/{path}", data=body)
+        return urllib.request.urlopen(request, timeout=self.timeout)  # noqa: S310
+
+    def upstream_submit(self, endpoint: str, form: Dict[str, str]) -> str:
+        """Submit a query upstream, backing off while the server rate limits us."""
+        wait = self.poll_interval
+        while True:
+            with self._request(endpoint, form) as response:
+                ticket = json.load(response)
+            if ticket.get("status") in RETRY_STATUSES:
+                logging.warning(f"Upstream returned {ticket['status']}, retrying in {wait:.0f} seconds")
+                time.sleep(wait + random.uniform(0, wait / 5))
+                wait = min(wait * 2, 300)
+                continue
+            if ticket.get("status") in ("ERROR", "MAINTENANCE"):
+                raise RuntimeError(f"Upstream returned {ticket['status']}")
+            with self.lock:
+                self.stats["upstream_jobs"] += 1
+            return ticket["id"]
+
+    def upstream_wait(self, ticket: str) -> None:
+        """Poll an upstream ticket until it is complete."""
+        while True:
+            with self._request(f"ticket/{ticket}") as response:
+                status = json.load(response).get("status")
+            if status == "COMPLETE":
+                return
+            if status not in ("PENDING", "RUNNING"):
+                raise RuntimeError(f"Upstream ticket {ticket} returned {status}")
+            time.sleep(self.poll_interval + random.uniform(0, self.poll_interval / 5))
+
+    def upstream_download(self, ticket: str, key: str) -> None:
+        """Download an upstream result into the cache."""
+        tmp_path = self.cache_dir / f".{key}.{threading.get_ident()}.tmp"
+        with self._request(f"result/download/{ticket}") as response, open(tmp_path, "wb") as f:
+            shutil.copyfileobj(response, f)
+        self.add_to_cache(key, tmp_path)
+
+    def report(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.stats, cached=len(self.cache_index), cache_bytes=sum(self.cache_index.values()),
+                        running=len(self.jobs))
+
+
+class BrokerHandler(BaseHTTPRequestHandler):
+    broker: MSABroker
+
+    def send_json(self, payload: dict, code: int = 200) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        endpoint = self.path.strip("/")
+        length = int(self.headers.get("Content-Length", 0))
+        form = dict(urllib.parse.parse_qsl(self.rfile.read(length).decode(), keep_blank_values=True))
+        if endpoint in ("ticket/msa", "ticket/pair"):
+            self.send_json(self.broker.submit(endpoint, form))
+        else:
+            self.send_json({"status": "ERROR", "error": f"Unsupported endpoint {endpoint}"}, 404)
+
+    def do_GET(self) -> None:
+        path = self.path.strip("/")
+        if path == "broker/stats":
+            self.send_json(self.broker.report())
+        elif path.startswith("ticket/"):
+            self.send_json(self.broker.status(path.removeprefix("ticket/")))
+        elif path.startswith("result/download/"):
+            key = path.removeprefix("result/download/")
+            if key in self.broker.composites:
+                data = self.broker.composite_result(key)
+                if data is None:
+                    self.send_json({"status": "ERROR", "error": "Result not available"}, 404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+            cached = self.broker.lookup(key)
+            if cached is None:
+                self.send_json({"status": "ERROR", "error": "Result not available"}, 404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(cached.stat().st_size))
+            self.end_headers()
+            with open(cached, "rb") as f:
+                shutil.copyfileobj(f, self.wfile)
+        else:
+            self.proxy_get(path)
+
+    def proxy_get(self, path: str) -> None:
+        """Pass other requests (e.g. templates) through to the upstream server uncached."""
+        try:
+            with self.broker._request(path) as response:
+                body = response.read()
+                code = response.status
+        except urllib.error.HTTPError as e:
+            body, code = e.read(), e.code
+        except (urllib.error.URLError, OSError) as e:
+            # Unreachable upstream or timeout, the client still needs a response
+            logging.error(f"Error proxying {path}: {e}")
+            self.send_json({"status": "ERROR", "error": f"Upstream unavailable: {e}"}, 502)
+            return
+        self.send_response(code)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logging.debug(format % args)
+
+
+class BrokerServer(ThreadingHTTPServer):
+    # Many GPU tasks connect at once, the socketserver default backlog of 5 drops connections
+    request_queue_size = 256
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Caching and coalescing proxy for the ColabFold MSA server")
+    parser.add_argument("--upstream", default="http://cfold-db:8888", help="MSA server URL (default: http://cfold-db:8888)")
+    parser.add_argument("--host", default="0.0.0.0", help="Address to listen on (default: 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=8890, help="Port to listen on (default: 8890)")
+    parser.add_argument("--cache-dir", default="msa_cache", help="Directory for cached results (default: msa_cache)")
+    parser.add_argument("--max-cache-gb", type=float, default=50, help="Maximum cache size in GB (default: 50)")
+    parser.add_argument(
+        "--max-concurrent", type=int, default=4, help="Maximum concurrent upstream jobs (default: 4)"
+    )
+    parser.add_argument(
+        "--poll-interval", type=float, default=5, help="Seconds between upstream status checks (default: 5)"
+    )
+
+    args = parser.parse_args()
+
+    broker = MSABroker(args.upstream, args.cache_dir, int(args.max_cache_gb * 1024**3),
+                       args.max_concurrent, args.poll_interval)
+    BrokerHandler.broker = broker
+    server = BrokerServer((args.host, args.port), BrokerHandler)
+    logging.info(f"Forwarding MSA requests on {args.host}:{args.port} to {args.upstream}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logging.info(f"Broker stats: {broker.report()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Plans a second, multi-seed prediction pass for Alphafold3 or Boltz screens.
+Aggregates the per-seed/per-sample scores of finished folds and writes extra-seed inputs
+only for pairs whose score is close to the decision threshold or varies between samples.
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import shutil
+import statistics
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+BOLTZ_CONFIDENCE_RE = re.compile(r"^confidence_(?P<foldid>.+)_model_(?P<sample>\d+)\.json$")
+
+
+def collect_af3_scores(results_dir: str) -> Dict[str, List[float]]:
+    """
+    Collect ranking_score of every seed/sample from Alphafold3 fold directories.
+
+    Reads <foldid>_ranking_scores.csv and falls back to the per-sample
+    summary_confidences.json files if the CSV is missing.
+    """
+    scores = {}
+    for fold_dir in sorted(glob.glob(os.path.join(results_dir, "*", ""))):
+        foldid = Path(fold_dir).name
+        csv_files = glob.glob(os.path.join(fold_dir, "*ranking_scores.csv"))
+        samples = []
+        if csv_files:
+            with open(csv_files[0], "r", newline="") as f:
+                for row in csv.DictReader(f):
+                    samples.append(float(row["ranking_score"]))
+        else:
+            for summary in glob.glob(os.path.join(fold_dir, "seed-*_sample-*", "*summary_confidences.json")):
+                try:
+                    with open(summary, "r") as f:
+                        score = json.load(f).get("ranking_score")
+                except (json.JSONDecodeError, IOError) as e:
+                    print(f"Error processing {summary}: {e}")
+                    continue
+                if isinstance(score, (int, float)):
+                    samples.append(float(score))
+        if samples:
+            scores.setdefault(foldid, []).extend(samples)
+    return scores
+
+
+def collect_boltz_scores(results_dir: str) -> Dict[str, List[float]]:
+    """Collect confidence_score of every diffusion sample from Boltz prediction directories."""
+    scores = {}
+    pattern = os.path.join(results_dir, "**", "confidence_*_model_*.json")
+    for json_file in sorted(glob.glob(pattern, recursive=True)):
+        match = BOLTZ_CONFIDENCE_RE.match(Path(json_file).name)
+        if not match:
+            continue
+        try:
+            with open(json_file, "r") as f:
+                score = json.load(f).get("confidence_score")
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Error processing {json_file}: {e}")
+            continue
+        if isinstance(score, (int, float)):
+            scores.setdefault(match.group("foldid"), []).append(float(score))
+    return scores
+
+
+def plan(scores: Dict[str, List[float]], threshold: float, margin: float, spread: float) -> List[dict]:
+    """
+    Summarize the scores of each pair and select pairs for extra seeds.
+
+    A pair is selected if its best score is within `margin` of `threshold`, or if the
+    standard deviation of its sample scores is at least `spread`.
+    """
+    rows = []
+    for foldid, samples in scores.items():
+        best = max(samples)
+        std = statistics.pstdev(samples) if len(samples) > 1 else 0.0
+        reasons = []
+        if abs(best - threshold) <= margin:
+            reasons.append("near_threshold")
+        if std >= spread:
+            reasons.append("high_spread")
+        rows.append({
+            "foldid": foldid,
+            "num_samples": len(samples),
+            "best_score": round(best, 4),
+            "mean_score": round(statistics.fmean(samples), 4),
+            "std_score": round(std, 4),
+            "selected": int(bool(reasons)),
+            "reason": ",".join(reasons),
+        })
+
+    rows.sort(key=lambda row: row["best_score"], reverse=True)
+    return rows
+
+
+def index_inputs(inputs_dir: str, mode: str) -> Dict[str, Path]:
+    """
+    Map the lowercased foldid to its input file.
+
+    Alphafold3 lowercases the names of its output directories, so the lookup is case
+    insensitive. *_data.json files with MSAs are preferred over the preprocessing JSONs.
+    """
+    index = {}
+    if mode == "alphafold3":
+        for path in sorted(Path(inputs_dir).glob("*.json"), key=lambda p: p.name.endswith("_data.json")):
+            index[path.name.removesuffix(".json").removesuffix("_data").lower()] = path
+    else:
+        for path in Path(inputs_dir).glob("*.fasta"):
+            index[path.stem.lower()] = path
+    return index
+
+
+def write_extra_seed_inputs(rows: List[dict], inputs_dir: str, output_dir: str, mode: str, seeds: List[int]) -> int:
+    """
+    Write inputs for the selected pairs.
+
+    Alphafold3: one JSON per pair with `modelSeeds` set to the extra seeds.
+    Boltz: one directory per seed (seed_<n>/), to be run with `--seed <n>`.
+    """
+    inputs = index_inputs(inputs_dir, mode)
+    written = 0
+    for row in rows:
+        if not row["selected"]:
+            continue
+        input_file = inputs.get(row["foldid"].lower())
+        if input_file is None:
+            print(f"No input file found for {row['foldid']} in {inputs_dir}")
+            continue
+
+        if mode == "alphafold3":
+            with open(input_file, "r") as f:
+                data = json.load(f)
+            data["modelSeeds"] = seeds
+            with open(Path(output_dir) / input_file.name, "w") as f:
+                json.dump(data, f, indent=2)
+        else:
+            for seed in seeds:
+                seed_dir = Path(output_dir) / f"seed_{seed}"
+                seed_dir.mkdir(exist_ok=True)
+                shutil.copyfile(input_file, seed_dir / input_file.name)
+        written += 1
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan extra-seed predictions for uncertain pairs")
+    parser.add_argument(
+        "--results",
+        "-r",
+        nargs="+",
+        required=True,
+        help="Fold result directories (alphafold3: <outdir>/alphafold3/folds, boltz: <outdir>/boltz/folds). "
+        "Give the directories of all previous passes to pool their samples",
+    )
+    parser.add_argument("--mode", required=True, help="Set the input format. Options: alphafold3, boltz")
+    parser.add_argument(
+        "--inputs",
+        "-i",
+        help="Directory with the inputs to reseed (alphafold3: msa or preprocessing, boltz: preprocessing)",
+    )
+    parser.add_argument("--output-dir", "-o", default="extra_seeds", help="Output directory (default: extra_seeds)")
+    parser.add_argument("--plan", default="seed_plan.tsv", help="Output plan TSV filename (default: seed_plan.tsv)")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Decision threshold on the score (default: 0.5)")
+    parser.add_argument(
+        "--margin", type=float, default=0.1, help="Select pairs whose best score is within this of the threshold (default: 0.1)"
+    )
+    parser.add_argument(
+        "--spread", type=float, default=0.05, help="Select pairs whose sample scores have at least this std (default: 0.05)"
+    )
+    parser.add_argument(
+        "--seeds", default="2,3,4,5", help="Comma separated extra seeds for the selected pairs (default: 2,3,4,5)"
+    )
+
+    args = parser.parse_args()
+
+    if args.mode not in ("alphafold3", "boltz"):
+        print("Error: --mode must be one of alphafold3, boltz")
+        sys.exit(1)
+
+    for results_dir in args.results:
+        if not os.path.isdir(results_dir):
+            print(f"Error: Results directory '{results_dir}' does not exist")
+            sys.exit(1)
+
+    scores = {}
+    for results_dir in args.results:
+        collect = collect_af3_scores if args.mode == "alphafold3" else collect_boltz_scores
+        for foldid, samples in collect(results_dir).items():
+            scores.setdefault(foldid, []).extend(samples)
+
+    if not scores:
+        print("No scores found")
+        return
+
+    # The spread needs several samples per pair, Boltz writes one unless diffusion_samples is set
+    if all(len(samples) == 1 for samples in scores.values()):
+        print("Warning: every pair has a single sample, so only --margin can select pairs. "
+              "Run Boltz with --diffusion_samples > 1 to use --spread")
+
+    rows = plan(scores, args.threshold, args.margin, args.spread)
+
+    headers = list(rows[0].keys())
+    with open(args.plan, "w") as f:
+        f.write("\t".join(headers) + "\n")
+        for row in rows:
+            f.write("\t".join(str(row[header]) for header in headers) + "\n")
+
+    selected = sum(row["selected"] for row in rows)
+    print(f"Selected {selected} of {len(rows)} pairs for extra seeds. Plan written to {args.plan}")
+
+    if args.inputs:
+        seeds = [int(seed) for seed in args.seeds.split(",")]
+        Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+        written = write_extra_seed_inputs(rows, args.inputs, args.output_dir, args.mode, seeds)
+        print(f"Wrote extra-seed inputs for {written} pairs to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -29,13 +29,22 @@ BOLTZ2_AFFINITY_URL_WITH_FALLBACK = [
     "https://huggingface.co/boltz-community/boltz-2/resolve/main/boltz2_aff.ckpt",
 ]
 
-def download_boltz1(cache: Path) -> None:
+def mirror_urls(urls: list, mirror: str = None) -> list:
+    """Replace the download URLs by the same file names on a mirror, if one is given."""
+    if not mirror:
+        return urls
+    return [f"{mirror.rstrip('/')}/{urls[0].rsplit('/', 1)[1]}"]
+
+
+def download_boltz1(cache: Path, mirror: str = None) -> None:
     """Download all the required data for Boltz1.
 
     Parameters
     ----------
     cache : Path
         The cache directory.
+    mirror : str, optional
+        Base URL of a mirror that serves the files by name.
 
     """
     print("Starting Boltz1 downloads...")
@@ -44,7 +53,7 @@ def download_boltz1(cache: Path) -> None:
     ccd = cache / "ccd.pkl"
     if not ccd.exists():
         print(f"Downloading the CCD dictionary to {ccd}")
-        urllib.request.urlretrieve(CCD_URL, str(ccd))  # noqa: S310
+        urllib.request.urlretrieve(mirror_urls([CCD_URL], mirror)[0], str(ccd))  # noqa: S310
         print("CCD dictionary download completed")
     else:
         print("CCD dictionary already exists, skipping")
@@ -53,13 +62,14 @@ def download_boltz1(cache: Path) -> None:
     model = cache / "boltz1_conf.ckpt"
     if not model.exists():
         print(f"Downloading the Boltz1 model weights to {model}")
-        for i, url in enumerate(BOLTZ1_URL_WITH_FALLBACK):
+        urls = mirror_urls(BOLTZ1_URL_WITH_FALLBACK, mirror)
+        for i, url in enumerate(urls):
             try:
                 urllib.request.urlretrieve(url, str(model))  # noqa: S310
                 print("Boltz1 model weights download completed")
                 break
             except Exception as e:  # noqa: BLE001
-                if i == len(BOLTZ1_URL_WITH_FALLBACK) - 1:
+                if i == len(urls) - 1:
                     msg = f"Failed to download Boltz1 model from all URLs. Last error: {e}"
                     raise RuntimeError(msg) from e
                 print(f"Failed to download from {url}, trying next URL...")
@@ -70,13 +80,15 @@ def download_boltz1(cache: Path) -> None:
     print("Boltz1 downloads completed!")
 
 
-def download_boltz2(cache: Path) -> None:
+def download_boltz2(cache: Path, mirror: str = None) -> None:
     """Download all the required data for Boltz2.
 
     Parameters
     ----------
     cache : Path
         The cache directory.
+    mirror : str, optional
+        Base URL of a mirror that serves the files by name.
 
     """
     print("Starting Boltz2 downloads...")
@@ -86,7 +98,7 @@ def download_boltz2(cache: Path) -> None:
     tar_mols = cache / "mols.tar"
     if not tar_mols.exists():
         print(f"Downloading the molecular data to {tar_mols} (this may take a while)")
-        urllib.request.urlretrieve(MOL_URL, str(tar_mols))  # noqa: S310
+        urllib.request.urlretrieve(mirror_urls([MOL_URL], mirror)[0], str(tar_mols))  # noqa: S310
         print("Molecular data download completed")
     else:
         print("Molecular data tar already exists, skipping download")
@@ -103,13 +115,14 @@ def download_boltz2(cache: Path) -> None:
     model = cache / "boltz2_conf.ckpt"
     if not model.exists():
         print(f"Downloading the Boltz2 model weights to {model}")
-        for i, url in enumerate(BOLTZ2_URL_WITH_FALLBACK):
+        urls = mirror_urls(BOLTZ2_URL_WITH_FALLBACK, mirror)
+        for i, url in enumerate(urls):
             try:
                 urllib.request.urlretrieve(url, str(model))  # noqa: S310
                 print("Boltz2 model weights download completed")
                 break
             except Exception as e:  # noqa: BLE001
-                if i == len(BOLTZ2_URL_WITH_FALLBACK) - 1:
+                if i == len(urls) - 1:
                     msg = f"Failed to download Boltz2 model from all URLs. Last error: {e}"
                     raise RuntimeError(msg) from e
                 print(f"Failed to download from {url}, trying next URL...")
@@ -121,13 +134,14 @@ def download_boltz2(cache: Path) -> None:
     affinity_model = cache / "boltz2_aff.ckpt"
     if not affinity_model.exists():
         print(f"Downloading the Boltz2 affinity weights to {affinity_model}")
-        for i, url in enumerate(BOLTZ2_AFFINITY_URL_WITH_FALLBACK):
+        urls = mirror_urls(BOLTZ2_AFFINITY_URL_WITH_FALLBACK, mirror)
+        for i, url in enumerate(urls):
             try:
                 urllib.request.urlretrieve(url, str(affinity_model))  # noqa: S310
                 print("Boltz2 affinity weights download completed")
                 break
             except Exception as e:  # noqa: BLE001
-                if i == len(BOLTZ2_AFFINITY_URL_WITH_FALLBACK) - 1:
+                if i == len(urls) - 1:
                     msg = f"Failed to download Boltz2 affinity model from all URLs. Last error: {e}"
                     raise RuntimeError(msg) from e
                 print(f"Failed to download from {url}, trying next URL...")
@@ -152,6 +166,11 @@ def main():
         type=str,
         help="Boltz mode to use. Options: boltz1 or boltz2"
     )
+    parser.add_argument(
+        "--mirror",
+        type=str,
+        help="Base URL of a mirror to download the files from by name instead of the default URLs"
+    )
     
     args = parser.parse_args()
     
@@ -163,9 +182,9 @@ def main():
     print("Starting parallel downloads...")
     
     if args.mode == 'boltz1':
-        download_boltz1(cache_path)
+        download_boltz1(cache_path, args.mirror)
     elif args.mode == 'boltz2':
-        download_boltz2(cache_path)
+        download_boltz2(cache_path, args.mirror)
     else:
         raise ValueError("Incorrect boltz mode argument. Options: boltz1 or boltz2")
 
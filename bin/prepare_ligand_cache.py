@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+"""
+Script to prepare a shared ligand cache for the SMILES entries of an accession file.
+Each unique SMILES is canonicalised and its conformer is generated once, then written as a
+pickled RDKit molecule in the format Boltz2 reads from its mols directory. tsv2json.py
+--ligand-index then references the cached molecules by code instead of the raw SMILES.
+Conformer generation follows boltz.data.parse.schema (ETKDGv3, UFF optimisation).
+"""
+
+import argparse
+import csv
+import hashlib
+import pickle
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from rdkit import Chem
+from rdkit.Chem import AllChem
+
+INDEX_HEADERS = ["smiles", "canonical_smiles", "code", "num_atoms", "status"]
+CODE_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def read_smiles(tsv_files: List[str]) -> List[str]:
+    """Collect the unique SMILES entries of accession TSV files."""
+    smiles = []
+    for tsv_file in tsv_files:
+        with open(tsv_file, "r", newline="") as f:
+            reader = csv.reader(f, delimiter="\t")
+            header = [column.lower() for column in next(reader)]
+            entry_column = header.index("entry")
+            for row in reader:
+                if row and row[entry_column].startswith("SMILES:"):
+                    smiles.append(row[entry_column].removeprefix("SMILES:"))
+    return list(dict.fromkeys(smiles))
+
+
+def ligand_code(canonical: str, taken: Dict[str, str]) -> str:
+    """Return a 5 character code derived from the canonical SMILES, unique within `taken`.
+
+    Codes start with 'Z' followed by 4 base36 characters of the SMILES hash. A taken code is
+    resolved by probing the following codes in order.
+    """
+    space = len(CODE_ALPHABET) ** 4
+    start = int(hashlib.sha1(canonical.encode()).hexdigest(), 16) % space
+    for offset in range(space):
+        value, chars = (start + offset) % space, []
+        for _ in range(4):
+            value, remainder = divmod(value, len(CODE_ALPHABET))
+            chars.append(CODE_ALPHABET[remainder])
+        code = "Z" + "".join(chars)
+        if taken.get(code, canonical) == canonical:
+            return code
+    raise ValueError(f"No free ligand code left for {canonical}")
+
+
+def compute_3d_conformer(mol: Chem.Mol, seed: int) -> bool:
+    """Embed and optimise one conformer, named 'Computed' as Boltz expects."""
+    options = AllChem.ETKDGv3()
+    options.clearConfs = False
+    options.randomSeed = seed
+    conf_id = AllChem.EmbedMolecule(mol, options)
+    if conf_id == -1:
+        options.useRandomCoords = True
+        conf_id = AllChem.EmbedMolecule(mol, options)
+    if conf_id == -1:
+        return False
+    try:
+        AllChem.UFFOptimizeMolecule(mol, confId=conf_id, maxIters=1000)
+    except RuntimeError:
+        pass
+    conformer = mol.GetConformer(conf_id)
+    conformer.SetProp("name", "Computed")
+    conformer.SetProp("coord_generation", "ETKDGv3")
+    return True
+
+
+def prepare_molecule(canonical: str, seed: int) -> Optional[Chem.Mol]:
+    """Build the cached molecule: hydrogens, conformer and the atom names Boltz uses for SMILES."""
+    mol = Chem.MolFromSmiles(canonical)
+    mol = AllChem.AddHs(mol)
+
+    canonical_order = AllChem.CanonicalRankAtoms(mol)
+    for atom, rank in zip(mol.GetAtoms(), canonical_order):
+        atom_name = atom.GetSymbol().upper() + str(rank + 1)
+        if len(atom_name) > 4:
+            raise ValueError(f"{canonical} has too many atoms for 4 character atom names")
+        atom.SetProp("name", atom_name)
+        atom.SetBoolProp("leaving_atom", False)
+
+    if not compute_3d_conformer(mol, seed):
+        return None
+    return mol
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prepare a shared Boltz2 ligand cache for SMILES entries")
+    parser.add_argument("input_tsv", nargs="+", help="Accession TSV files")
+    parser.add_argument("--output-dir", "-o", default="ligand_cache",
+                        help="Output cache directory, molecules are written to <dir>/mols (default: ligand_cache)")
+    parser.add_argument("--index", default="ligand_index.tsv", help="Output ligand index TSV (default: ligand_index.tsv)")
+    parser.add_argument("--boltz-cache", help="Boltz cache directory, codes already in its mols directory are not used")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed of the conformer generation (default: 42)")
+
+    args = parser.parse_args()
+
+    smiles_list = read_smiles(args.input_tsv)
+    mols_dir = Path(args.output_dir) / "mols"
+    mols_dir.mkdir(parents=True, exist_ok=True)
+
+    # Existing Boltz molecules must never be shadowed by a cached ligand
+    taken = {}
+    if args.boltz_cache:
+        for path in (Path(args.boltz_cache) / "mols").glob("*.pkl"):
+            taken[path.stem] = None
+
+    Chem.SetDefaultPickleProperties(Chem.PropertyPickleOptions.AllProps)
+
+    rows = []
+    molecules: Dict[str, str] = {}
+    for smiles in smiles_list:
+        mol = Chem.MolFromSmiles(smiles)
+        if mol is None:
+            print(f"Error processing {smiles}: invalid SMILES")
+            rows.append([smiles, "", "", "", "invalid"])
+            continue
+        canonical = Chem.MolToSmiles(mol)
+
+        # Different spellings of the same molecule share one cache entry
+        if canonical in molecules:
+            code = molecules[canonical]
+            rows.append([smiles, canonical, code, "", "cached"])
+            continue
+
+        code = ligand_code(canonical, taken)
+        try:
+            prepared = prepare_molecule(canonical, args.seed)
+        except ValueError as e:
+            print(f"Error processing {smiles}: {e}")
+            rows.append([smiles, canonical, "", "", "failed"])
+            continue
+        if prepared is None:
+            print(f"Error processing {smiles}: conformer generation failed")
+            rows.append([smiles, canonical, "", "", "failed"])
+            continue
+
+        with open(mols_dir / f"{code}.pkl", "wb") as f:
+            pickle.dump(prepared, f)
+        taken[code] = canonical
+        molecules[canonical] = code
+        rows.append([smiles, canonical, code, prepared.GetNumAtoms(), "computed"])
+
+    with open(args.index, "w") as f:
+        f.write("\t".join(INDEX_HEADERS) + "\n")
+        for row in rows:
+            f.write("\t".join(str(value) for value in row) + "\n")
+
+    failed = sum(row[-1] in ("invalid", "failed") for row in rows)
+    # Failed SMILES have no code and stay raw SMILES in the inputs
+    print(f"Cached {len(molecules)} molecules for {len(smiles_list)} SMILES in {mols_dir} ({failed} failed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,21 +8,144 @@ Results are sorted by either ranking_score(AF3), ipTM(colabfold), or confidence_
 import json
 import glob
 import os
+import sqlite3
 import sys
 from pathlib import Path
 
+from compressed_io import COMPRESSION_SUFFIXES, open_text, strip_compression
+from screen import foldid_key, split_window
+from tool_metrics import Metrics, profiled
 
-def process_json_files(input_dir: str, output_file: str, mode: str):
+# Columns joined from the tsv2json.py --manifest combination table
+ANNOTATION_COLUMNS = [
+    "bait_entry",
+    "prey_entry",
+    "bait_type",
+    "prey_type",
+    "bait_tokens",
+    "prey_tokens",
+    "num_tokens",
+    "bait_sha1",
+    "prey_sha1",
+    "output_path",
+]
+
+
+def recombine_windows(data_rows: list, headers: list):
+    """
+    Collapse the rows of prey windows into one row per bait-prey pair.
+
+    The best scoring window provides the scores. The window, its foldid and the
+    number of windows are recorded in extra columns.
+
+    Returns:
+        tuple: (recombined rows, headers)
+    """
+    score_key = headers[-1]
+    groups = {}
+    for row in data_rows:
+        pair, window = split_window(row["foldid"])
+        groups.setdefault(pair, []).append((window, row))
+
+    def score(row):
+        value = row[score_key]
+        return value if isinstance(value, (int, float)) else -float("inf")
+
+    recombined = []
+    for pair, windows in groups.items():
+        window, best = max(windows, key=lambda item: score(item[1]))
+        row = {"foldid": pair, "window": window, "window_foldid": best["foldid"], "num_windows": len(windows)}
+        row.update({key: value for key, value in best.items() if key != "foldid"})
+        recombined.append(row)
+
+    headers = ["foldid", "window", "window_foldid", "num_windows"] + headers[1:]
+    return recombined, headers
+
+
+def annotate_rows(data_rows: list, headers: list, manifests: list, metrics: Metrics = None):
+    """
+    Join the combination manifests written by tsv2json.py --manifest by foldid.
+
+    Manifests are keyed by the lowercased output file stem, which matches the foldids of
+    all modes once the Alphafold3 `_summary_confidences` suffix is removed. Recombined
+    rows are joined by the foldid of their best window.
+
+    Returns:
+        tuple: (annotated rows, headers)
+    """
+    keys = {}
+    for row in data_rows:
+        foldid = row.get("window_foldid") or row["foldid"]
+        keys[id(row)] = foldid_key(foldid)
+
+    annotations = {}
+    wanted = list(set(keys.values()))
+    for manifest in manifests:
+        conn = sqlite3.connect(f"file:{manifest}?mode=ro", uri=True)
+        try:
+            # The key is the primary key, so each chunk is an indexed lookup
+            for i in range(0, len(wanted), 500):
+                chunk = wanted[i : i + 500]
+                query = (
+                    f"SELECT key, {', '.join(ANNOTATION_COLUMNS)} FROM combinations "
+                    f"WHERE key IN ({', '.join('?' * len(chunk))})"
+                )
+                for record in conn.execute(query, chunk):
+                    annotations[record[0]] = record[1:]
+        except sqlite3.Error as e:
+            print(f"Error processing {manifest}: {e}")
+        finally:
+            conn.close()
+
+    # Insert the annotations after the id columns so the score stays the last column
+    num_id_columns = headers.index("num_windows") + 1 if "num_windows" in headers else 1
+    new_headers = headers[:num_id_columns] + ANNOTATION_COLUMNS + headers[num_id_columns:]
+
+    annotated = []
+    missing = 0
+    for row in data_rows:
+        values = annotations.get(keys[id(row)])
+        if values is None:
+            missing += 1
+            values = [""] * len(ANNOTATION_COLUMNS)
+        row = dict(row, **{column: "" if value is None else value for column, value in zip(ANNOTATION_COLUMNS, values)})
+        annotated.append({header: row[header] for header in new_headers})
+
+    if metrics:
+        metrics.count("manifest_rows_missing", missing)
+    if missing:
+        print(f"No manifest entry found for {missing} of {len(data_rows)} rows")
+    return annotated, new_headers
+
+
+def process_json_files(
+    input_dir: str,
+    output_file: str,
+    mode: str,
+    recombine: bool = False,
+    manifests: list = None,
+    metrics: Metrics = None,
+):
     """
     Process all JSON files in the specified directory and create a TSV file.
+    Gzip (.json.gz) and zstd (.json.zst) compressed JSON files are read as well, and the TSV
+    is compressed if output_file ends in .gz or .zst.
 
     Args:
         input_dir (str): Directory to search for JSON files (default: current directory)
         output_file (str): Output TSV filename (default: results.tsv)
+        recombine (bool): Collapse prey windows into one row per pair (default: False)
+        manifests (list): tsv2json.py combination manifests to annotate the rows with (default: None)
+        metrics (Metrics): Collects phase timings and counters (default: None)
     """
+    metrics = metrics or Metrics("rank_af")
+
     # Find all JSON files
-    json_pattern = os.path.join(input_dir, "*.json")
-    json_files = glob.glob(json_pattern)
+    with metrics.phase("discover"):
+        json_files = []
+        for suffix in ["", *COMPRESSION_SUFFIXES.values()]:
+            json_files += glob.glob(os.path.join(input_dir, "*.json" + suffix))
+    metrics.count("files_found", len(json_files))
 
     if not json_files:
         print(f"No JSON files found in {input_dir}")
@@ -34,90 +157,107 @@ def process_json_files(input_dir: str, output_file: str, mode: str):
     data_rows = []
 
     # Process each JSON file
-    for json_file in json_files:
-        try:
-            with open(json_file, "r") as f:
-                data = json.load(f)
-
-            if mode == "colabfold":
-                # Extract basename without extension and the suffix for foldid
-                foldid = Path(json_file).stem.removesuffix("_toprank")
-
-                # Extract required fields
-                row = {"foldid": foldid, "iptm": data.get("iptm", "")}
-                headers = ["foldid", "iptm"]
-            elif mode == "alphafold3":
-                # Extract basename without extension for foldid
-                foldid = Path(json_file).stem
-
-                # Mean of chain_pair_pae_min (2nd value of 1st array and 1st value o 2nd array)
-                chain_pair_pae_min = data.get("chain_pair_pae_min", "")
-                chain_pair_pae_min_mean = (
-                    chain_pair_pae_min[0][1] + chain_pair_pae_min[1][0]
-                ) / 2
-                # Extract required fields
-                row = {
-                    "foldid": foldid,
-                    "chain_pair_pae_min": chain_pair_pae_min_mean,
-                    "fraction_disordered": data.get("fraction_disordered", ""),
-                    "has_clash": data.get("has_clash", ""),
-                    "ptm": data.get("ptm", ""),
-                    "iptm": data.get("iptm", ""),
-                    "ranking_score": data.get("ranking_score", ""),
-                }
-                headers = [
-                    "foldid",
-                    "chain_pair_pae_min",
-                    "fraction_disordered",
-                    "has_clash",
-                    "ptm",
-                    "iptm",
-                    "ranking_score",
-                ]
-            elif mode == "boltz":
-                # Extract basename without extension for foldid
-                foldid = (
-                    Path(json_file)
-                    .stem.replace("confidence_", "")
-                    .replace("_model_0", "")
-                )
+    with metrics.phase("parse"):
+        for json_file in json_files:
+            try:
+                with open_text(json_file) as f:
+                    text = f.read()
+                data = json.loads(text)
+                metrics.count("files_parsed")
+                metrics.count("bytes_read", len(text))
+                # Name without the compression suffix, so x.json.gz has the foldid of x.json
+                json_name = strip_compression(json_file)
+
+                if mode == "colabfold":
+                    # Extract basename without extension and the suffix for foldid
+                    foldid = json_name.stem.removesuffix("_toprank")
+
+                    # Extract required fields
+                    row = {"foldid": foldid, "iptm": data.get("iptm", "")}
+                    headers = ["foldid", "iptm"]
+                elif mode == "alphafold3":
+                    # Extract basename without extension for foldid
+                    foldid = json_name.stem
 
-                # Extract required fields
-                row = {
-                    "foldid": foldid,
-                    "complex_plddt": data.get("complex_plddt", ""),
-                    "complex_iplddt": data.get("complex_iplddt", ""),
-                    "complex_pde": data.get("complex_pde", ""),
-                    "complex_ipde": data.get("complex_ipde", ""),
-                    "protein_iptm": data.get("protein_iptm", ""),
-                    "ligand_iptm": data.get("ligand_iptm", ""),
-                    "ptm": data.get("ptm", ""),
-                    "iptm": data.get("iptm", ""),
-                    "confidence_score": data.get("confidence_score", ""),
-                }
-                headers = [
-                    "foldid",
-                    "complex_plddt",
-                    "complex_iplddt",
-                    "complex_pde",
-                    "complex_ipde",
-                    "protein_iptm",
-                    "ligand_iptm",
-                    "ptm",
-                    "iptm",
-                    "confidence_score",
-                ]
-
-            data_rows.append(row)
-
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"Error processing {json_file}: {e}")
-            continue
+                    # Mean of chain_pair_pae_min (2nd value of 1st array and 1st value o 2nd array)
+                    chain_pair_pae_min = data.get("chain_pair_pae_min", "")
+                    chain_pair_pae_min_mean = (
+                        chain_pair_pae_min[0][1] + chain_pair_pae_min[1][0]
+                    ) / 2
+                    # Extract required fields
+                    row = {
+                        "foldid": foldid,
+                        "chain_pair_pae_min": chain_pair_pae_min_mean,
+                        "fraction_disordered": data.get("fraction_disordered", ""),
+                        "has_clash": data.get("has_clash", ""),
+                        "ptm": data.get("ptm", ""),
+                        "iptm": data.get("iptm", ""),
+                        "ranking_score": data.get("ranking_score", ""),
+                    }
+                    headers = [
+                        "foldid",
+                        "chain_pair_pae_min",
+                        "fraction_disordered",
+                        "has_clash",
+                        "ptm",
+                        "iptm",
+                        "ranking_score",
+                    ]
+                elif mode == "boltz":
+                    # Extract basename without extension for foldid
+                    foldid = (
+                        json_name
+                        .stem.replace("confidence_", "")
+                        .replace("_model_0", "")
+                    )
+
+                    # Extract required fields
+                    row = {
+                        "foldid": foldid,
+                        "complex_plddt": data.get("complex_plddt", ""),
+                        "complex_iplddt": data.get("complex_iplddt", ""),
+                        "complex_pde": data.get("complex_pde", ""),
+                        "complex_ipde": data.get("complex_ipde", ""),
+                        "protein_iptm": data.get("protein_iptm", ""),
+                        "ligand_iptm": data.get("ligand_iptm", ""),
+                        "ptm": data.get("ptm", ""),
+                        "iptm": data.get("iptm", ""),
+                        "confidence_score": data.get("confidence_score", ""),
+                    }
+                    headers = [
+                        "foldid",
+                        "complex_plddt",
+                        "complex_iplddt",
+                        "complex_pde",
+                        "complex_ipde",
+                        "protein_iptm",
+                        "ligand_iptm",
+                        "ptm",
+                        "iptm",
+                        "confidence_score",
+                    ]
+
+                data_rows.append(row)
+
+            # RuntimeError: a .zst summary without the zstandard package is skipped like a broken file
+            except (json.JSONDecodeError, EOFError, IOError, RuntimeError) as e:
+                print(f"Error processing {json_file}: {e}")
+                metrics.count("parse_errors")
+                continue
 
     if not data_rows:
         print("No valid JSON files processed")
         return
 
+    if recombine:
+        with metrics.phase("recombine"):
+            data_rows, headers = recombine_windows(data_rows, headers)
+        print(f"Recombined prey windows into {len(data_rows)} pairs")
+
+    if manifests:
+        with metrics.phase("annotate"):
+            data_rows, headers = annotate_rows(data_rows, headers, manifests, metrics)
+
     # Sort by the last entry in the dict
     # Handle cases where sorting key is missing or non-numeric
     def safe_sort_key(row):
@@ -127,17 +267,18 @@ def process_json_files(input_dir: str, output_file: str, mode: str):
             return score
         return -float("inf")  # Put invalid scores at the end
 
-    data_rows.sort(key=safe_sort_key, reverse=True)
+    with metrics.phase("sort"):
+        data_rows.sort(key=safe_sort_key, reverse=True)
 
     try:
-        with open(output_file, "w") as f:
-            # Write header
-            f.write("\t".join(headers) + "\n")
-
-            # Write data rows
-            for row in data_rows:
-                values = [str(row[header]) for header in headers]
-                f.write("\t".join(values) + "\n")
+        with metrics.phase("write"), open_text(output_file, "w") as f:
+            # Write header and data rows
+            lines = ["\t".join(headers)]
+            lines += ["\t".join(str(row[header]) for header in headers) for row in data_rows]
+            text = "\n".join(lines) + "\n"
+            f.write(text)
+            metrics.count("bytes_written", len(text))
+        metrics.count("rows_written", len(data_rows))
 
         print(f"Successfully wrote {len(data_rows)} rows to {output_file}")
         print("Results sorted by ranking_score (highest to lowest)")
@@ -154,17 +295,36 @@ def main():
         "--input-dir",
         "-i",
         default=".",
-        help="Input directory containing JSON files (default: current directory)",
+        help="Input directory containing JSON files, which may be gzip/zstd compressed (default: current directory)",
     )
     parser.add_argument(
         "--output",
         "-o",
         default="results.tsv",
-        help="Output TSV filename (default: results.tsv)",
+        help="Output TSV filename, compressed if it ends in .gz or .zst (default: results.tsv)",
     )
     parser.add_argument(
         "--mode", help="Set the input format. Options: colabfold, alphafold3, boltz"
     )
+    parser.add_argument(
+        "--recombine-windows",
+        action="store_true",
+        help="Report one row per bait-prey pair for preys split into windows by tsv2json.py",
+    )
+    parser.add_argument(
+        "--manifest",
+        action="append",
+        default=[],
+        help="Combination manifest (SQLite) from tsv2json.py to annotate the results with. Can be given multiple times",
+    )
+    parser.add_argument(
+        "--metrics",
+        help="JSON file with the wall/CPU time of each phase, counters and peak RSS of this run",
+    )
+    parser.add_argument(
+        "--profile",
+        help="Write cProfile stats of this run to this file (read with python -m pstats)",
+    )
 
     args = parser.parse_args()
 
@@ -173,7 +333,15 @@ def main():
         print(f"Error: Input directory '{args.input_dir}' does not exist")
         sys.exit(1)
 
-    process_json_files(args.input_dir, args.output, args.mode)
+    metrics = Metrics("rank_af")
+    try:
+        with profiled(args.profile):
+            process_json_files(
+                args.input_dir, args.output, args.mode, args.recombine_windows, args.manifest, metrics
+            )
+    finally:
+        if args.metrics:
+            metrics.write(args.metrics)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Finds the combinations of a screen that have no prediction and plans their rerun.
+The combinations written by tsv2json.py --manifest are compared with the summary JSONs
+present in the results. Every missing pair is classified from the Nextflow execution trace
+(MSA failure, out of memory, timeout, preemption, ...) and written to accession files of the
+bait and prey entries of the missing pairs, grouped by the GPU tier the rerun should start at.
+An accession file regenerates every combination of its entries, so the windows and sequences
+of windowed preys and multi-sequence FASTA entries that did finish are folded again; the plan
+reports them as surplus. With --inputs, the input files of exactly the missing pairs are also
+copied into ready-made batches.
+"""
+
+import argparse
+import logging
+import re
+import shutil
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from compressed_io import COMPRESSION_SUFFIXES, compression_of, open_text, strip_compression
+from screen import write_accessions
+from trace_report import GPU_PROCESSES, failure_class, input_key, parse_timestamp, read_traces, task_inputs
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Summary JSONs of each mode and the parts of their names around the foldid
+SUMMARY_FILES = {
+    "alphafold3": ("*_summary_confidences.json", "", "_summary_confidences"),
+    "boltz": ("confidence_*_model_0.json", "confidence_", "_model_0"),
+    "colabfold": ("*_toprank.json", "", "_toprank"),
+}
+MSA_PROCESS = "AF3_MSA"
+# Screen predictions only, the top ranked ColabFold reruns are not part of the manifest
+FOLD_PROCESSES = [process for process in GPU_PROCESSES if process != "COLABFOLD_BATCH_TOP"]
+# Errors of the MSA server queried by ColabFold and Boltz
+MSA_ERROR_RE = re.compile(r"MMseqs2 API|MSA server", re.IGNORECASE)
+# GPU tiers of conf/base.config: retries move up one tier (vram23, vram40, vram80)
+MAX_GPU_TIER = 3
+# Failures that need more memory or time than the attempt had
+ESCALATE = {"oom", "cuda_oom", "timeout"}
+
+MISSING_HEADERS = [
+    "key", "foldid", "bait_entry", "prey_entry", "num_tokens", "reason", "process", "attempts", "exit",
+    "gpu_tier", "group",
+]
+PLAN_HEADERS = [
+    "group", "accession_file", "inputs", "combinations", "surplus", "baits", "preys", "gpu_tier", "inf_batch", "reasons",
+]
+
+
+def read_combinations(manifests: List[str]) -> Dict[str, dict]:
+    """Read every combination of the tsv2json.py manifests, keyed by lowercased foldid."""
+    combinations = {}
+    for manifest in manifests:
+        conn = sqlite3.connect(f"file:{manifest}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            for row in conn.execute("SELECT key, foldid, mode, bait_entry, prey_entry, num_tokens, output_path "
+                                    "FROM combinations"):
+                combinations[row["key"]] = dict(row)
+        except sqlite3.Error as e:
+            logging.error(f"Error processing {manifest}: {e}")
+        finally:
+            conn.close()
+    return combinations
+
+
+def summary_keys(results: List[str], mode: str) -> set:
+    """Return the foldid keys of the summary JSONs found below the result directories, compressed or not."""
+    pattern, prefix, suffix = SUMMARY_FILES[mode]
+    keys = set()
+    for result_dir in results:
+        for compression_suffix in ["", *COMPRESSION_SUFFIXES.values()]:
+            for path in Path(result_dir).rglob(pattern + compression_suffix):
+                keys.add(strip_compression(path).stem.lower().removeprefix(prefix).removesuffix(suffix))
+    return keys
+
+
+def msa_inputs(task: Dict[str, str]) -> List[str]:
+    """Return the keys of the inputs of an AF3_MSA task, staged as <name>.json in its work directory."""
+    workdir = Path(task["workdir"]) if task.get("workdir") else None
+    if not workdir or not workdir.is_dir():
+        return []
+    return [path.stem.lower() for path in workdir.glob("*.json") if not path.name.endswith("_data.json")]
+
+
+def attempts_by_key(tasks: List[Dict[str, str]]) -> Dict[str, List[Dict[str, str]]]:
+    """Map every input key to the task attempts that processed it, oldest first."""
+    attempts: Dict[str, List[Dict[str, str]]] = {}
+    for task in tasks:
+        if task["process"] == MSA_PROCESS:
+            keys = msa_inputs(task)
+        elif task["process"] in FOLD_PROCESSES:
+            keys = [key for key, _ in task_inputs(task)]
+        else:
+            continue
+        for key in keys:
+            attempts.setdefault(key, []).append(task)
+    for key_attempts in attempts.values():
+        key_attempts.sort(key=lambda task: (int(task.get("attempt") or 1), parse_timestamp(task.get("complete")) or 0))
+    return attempts
+
+
+def msa_error(task: Dict[str, str]) -> bool:
+    """Check the error log of a failed attempt for MSA server errors."""
+    err = Path(task["workdir"]) / ".command.err" if task.get("workdir") else None
+    try:
+        return bool(err and err.is_file() and MSA_ERROR_RE.search(err.read_text(errors="replace")))
+    except OSError:
+        return False
+
+
+def classify(attempts: Optional[List[Dict[str, str]]], traced: bool) -> dict:
+    """Classify why a combination has no summary from the attempts that processed it.
+
+    Reasons are msa_failure, oom, cuda_oom, timeout, preempted, error, missing_output (a task
+    completed but no summary was published), not_run (no task processed it) and unknown
+    (no trace given).
+    """
+    if not traced:
+        return {"reason": "unknown", "process": "", "attempts": 0, "exit": ""}
+    if not attempts:
+        return {"reason": "not_run", "process": "", "attempts": 0, "exit": ""}
+
+    msa = [task for task in attempts if task["process"] == MSA_PROCESS]
+    folds = [task for task in attempts if task["process"] != MSA_PROCESS]
+    if msa and not any(task["status"] == "COMPLETED" for task in msa):
+        last = msa[-1]
+        return {"reason": "msa_failure", "process": MSA_PROCESS, "attempts": len(msa), "exit": last.get("exit", "")}
+    if not folds:
+        return {"reason": "not_run", "process": "", "attempts": 0, "exit": ""}
+
+    last = folds[-1]
+    if any(task["status"] == "COMPLETED" for task in folds):
+        reason = "missing_output"
+    else:
+        reason = failure_class(last)
+        if reason == "error" and msa_error(last):
+            reason = "msa_failure"
+    return {"reason": reason, "process": last["process"], "attempts": len(folds), "exit": last.get("exit", "")}
+
+
+def gpu_tier(record: dict) -> int:
+    """Return the GPU tier a rerun starts at: one above the last attempt for memory and time failures."""
+    if record["reason"] in ESCALATE:
+        return min(record["attempts"] + 1, MAX_GPU_TIER)
+    return 1
+
+
+def group_pairs(records: List[dict]) -> Dict[str, dict]:
+    """Group missing pairs into accession files by GPU tier.
+
+    An accession file crosses all its baits with all its preys, so only baits with the same
+    missing preys share a file. Every file then holds exactly the bait x prey entries of the
+    missing pairs, but not only their missing windows or sequences (see regenerated).
+    """
+    preys_by_bait: Dict[tuple, List[str]] = {}
+    for record in records:
+        preys_by_bait.setdefault((record["gpu_tier"], record["bait_entry"]), []).append(record["prey_entry"])
+
+    baits_by_preys: Dict[tuple, List[str]] = {}
+    for (tier, bait), preys in preys_by_bait.items():
+        baits_by_preys.setdefault((tier, tuple(sorted(set(preys)))), []).append(bait)
+
+    groups = {}
+    group_of = {}
+    for (tier, preys), baits in sorted(baits_by_preys.items()):
+        name = f"tier{tier}_{sum(group['gpu_tier'] == tier for group in groups.values()) + 1}"
+        groups[name] = {"gpu_tier": tier, "baits": baits, "preys": list(preys)}
+        group_of.update({(tier, bait): name for bait in baits})
+    for record in records:
+        record["group"] = group_of[(record["gpu_tier"], record["bait_entry"])]
+    return groups
+
+
+def regenerated(group: dict, combinations: Dict[str, dict]) -> int:
+    """Count the combinations tsv2json.py writes for the accession file of a group.
+
+    This is more than the missing pairs of the group when one of its entries is a windowed
+    prey or a multi-sequence FASTA file with other windows or sequences that did finish.
+    """
+    baits, preys = set(group["baits"]), set(group["preys"])
+    return sum(record["bait_entry"] in baits and record["prey_entry"] in preys for record in combinations.values())
+
+
+def find_inputs(input_dirs: List[str]) -> Dict[str, Path]:
+    """Index the input files below the given directories by key, preferring AF3_MSA *_data.json files."""
+    inputs: Dict[str, Path] = {}
+    for input_dir in input_dirs:
+        for path in sorted(Path(input_dir).rglob("*")):
+            if strip_compression(path).suffix not in (".json", ".fasta") or not path.is_file():
+                continue
+            key = input_key(path)
+            if key not in inputs or strip_compression(path).name.endswith("_data.json"):
+                inputs[key] = path
+    return inputs
+
+
+def write_batches(records: List[dict], inputs: Dict[str, Path], out_dir: Path, batch_sizes: Dict[int, int],
+                  mode: str) -> int:
+    """Copy the inputs of the missing pairs into batches per GPU tier, largest inputs first.
+
+    Alphafold3 inputs without an MSA (*_data.json) go to separate tier<N>_msa_* batches, as they
+    still need the data pipeline. Compressed inputs are decompressed, the predictors read plain files.
+    """
+    written = 0
+    by_batch: Dict[str, List[dict]] = {}
+    for record in records:
+        path = inputs.get(record["key"])
+        if path is None:
+            logging.warning(f"No input file found for {record['foldid']}")
+            continue
+        needs_msa = mode == "alphafold3" and not strip_compression(path).name.endswith("_data.json")
+        by_batch.setdefault(f"tier{record['gpu_tier']}{'_msa' if needs_msa else ''}", []).append(record)
+    for prefix, batch_records in sorted(by_batch.items()):
+        batch_records.sort(key=lambda record: record["num_tokens"] or 0, reverse=True)
+        size = batch_sizes[batch_records[0]["gpu_tier"]]
+        for i in range(0, len(batch_records), size):
+            batch_dir = out_dir / "batches" / f"{prefix}_batch{i // size + 1:04d}"
+            batch_dir.mkdir(parents=True, exist_ok=True)
+            for record in batch_records[i:i + size]:
+                path = inputs[record["key"]]
+                if compression_of(path):
+                    with open_text(path) as f_in, open(batch_dir / strip_compression(path).name, "w") as f_out:
+                        shutil.copyfileobj(f_in, f_out)
+                else:
+                    shutil.copy2(path, batch_dir / path.name)
+                written += 1
+    return written
+
+
+def write_table(rows: List[dict], headers: List[str], output_file: Path) -> None:
+    """Write rows as a TSV file."""
+    with open(output_file, "w") as f:
+        f.write("\t".join(headers) + "\n")
+        for row in rows:
+            f.write("\t".join("" if row.get(header) is None else str(row[header]) for header in headers) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find combinations without a prediction and plan a targeted rerun")
+    parser.add_argument("--manifest", action="extend", nargs="+", required=True,
+                        help="Combination manifests (SQLite) from tsv2json.py, e.g. preprocessing/combinations_*.sqlite")
+    parser.add_argument("--results", action="extend", nargs="+", required=True,
+                        help="Directories searched for summary JSONs, e.g. results/alphafold3/folds")
+    parser.add_argument("--trace", action="extend", nargs="+", default=[],
+                        help="Nextflow execution traces (pipeline_info/execution_trace_*.txt) to classify the gaps")
+    parser.add_argument("--inputs", action="extend", nargs="+", default=[],
+                        help="Directories with the input files, e.g. preprocessing and msa. Writes batches of them")
+    parser.add_argument("--mode", choices=list(SUMMARY_FILES), help="Pipeline mode (default: read from the manifests)")
+    parser.add_argument("--batch-size", type=int, default=20,
+                        help="Inputs per batch for pairs rerun at the first GPU tier (default: 20, the inf_batch default)")
+    parser.add_argument("--escalated-batch-size", type=int, default=1,
+                        help="Inputs per batch for pairs that ran out of memory or time (default: 1)")
+    parser.add_argument("--outdir", "-o", default="rerun", help="Output directory (default: rerun)")
+
+    args = parser.parse_args()
+
+    combinations = read_combinations(args.manifest)
+    if not combinations:
+        logging.error("No combinations found in the manifests")
+        sys.exit(1)
+    mode = args.mode or next(iter(combinations.values()))["mode"]
+    if mode not in SUMMARY_FILES:
+        parser.error(f"Unknown mode '{mode}' in the manifests, set --mode")
+
+    present = summary_keys(args.results, mode)
+    missing = sorted(key for key in combinations if key not in present)
+    logging.info(f"{len(combinations) - len(missing)} of {len(combinations)} combinations have a summary")
+
+    attempts = attempts_by_key(read_traces(args.trace)) if args.trace else {}
+    records = []
+    for key in missing:
+        record = dict(combinations[key], **classify(attempts.get(key), bool(args.trace)))
+        record["gpu_tier"] = gpu_tier(record)
+        records.append(record)
+
+    out_dir = Path(args.outdir)
+    acc_dir = out_dir / "accessions"
+    acc_dir.mkdir(parents=True, exist_ok=True)
+    batch_sizes = {tier: args.batch_size if tier == 1 else args.escalated_batch_size
+                   for tier in range(1, MAX_GPU_TIER + 1)}
+
+    plan = []
+    for name, group in group_pairs(records).items():
+        acc_file = acc_dir / f"rerun_{name}.tsv"
+        write_accessions(str(acc_file), ["Entry", "Bait"],
+                         [{"entry": bait, "bait": "1"} for bait in group["baits"]]
+                         + [{"entry": prey, "bait": "0"} for prey in group["preys"]])
+        group_records = [record for record in records if record["group"] == name]
+        num_combinations = regenerated(group, combinations)
+        plan.append({
+            "group": name,
+            "accession_file": acc_file,
+            "inputs": len(group_records),
+            "combinations": num_combinations,
+            "surplus": num_combinations - len(group_records),
+            "baits": len(group["baits"]),
+            "preys": len(group["preys"]),
+            "gpu_tier": group["gpu_tier"],
+            "inf_batch": batch_sizes[group["gpu_tier"]],
+            "reasons": ",".join(sorted({record["reason"] for record in group_records})),
+        })
+
+    surplus = sum(group["surplus"] for group in plan)
+    if surplus:
+        logging.warning(f"The accession files also refold {surplus} finished windows or sequences of their entries, "
+                        f"rerun from the --inputs batches to fold only the missing pairs")
+
+    write_table(records, MISSING_HEADERS, out_dir / "missing.tsv")
+    write_table(plan, PLAN_HEADERS, out_dir / "rerun_plan.tsv")
+
+    if args.inputs and records:
+        copied = write_batches(records, find_inputs(args.inputs), out_dir, batch_sizes, mode)
+        logging.info(f"Copied {copied} input files into batches in {out_dir / 'batches'}")
+
+    counts: Dict[str, int] = {}
+    for record in records:
+        counts[record["reason"]] = counts.get(record["reason"], 0) + 1
+    for reason, count in sorted(counts.items()):
+        logging.info(f"{reason}: {count}")
+    logging.info(f"Wrote {out_dir / 'missing.tsv'} and {len(plan)} rerun groups to {out_dir / 'rerun_plan.tsv'}")
+
+
+if __name__ == "__main__":
+    main()
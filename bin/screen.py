@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Helpers shared by the tools that read the accession TSV of a screen or the foldids of its
+predictions, so every tool parses the Bait column and matches foldids the same way.
+"""
+
+import csv
+import re
+from typing import Dict, List, Tuple, Union
+
+# Prey windows written by tsv2json.py --window-size/--domains end with __w<start>-<end>
+WINDOW_RE = re.compile(r"__w(\d+)-(\d+)", re.IGNORECASE)
+# rank_af.py reports the Alphafold3 summary file stems as foldids
+AF3_SUMMARY_SUFFIX = "_summary_confidences"
+
+
+def bait_flag(value: Union[str, int, float]) -> int:
+    """Parse the Bait column of the accession TSV as tsv2json.py does, so 1, 1.0 and '1' are baits."""
+    return int(float(value))
+
+
+def split_window(foldid: str) -> Tuple[str, str]:
+    """Return the foldid without its prey window and the window as start-end ('' without a window)."""
+    match = WINDOW_RE.search(foldid)
+    if not match:
+        return foldid, ""
+    return foldid[:match.start()] + foldid[match.end():], f"{match.group(1)}-{match.group(2)}"
+
+
+def foldid_key(foldid: str) -> str:
+    """Return the key of a foldid in the combination manifest: lowercased, without the Alphafold3 suffix."""
+    return foldid.lower().removesuffix(AF3_SUMMARY_SUFFIX)
+
+
+def pair_key(foldid: str) -> str:
+    """Return the key of the bait-prey pair of a foldid, equal for all windows and engines."""
+    return split_window(foldid_key(foldid))[0]
+
+
+def read_accessions(tsv_file: str) -> Tuple[List[str], List[Dict[str, str]]]:
+    """Read the accession TSV, returning the header and rows with lowercased column names."""
+    with open(tsv_file, 'r', newline='') as f:
+        reader = csv.reader(f, delimiter='\t')
+        header = next(reader)
+        rows = [dict(zip([column.lower() for column in header], row)) for row in reader if row]
+    if not rows or 'entry' not in rows[0] or 'bait' not in rows[0]:
+        raise ValueError("TSV must contain 'Entry' and 'Bait' columns")
+    return header, rows
+
+
+def write_accessions(tsv_file: str, header: List[str], rows: List[Dict[str, str]]) -> None:
+    """Write accession rows with the original header."""
+    with open(tsv_file, 'w', newline='') as f:
+        writer = csv.writer(f, delimiter='\t', lineterminator='\n')
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow([row.get(column.lower(), '') for column in header])
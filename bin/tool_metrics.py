@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Per-phase timing and counters for the pipeline's Python tools.
+A Metrics object accumulates the wall and CPU time of named phases and named counters
+(cache hits, HTTP requests, bytes written, ...) and writes them with the peak RSS of the
+process as JSON, so runs can be compared across commits and production screens.
+"""
+
+import json
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Union
+
+
+def peak_rss_mb() -> float:
+    """Return the peak resident set size of this process in MB."""
+    # ru_maxrss also covers the parent's RSS at fork time, VmHWM only this program
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1 << 20) if sys.platform == "darwin" else maxrss / 1024
+
+
+class Metrics:
+    """Wall/CPU time per phase and counters of one tool run.
+
+    Phases can be entered several times and nest; the time of a nested phase is also
+    counted in its parent.
+    """
+
+    def __init__(self, tool: str) -> None:
+        self.tool = tool
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            stats = self.phases.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0, "calls": 0})
+            stats["wall_s"] += time.perf_counter() - wall
+            stats["cpu_s"] += time.process_time() - cpu
+            stats["calls"] += 1
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self) -> Dict[str, Any]:
+        import platform
+
+        return {
+            "tool": self.tool,
+            "started": self.started,
+            "argv": sys.argv[1:],
+            "python": platform.python_version(),
+            "wall_s": round(time.perf_counter() - self.start_wall, 6),
+            "cpu_s": round(time.process_time() - self.start_cpu, 6),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "phases": {name: {key: round(value, 6) for key, value in stats.items()}
+                       for name, stats in self.phases.items()},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def write(self, path: Union[str, Path]) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+@contextmanager
+def profiled(path: Optional[Union[str, Path]]) -> Iterator[None]:
+    """Run the block under cProfile and dump the stats to path, if given.
+
+    The dump can be read with `python -m pstats` or snakeviz.
+    """
+    if not path:
+        yield
+        return
+    # Imported here to keep the startup of the tools short
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(str(path))
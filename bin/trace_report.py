@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+Builds an empirical GPU cost model from Nextflow execution traces.
+Every task attempt is joined with the token counts of the inputs it predicted, taken from the
+combination manifests of tsv2json.py --manifest or read from the AF3 JSON, Boltz FASTA and
+ColabFold query files staged in its work directory. Reports throughput, retry waste and queue
+wait per process and fits runtime and memory against batch size and token counts.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import math
+import re
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from compressed_io import strip_compression
+from tsv2json import SMILES_ATOM_RE
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DURATION_RE = re.compile(r"([\d.]+)\s*(ms|d|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400}
+MEMORY_UNITS = {"B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4}
+# Staged inputs of the prediction processes, relative to the task work directory
+INPUT_GLOBS = ["input_a3m/*.json", "input_fasta/*.fasta"]
+# Boltz workers list the jobs they claimed from the shared queue in their work directory
+WORKER_CLAIMED = "claimed.tsv"
+# Messages of out of memory errors on the GPU
+CUDA_OOM_RE = re.compile(r"CUDA out of memory|OutOfMemoryError|RESOURCE_EXHAUSTED")
+PREEMPT_QUEUE = "gpu-preempt"
+# GPU prediction processes reported by default
+GPU_PROCESSES = [
+    "AF3_FOLD", "BOLTZ_PREDICT", "BOLTZ_WORKER", "BOLTZ_PREDICT_FAILED", "COLABFOLD_BATCH", "COLABFOLD_BATCH_TOP",
+]
+
+SUMMARY_HEADERS = [
+    "process", "attempts", "completed", "failed", "retried_tasks", "items", "tokens", "mean_batch",
+    "gpu_hours", "wasted_hours", "oom_hours", "cuda_oom_hours", "timeout_hours", "preempted_hours",
+    "error_hours", "queue_wait_median_min", "queue_wait_p90_min", "queue_wait_hours", "peak_rss_gb",
+    "tokens_per_gpu_hour", "setup_fraction", "suggested_inf_batch",
+]
+TASK_HEADERS = [
+    "process", "name", "tag", "status", "exit", "attempt", "queue", "failure", "queue_wait_s",
+    "realtime_s", "peak_rss_gb", "items", "unknown_items", "tokens", "max_tokens",
+]
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """Parse a trace duration ('1h 2m 3s', '850ms' or raw milliseconds) into seconds."""
+    value = (value or "").strip()
+    if value in ("", "-"):
+        return None
+    try:
+        return float(value) / 1000
+    except ValueError:
+        return sum(float(number) * DURATION_UNITS[unit] for number, unit in DURATION_RE.findall(value))
+
+
+def parse_memory(value: str) -> Optional[float]:
+    """Parse a trace memory value ('1.5 GB' or raw bytes) into bytes."""
+    value = (value or "").strip()
+    if value in ("", "-"):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        number, _, unit = value.partition(" ")
+        return float(number) * MEMORY_UNITS.get(unit.upper(), 1)
+
+
+def parse_timestamp(value: str) -> Optional[float]:
+    """Parse a trace timestamp ('2025-01-31 12:00:00.123' or raw epoch milliseconds) into seconds."""
+    value = (value or "").strip()
+    if value in ("", "-"):
+        return None
+    try:
+        return float(value) / 1000
+    except ValueError:
+        for fmt in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S"):
+            try:
+                return datetime.strptime(value, fmt).timestamp()
+            except ValueError:
+                continue
+    return None
+
+
+def read_traces(trace_files: List[str]) -> List[Dict[str, str]]:
+    """Read the task attempts of one or more trace files, skipping cached tasks of resumed runs."""
+    tasks = []
+    for trace_file in trace_files:
+        with open(trace_file, "r", newline="") as f:
+            for row in csv.DictReader(f, delimiter="\t"):
+                if row.get("status") == "CACHED":
+                    continue
+                # Nextflow records the fully qualified process name
+                row["process"] = (row.get("process") or row["name"].split(" (")[0]).split(":")[-1]
+                tasks.append(row)
+    return tasks
+
+
+def read_manifests(manifests: List[str]) -> Dict[str, Optional[int]]:
+    """Read the token count of every combination in tsv2json.py manifests."""
+    tokens = {}
+    for manifest in manifests:
+        conn = sqlite3.connect(f"file:{manifest}?mode=ro", uri=True)
+        try:
+            tokens.update(conn.execute("SELECT key, num_tokens FROM combinations"))
+        except sqlite3.Error as e:
+            logging.error(f"Error processing {manifest}: {e}")
+        finally:
+            conn.close()
+    return tokens
+
+
+def count_tokens(path: Path) -> Optional[int]:
+    """Count the tokens of an input file: residues, or heavy atoms for SMILES ligands.
+
+    CCD ligands have no known size without the CCD, so inputs with one count as unknown.
+    """
+    try:
+        if path.suffix == ".json":
+            data = json.loads(path.read_text())
+            tokens = 0
+            for entity in data.get("sequences", []):
+                chain = next(iter(entity.values()))
+                copies = len(chain["id"]) if isinstance(chain.get("id"), list) else 1
+                if "sequence" in chain:
+                    tokens += len(chain["sequence"]) * copies
+                elif "smiles" in chain:
+                    tokens += len(SMILES_ATOM_RE.findall(chain["smiles"])) * copies
+                else:
+                    return None
+            return tokens
+
+        lines = path.read_text().splitlines()
+        if path.suffix == ".a3m":
+            # ColabFold a3m files start with '#<query lengths>\t<cardinalities>'
+            lengths, _, copies = lines[0].lstrip("#").partition("\t")
+            return sum(int(length) * int(copy)
+                       for length, copy in zip(lengths.split(","), copies.split(",")))
+
+        tokens, entity_type = 0, "protein"
+        for line in lines:
+            if line.startswith(">"):
+                # Boltz headers are '>chain|type', ColabFold queries have no type
+                entity_type = line.split("|")[1].lower() if "|" in line else "protein"
+                if entity_type == "ccd":
+                    return None
+            elif entity_type == "smiles":
+                tokens += len(SMILES_ATOM_RE.findall(line.strip()))
+            else:
+                tokens += len(line.strip().replace(":", ""))
+        return tokens
+    except (OSError, ValueError, KeyError, IndexError) as e:
+        logging.warning(f"Error processing {path}: {e}")
+        return None
+
+
+def input_key(path: Path) -> str:
+    """Return the manifest key of an input file, AF3_MSA writes <name>_data.json."""
+    return strip_compression(path).stem.lower().removesuffix("_data")
+
+
+def claimed_inputs(path: Path) -> List[Tuple[str, Optional[Path]]]:
+    """Return the (key, input file) pairs of the jobs a Boltz worker attempt claimed.
+
+    The last row of a job holds its status. Jobs restored from an earlier attempt were not
+    predicted by this one, jobs still running were in flight when the attempt ended.
+    """
+    jobs: Dict[str, Tuple[str, str]] = {}
+    with open(path, "r", newline="") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            jobs[row["foldid"].lower()] = (row["status"], row["input"])
+    return [(key, Path(source) if Path(source).exists() else None)
+            for key, (status, source) in jobs.items() if status != "restored"]
+
+
+def task_inputs(task: Dict[str, str]) -> List[Tuple[str, Optional[Path]]]:
+    """Find the (key, input file) pairs a task predicted from its work directory.
+
+    ColabFold tasks fold the single query named by their tag, which also works once the work
+    directory has been cleaned up.
+    """
+    workdir = Path(task["workdir"]) if task.get("workdir") else None
+    inputs = []
+    if workdir and workdir.is_dir():
+        for pattern in INPUT_GLOBS:
+            inputs += [(input_key(path), path) for path in sorted(workdir.glob(pattern))]
+        claimed = workdir / WORKER_CLAIMED
+        if claimed.is_file():
+            inputs += claimed_inputs(claimed)
+    if not inputs and task["process"].startswith("COLABFOLD_BATCH") and task.get("tag"):
+        query = None
+        if workdir and workdir.is_dir():
+            query = next(iter(sorted(workdir.glob("*.a3m")) + sorted(workdir.glob("*.fasta"))), None)
+        inputs.append((task["tag"].lower(), query))
+    return inputs
+
+
+def failure_class(task: Dict[str, str]) -> str:
+    """Classify why an attempt did not complete: oom, cuda_oom, timeout, preempted or error."""
+    if task["status"] == "COMPLETED":
+        return ""
+    exit_code = task.get("exit", "-")
+    if exit_code == "137":
+        return "oom"
+    if exit_code == "140":
+        return "timeout"
+    err = Path(task["workdir"]) / ".command.err" if task.get("workdir") else None
+    try:
+        if err and err.is_file() and CUDA_OOM_RE.search(err.read_text(errors="replace")):
+            return "cuda_oom"
+    except OSError:
+        pass
+    # Preempted jobs are killed by the scheduler without an exit status of their own
+    if task.get("queue") == PREEMPT_QUEUE and (task["status"] == "ABORTED" or exit_code in ("-", "143", "")):
+        return "preempted"
+    return "error"
+
+
+def annotate_tasks(tasks: List[Dict[str, str]], manifest_tokens: Dict[str, Optional[int]]) -> List[dict]:
+    """Join every task attempt with its timings and the token counts of its inputs."""
+    records = []
+    for task in tasks:
+        submit = parse_timestamp(task.get("submit"))
+        start = parse_timestamp(task.get("start"))
+        realtime = parse_duration(task.get("realtime"))
+        if realtime is None:
+            realtime = parse_duration(task.get("duration"))
+        peak_rss = parse_memory(task.get("peak_rss"))
+
+        token_counts = []
+        for key, path in task_inputs(task):
+            tokens = manifest_tokens.get(key)
+            if tokens is None and path is not None:
+                tokens = count_tokens(path)
+            token_counts.append(tokens)
+        known = [tokens for tokens in token_counts if tokens is not None]
+
+        records.append({
+            "process": task["process"],
+            "name": task.get("name", ""),
+            "tag": task.get("tag", ""),
+            "status": task["status"],
+            "exit": task.get("exit", ""),
+            "attempt": int(task.get("attempt") or 1),
+            "queue": task.get("queue", ""),
+            "failure": failure_class(task),
+            "queue_wait_s": start - submit if start is not None and submit is not None else None,
+            "realtime_s": realtime,
+            "peak_rss_gb": peak_rss / MEMORY_UNITS["GB"] if peak_rss is not None else None,
+            "items": len(token_counts),
+            "unknown_items": len(token_counts) - len(known),
+            "tokens": sum(known) if known else None,
+            "max_tokens": max(known) if known else None,
+            "tokens_sq": sum(tokens ** 2 for tokens in known) if known else None,
+        })
+    return records
+
+
+def fit(features: List[List[float]], target: List[float], names: List[str]) -> Optional[dict]:
+    """Least squares fit of target on the features, dropping constant features."""
+    X = np.asarray(features, dtype=float)
+    y = np.asarray(target, dtype=float)
+    varying = [i for i in range(X.shape[1]) if np.ptp(X[:, i]) > 0]
+    if len(y) < len(varying) + 2:
+        return None
+    design = np.column_stack([np.ones(len(y))] + [X[:, i] for i in varying])
+    coef, *_ = np.linalg.lstsq(design, y, rcond=None)
+    residual = y - design @ coef
+    total = np.sum((y - y.mean()) ** 2)
+    coefficients = {"intercept": float(coef[0])}
+    coefficients.update({names[i]: float(value) for i, value in zip(varying, coef[1:])})
+    return {
+        "coefficients": coefficients,
+        "r2": float(1 - np.sum(residual ** 2) / total) if total > 0 else 1.0,
+        "n": int(len(y)),
+    }
+
+
+def fit_models(records: List[dict]) -> Dict[str, dict]:
+    """Fit runtime and peak memory models of each process on its fully tokenised completed attempts.
+
+    Runtime is modelled as setup + per item + per token + per squared token (attention) cost of
+    the batch, peak memory as a quadratic in the largest input of the batch.
+    """
+    models = {}
+    for process in sorted({record["process"] for record in records}):
+        usable = [record for record in records
+                  if record["process"] == process and record["status"] == "COMPLETED"
+                  and record["items"] and not record["unknown_items"] and record["realtime_s"] is not None]
+        if not usable:
+            continue
+        runtime = fit([[r["items"], r["tokens"], r["tokens_sq"]] for r in usable],
+                      [r["realtime_s"] for r in usable], ["per_item", "per_token", "per_token_sq"])
+        with_memory = [r for r in usable if r["peak_rss_gb"] is not None]
+        memory = fit([[r["max_tokens"], r["max_tokens"] ** 2] for r in with_memory],
+                     [r["peak_rss_gb"] for r in with_memory], ["per_token", "per_token_sq"]) if with_memory else None
+        tokens = sorted(r["tokens"] / r["items"] for r in usable)
+        models[process] = {
+            "runtime_s": runtime,
+            "peak_rss_gb": memory,
+            "median_item_tokens": tokens[len(tokens) // 2],
+        }
+    return models
+
+
+def suggest_batch(model: dict, time_limit: float) -> Optional[int]:
+    """Largest batch of median sized inputs the runtime model predicts to finish within the time limit."""
+    runtime = model.get("runtime_s")
+    if not runtime:
+        return None
+    coefficients = runtime["coefficients"]
+    tokens = model["median_item_tokens"]
+    per_item = (coefficients.get("per_item", 0) + coefficients.get("per_token", 0) * tokens
+                + coefficients.get("per_token_sq", 0) * tokens ** 2)
+    if per_item <= 0:
+        return None
+    return max(int((time_limit - coefficients["intercept"]) // per_item), 0)
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest rank percentile of a list of values."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))]
+
+
+def total_hours(records: List[dict]) -> float:
+    """Sum the runtime of task attempts in hours."""
+    return sum(record["realtime_s"] or 0 for record in records) / 3600
+
+
+def summarize(records: List[dict], models: Dict[str, dict], time_limit: float) -> List[dict]:
+    """Aggregate the task attempts of each process."""
+    rows = []
+    for process in sorted({record["process"] for record in records}):
+        attempts = [record for record in records if record["process"] == process]
+        completed = [record for record in attempts if record["status"] == "COMPLETED"]
+        failed = [record for record in attempts if record["status"] != "COMPLETED"]
+        waits = [record["queue_wait_s"] for record in attempts if record["queue_wait_s"] is not None]
+        rss = [record["peak_rss_gb"] for record in attempts if record["peak_rss_gb"] is not None]
+        tokens = sum(record["tokens"] or 0 for record in completed)
+        items = sum(record["items"] for record in completed)
+        gpu_hours = total_hours(attempts)
+
+        model = models.get(process, {})
+        runtime = model.get("runtime_s")
+        setup_fraction = None
+        if runtime and completed:
+            mean_runtime = total_hours(completed) * 3600 / len(completed)
+            setup_fraction = runtime["coefficients"]["intercept"] / mean_runtime if mean_runtime else None
+
+        row = {
+            "process": process,
+            "attempts": len(attempts),
+            "completed": len(completed),
+            "failed": len(failed),
+            "retried_tasks": len({record["name"] for record in attempts if record["attempt"] > 1}),
+            "items": items,
+            "tokens": tokens,
+            "mean_batch": items / len(completed) if completed else None,
+            "gpu_hours": gpu_hours,
+            "wasted_hours": total_hours(failed),
+            "queue_wait_median_min": percentile(waits, 0.5) / 60 if waits else None,
+            "queue_wait_p90_min": percentile(waits, 0.9) / 60 if waits else None,
+            "queue_wait_hours": sum(waits) / 3600,
+            "peak_rss_gb": max(rss) if rss else None,
+            # Failed attempts count against throughput, they used the GPU all the same
+            "tokens_per_gpu_hour": tokens / gpu_hours if tokens and gpu_hours else None,
+            "setup_fraction": setup_fraction,
+            "suggested_inf_batch": suggest_batch(model, time_limit) if model else None,
+        }
+        for failure in ["oom", "cuda_oom", "timeout", "preempted", "error"]:
+            row[f"{failure}_hours"] = total_hours([record for record in failed if record["failure"] == failure])
+        rows.append(row)
+    return rows
+
+
+def format_value(value) -> str:
+    """Format a table value, rounding floats."""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
+
+
+def write_table(rows: List[dict], headers: List[str], output_file: str) -> None:
+    """Write rows as a TSV file."""
+    with open(output_file, "w") as f:
+        f.write("\t".join(headers) + "\n")
+        for row in rows:
+            f.write("\t".join(format_value(row.get(header)) for header in headers) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report GPU throughput, retry waste and a cost model from Nextflow traces")
+    parser.add_argument("trace", nargs="+", help="Nextflow execution trace files (pipeline_info/execution_trace_*.txt)")
+    parser.add_argument("--manifest", action="extend", nargs="+", default=[],
+                        help="Combination manifests (SQLite) from tsv2json.py with the token counts")
+    parser.add_argument("--process", action="append",
+                        help="Process to report, e.g. AF3_FOLD. Can be given multiple times "
+                             f"(default: {', '.join(GPU_PROCESSES)})")
+    parser.add_argument("--time-limit", type=float, default=2.0,
+                        help="Time limit in hours the suggested inf_batch must fit in (default: 2, the gpu-preempt limit)")
+    parser.add_argument("--output", "-o", default="trace_report.tsv", help="Per process report (default: trace_report.tsv)")
+    parser.add_argument("--tasks", default="trace_tasks.tsv", help="Per attempt table (default: trace_tasks.tsv)")
+    parser.add_argument("--model", default="trace_model.json", help="Fitted cost models (default: trace_model.json)")
+
+    args = parser.parse_args()
+
+    for trace_file in args.trace:
+        if not Path(trace_file).exists():
+            logging.error(f"Error: Trace file {trace_file} does not exist")
+            sys.exit(1)
+
+    processes = args.process or GPU_PROCESSES
+    tasks = [task for task in read_traces(args.trace) if task["process"] in processes]
+    if not tasks:
+        logging.error("No task attempts found in the trace files")
+        sys.exit(1)
+
+    records = annotate_tasks(tasks, read_manifests(args.manifest))
+    models = fit_models(records)
+    summary = summarize(records, models, args.time_limit * 3600)
+
+    write_table(records, TASK_HEADERS, args.tasks)
+    write_table(summary, SUMMARY_HEADERS, args.output)
+    with open(args.model, "w") as f:
+        json.dump(models, f, indent=2)
+
+    for row in summary:
+        logging.info(f"{row['process']}: {row['attempts']} attempts, {format_value(row['gpu_hours'])} h, "
+                     f"{format_value(row['wasted_hours'])} h wasted, "
+                     f"{format_value(row['tokens_per_gpu_hour'])} tokens/GPU-hour")
+    logging.info(f"Wrote {args.output}, {args.tasks} and {args.model}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,22 +4,41 @@ Converts a TSV file with bait/prey entries to separate AlphaFold3 JSON files
 for each unique bait-prey combination, or ColabFold FASTA files, or Boltz FASTA files.
 """
 
+import csv
 import json
-import pandas as pd
+import hashlib
 import argparse
 import sys
-import requests
 import time
 from pathlib import Path
 import re
 from typing import Dict, List, Tuple, Optional, Any, Union
 import logging
+import os
+import sqlite3
+
+from compressed_io import COMPRESSION_SUFFIXES, add_compression, open_text, strip_compression
+from tool_metrics import Metrics, profiled
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Columns of the combinations table written with --manifest
+MANIFEST_COLUMNS = [
+    "foldid", "key", "mode", "shard", "bait_entry", "prey_entry", "bait_name", "prey_name", "window",
+    "bait_chain", "prey_chain", "bait_type", "prey_type", "bait_sha1", "prey_sha1",
+    "bait_tokens", "prey_tokens", "num_tokens", "output_path",
+]
+# UniProt REST API, can be pointed at a mirror with --uniprot-url
+UNIPROT_URL = "https://rest.uniprot.org"
+# Heavy atoms of a SMILES string, each one token
+SMILES_ATOM_RE = re.compile(r"Cl|Br|\[[^\]]+\]|[BCNOPSFI]|[bcnops]")
+
 class TSV2AFConverter:
-    def __init__(self, workdir: str = ".") -> None:
+    def __init__(self, workdir: str = ".", window_size: Optional[int] = None, window_overlap: int = 200,
+                 domains_file: Optional[Union[str, Path]] = None,
+                 ligand_index: Optional[Union[str, Path]] = None, uniprot_url: str = UNIPROT_URL,
+                 metrics: Optional[Metrics] = None, compression: Optional[str] = None) -> None:
         self.base_structure = {
             "name": "",
             "modelSeeds": [1],
@@ -28,21 +47,55 @@ class TSV2AFConverter:
             "sequences": []
         }
         self.workdir = Path(workdir)
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'AF3Converter/1.0 (Python script for AlphaFold3 conversion)'
-        })
+        # Phase timings and counters, written with --metrics
+        self.metrics = metrics or Metrics("tsv2json")
+        # gzip/zstd compression of the written JSON/FASTA files, None writes plain text
+        self.compression = compression
+        self.uniprot_url = uniprot_url.rstrip('/')
+        # Created on first use, runs with all sequences cached or local do not import requests
+        self._session = None
         # Cache for UniProt sequences to avoid duplicate requests
         self.sequence_cache: Dict[str, Optional[str]] = {}
+        # Long protein preys are split into windows of window_size residues
+        self.window_size = window_size
+        self.window_overlap = window_overlap
+        if window_size and not 0 <= window_overlap < window_size:
+            raise ValueError("Window overlap must be smaller than the window size")
+        self.domains: Dict[str, List[Tuple[int, int]]] = {}
+        if domains_file:
+            self.domains = self.read_domains(domains_file)
+        # One record per written output file, for the combination manifest
+        self.combination_records: List[Dict[str, Any]] = []
+        # SMILES -> code of the cached Boltz2 molecule
+        self.ligand_codes: Dict[str, str] = {}
+        if ligand_index:
+            self.ligand_codes = self.read_ligand_index(ligand_index)
     
-    def read_tsv(self, tsv_file: Union[str, Path]) -> pd.DataFrame:
-        """Read the input TSV file."""
+    @property
+    def session(self):
+        """HTTP session for the UniProt API."""
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+            self._session.headers.update({
+                'User-Agent': 'AF3Converter/1.0 (Python script for AlphaFold3 conversion)'
+            })
+        return self._session
+    
+    def read_tsv(self, tsv_file: Union[str, Path]) -> List[Dict[str, Any]]:
+        """Read the input TSV file into rows with lowercased column names and an integer bait flag."""
         try:
-            df = pd.read_csv(tsv_file, sep='\t')
-            df.columns = df.columns.str.lower()
-            if 'entry' not in df.columns or 'bait' not in df.columns:
+            with self.metrics.phase('read_tsv'):
+                with open_text(tsv_file) as f:
+                    reader = csv.reader(f, delimiter='\t')
+                    columns = [column.lower() for column in next(reader)]
+                    rows = [dict(zip(columns, row)) for row in reader if row]
+            if 'entry' not in columns or 'bait' not in columns:
                 raise ValueError("TSV must contain 'Entry' and 'Bait' columns")
-            return df
+            for row in rows:
+                row['bait'] = int(float(row['bait']))
+            self.metrics.count('tsv_rows', len(rows))
+            return rows
         except Exception as e:
             logging.error(f"Error reading TSV file: {e}")
             sys.exit(1)
@@ -58,6 +111,8 @@ class TSV2AFConverter:
                 results[uniprot_id] = self.sequence_cache[uniprot_id]
             else:
                 uncached_ids.append(uniprot_id)
+        self.metrics.count('sequence_cache_hits', len(uniprot_ids) - len(uncached_ids))
+        self.metrics.count('sequence_cache_misses', len(uncached_ids))
         
         if not uncached_ids:
             return results
@@ -83,7 +138,7 @@ class TSV2AFConverter:
 
     def _fetch_batch(self, uniprot_ids: List[str]) -> Dict[str, Optional[str]]:
         """Fetch a single batch of sequences."""
-        url = "https://rest.uniprot.org/uniprotkb/stream"
+        url = f"{self.uniprot_url}/uniprotkb/stream"
         
         params = {
             'query': f'accession:{" OR accession:".join(uniprot_ids)}',
@@ -91,10 +146,14 @@ class TSV2AFConverter:
             'compressed': 'false'
         }
         
+        import requests
+        
         max_retries = 3
         for attempt in range(max_retries):
             try:
                 response = self.session.get(url, params=params, timeout=30)
+                self.metrics.count('http_requests')
+                self.metrics.count('http_bytes', len(response.content))
                 if response.status_code == 200:
                     batch_sequences = self._parse_fasta_batch(response.text)
                     
@@ -115,6 +174,7 @@ class TSV2AFConverter:
                     logging.error(f"Batch request failed with status {response.status_code}")
                     break
             except requests.RequestException as e:
+                self.metrics.count('http_errors')
                 logging.error(f"Request error in batch (attempt {attempt + 1}): {e}")
                 if attempt < max_retries - 1:
                     time.sleep(1)
@@ -158,23 +218,39 @@ class TSV2AFConverter:
         results = self.fetch_uniprot_sequences_batch([uniprot_id])
         return results.get(uniprot_id)
     
-    def collect_uniprot_ids(self, df: pd.DataFrame) -> List[str]:
-        """Collect all UniProt IDs from the dataframe for batch fetching."""
+    def collect_uniprot_ids(self, rows: List[Dict[str, Any]]) -> List[str]:
+        """Collect all UniProt IDs from the TSV rows for batch fetching."""
         uniprot_ids = []
         
-        for entry in df['entry'].unique():
+        for entry in dict.fromkeys(row['entry'] for row in rows):
             if self.get_entry_type(entry) == 'uniprot':
                 uniprot_ids.append(entry)
         
         return list(set(uniprot_ids))  # Remove duplicates
     
-    def prefetch_uniprot_sequences(self, df: pd.DataFrame) -> None:
+    def load_sequence_cache(self, cache_file: Union[str, Path]) -> None:
+        """Load UniProt sequences written by a previous prefetch run."""
+        with self.metrics.phase('load_sequence_cache'):
+            with open_text(cache_file) as f:
+                cached = json.load(f)
+        self.sequence_cache.update(cached)
+        logging.info(f"Loaded {len(cached)} cached UniProt sequences from {cache_file}")
+    
+    def write_sequence_cache(self, cache_file: Union[str, Path]) -> None:
+        """Write the UniProt sequence cache so other workers can skip fetching."""
+        with self.metrics.phase('write_sequence_cache'):
+            with open_text(cache_file, 'w') as f:
+                json.dump(self.sequence_cache, f, indent=2, sort_keys=True)
+        logging.info(f"Wrote {len(self.sequence_cache)} UniProt sequences to {cache_file}")
+    
+    def prefetch_uniprot_sequences(self, rows: List[Dict[str, Any]]) -> None:
         """Pre-fetch all UniProt sequences in batches."""
-        uniprot_ids = self.collect_uniprot_ids(df)
+        uniprot_ids = self.collect_uniprot_ids(rows)
         
         if uniprot_ids:
             logging.info(f"Pre-fetching {len(uniprot_ids)} unique UniProt sequences...")
-            self.fetch_uniprot_sequences_batch(uniprot_ids)
+            with self.metrics.phase('fetch_uniprot'):
+                self.fetch_uniprot_sequences_batch(uniprot_ids)
             logging.info("Pre-fetching complete!")
     
     def read_fasta(self, fasta_file: Union[str, Path]) -> Union[str, Dict[str, str]]:
@@ -189,8 +265,10 @@ class TSV2AFConverter:
             fasta_path = self.workdir / fasta_path
         
         try:
-            with open(fasta_path, 'r') as f:
-                lines = f.readlines()
+            with self.metrics.phase('read_fasta'):
+                with open(fasta_path, 'r') as f:
+                    lines = f.readlines()
+            self.metrics.count('fasta_files_parsed')
             
             sequences = {}
             current_header = None
@@ -395,10 +473,10 @@ class TSV2AFConverter:
         sequence_chars = set(sequence.upper())
         return len(sequence_chars - rna_chars) == 0 and 'T' not in sequence.upper()
     
-    def generate_combinations(self, df: pd.DataFrame) -> List[Tuple[str, str]]:
+    def generate_combinations(self, rows: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
         """Generate all unique bait-prey combinations."""
-        baits = df[df['bait'] == 1]['entry'].tolist()
-        preys = df[df['bait'] == 0]['entry'].tolist()
+        baits = [row['entry'] for row in rows if row['bait'] == 1]
+        preys = [row['entry'] for row in rows if row['bait'] == 0]
         
         combinations_list = []
         
@@ -409,6 +487,107 @@ class TSV2AFConverter:
         
         return combinations_list
     
+    @staticmethod
+    def shard_of(bait: str, prey: str, num_shards: int) -> int:
+        """Return the 1-based shard a bait-prey combination belongs to.
+        
+        Uses a hash of the entry pair so the assignment does not depend on row order
+        or on the Python hash seed.
+        """
+        digest = hashlib.sha1(f"{bait}\t{prey}".encode()).digest()
+        return int.from_bytes(digest[:8], 'big') % num_shards + 1
+    
+    def select_shard(self, combinations: List[Tuple[str, str]], shard: Tuple[int, int]) -> List[Tuple[str, str]]:
+        """Keep only the combinations assigned to the given (index, total) shard."""
+        index, num_shards = shard
+        return [(bait, prey) for bait, prey in combinations if self.shard_of(bait, prey, num_shards) == index]
+    
+    def write_shard_manifest(self, manifest_file: Union[str, Path], shard: Tuple[int, int],
+                             outputs: Dict[Tuple[str, str], List[Path]]) -> None:
+        """Write the combinations handled by this shard for check_shards.py."""
+        index, num_shards = shard
+        with open_text(manifest_file, 'w') as f:
+            f.write("bait\tprey\tshard\tnum_shards\tnum_outputs\n")
+            for (bait, prey), filepaths in outputs.items():
+                f.write(f"{bait}\t{prey}\t{index}\t{num_shards}\t{len(filepaths)}\n")
+    
+    def read_domains(self, domains_file: Union[str, Path]) -> Dict[str, List[Tuple[int, int]]]:
+        """Read user supplied prey domain boundaries.
+        
+        The TSV needs 'name', 'start' and 'end' columns. 'name' is the prey name used in the
+        output filenames (UniProt ID or FASTA header), positions are 1-based and inclusive.
+        """
+        domains_path = Path(domains_file)
+        if not domains_path.is_absolute():
+            domains_path = self.workdir / domains_path
+        
+        domains: Dict[str, List[Tuple[int, int]]] = {}
+        with open(domains_path, 'r', newline='') as f:
+            reader = csv.DictReader(f, delimiter='\t')
+            reader.fieldnames = [name.lower() for name in reader.fieldnames]
+            if not {'name', 'start', 'end'} <= set(reader.fieldnames):
+                raise ValueError("Domains TSV must contain 'name', 'start' and 'end' columns")
+            for row in reader:
+                start, end = int(row['start']), int(row['end'])
+                if not 1 <= start <= end:
+                    raise ValueError(f"Invalid domain {start}-{end} for {row['name']}")
+                domains.setdefault(row['name'], []).append((start, end))
+        
+        logging.info(f"Loaded domain boundaries for {len(domains)} preys")
+        return domains
+    
+    def read_ligand_index(self, index_file: Union[str, Path]) -> Dict[str, str]:
+        """Read the SMILES -> code index written by prepare_ligand_cache.py."""
+        with open(index_file, 'r', newline='') as f:
+            codes = {row['smiles']: row['code'] for row in csv.DictReader(f, delimiter='\t') if row['code']}
+        logging.info(f"Loaded {len(codes)} cached ligands from {index_file}")
+        return codes
+    
+    def get_windows(self, name: str, sequence: str) -> List[Tuple[int, int]]:
+        """Return the 1-based inclusive windows a prey is split into, or an empty list.
+        
+        User supplied domains take precedence over sliding windows.
+        """
+        if name in self.domains:
+            return [(start, min(end, len(sequence))) for start, end in self.domains[name] if start <= len(sequence)]
+        
+        if not self.window_size or len(sequence) <= self.window_size:
+            return []
+        
+        step = self.window_size - self.window_overlap
+        windows = []
+        for start in range(0, len(sequence) - self.window_overlap, step):
+            end = min(start + self.window_size, len(sequence))
+            # Align the last window to the C-terminus so it keeps the full window size
+            windows.append((max(end - self.window_size, 0) + 1, end))
+            if end == len(sequence):
+                break
+        return windows
+    
+    @staticmethod
+    def window_name(name: str, start: int, end: int) -> str:
+        """Name of a prey window. rank_af.py --recombine-windows relies on the '__w' suffix."""
+        return f"{name}__w{start}-{end}"
+    
+    def window_sequences(self, name: str, sequence: str) -> List[Tuple[str, str]]:
+        """Split a prey sequence into (name, sequence) windows, or return it unchanged."""
+        windows = self.get_windows(name, sequence)
+        if not windows:
+            return [(name, sequence)]
+        return [(self.window_name(name, start, end), sequence[start - 1:end]) for start, end in windows]
+    
+    def expand_prey_windows(self, prey_items: List[Tuple[Dict[str, Any], str]]) -> List[Tuple[Dict[str, Any], str]]:
+        """Replace long protein preys in (sequence object, name) pairs by one pair per window."""
+        expanded = []
+        for seq_obj, name in prey_items:
+            protein = seq_obj.get("protein")
+            if protein is None:
+                expanded.append((seq_obj, name))
+                continue
+            for window_name, window_seq in self.window_sequences(name, protein["sequence"]):
+                expanded.append(({"protein": {**protein, "sequence": window_seq}}, window_name))
+        return expanded
+    
     def get_entry_name(self, entry: str) -> str:
         """Get the name to use for the entry in output filenames."""
         entry_type = self.get_entry_type(entry)
@@ -456,6 +635,116 @@ class TSV2AFConverter:
             # For non-FASTA entries, use the entry itself (e.g., UniProt ID)
             return entry
     
+    def entry_names(self, entry: str) -> List[str]:
+        """Get the names of all sequences of an entry as used in output filenames."""
+        if self.get_entry_type(entry) == 'fasta_file':
+            try:
+                return list(self.read_fasta(entry).keys())
+            except Exception:
+                return [Path(entry).stem]
+        return [entry]
+    
+    @staticmethod
+    def output_stem(bait_name: str, prey_name: str) -> str:
+        """Return the output filename stem (and foldid) of a bait-prey sequence pair."""
+        safe_bait = re.sub(r'[^\w\-_.]', '_', bait_name)
+        safe_prey = re.sub(r'[^\w\-_.]', '_', prey_name)
+        return f"{safe_bait}_{safe_prey}"
+    
+    @staticmethod
+    def chain_info(seq_obj: Dict[str, Any]) -> Tuple[str, str, Optional[int]]:
+        """Return (entity type, sequence sha1, token count) of a sequence object.
+        
+        Polymers have one token per residue and SMILES ligands one per heavy atom. The token
+        count of CCD ligands is not known without the CCD, so it is left empty.
+        """
+        for seq_type in ['protein', 'dna', 'rna']:
+            if seq_type in seq_obj:
+                sequence = seq_obj[seq_type]['sequence']
+                return seq_type, hashlib.sha1(sequence.encode()).hexdigest(), len(sequence)
+        ligand = seq_obj['ligand']
+        if 'smiles' in ligand:
+            return 'ligand', hashlib.sha1(ligand['smiles'].encode()).hexdigest(), len(SMILES_ATOM_RE.findall(ligand['smiles']))
+        return 'ligand', hashlib.sha1(ligand['ccdCodes'][0].encode()).hexdigest(), None
+    
+    def record_combination(self, bait_entry: str, prey_entry: str, bait_name: str, prey_name: str,
+                           bait_seq_obj: Dict[str, Any], prey_seq_obj: Dict[str, Any], filepath: Path) -> None:
+        """Remember the metadata of one written output file for the combination manifest."""
+        bait_type, bait_sha1, bait_tokens = self.chain_info(bait_seq_obj)
+        prey_type, prey_sha1, prey_tokens = self.chain_info(prey_seq_obj)
+        window = re.search(r"__w(\d+-\d+)$", prey_name)
+        foldid = strip_compression(filepath).stem
+        self.combination_records.append({
+            "foldid": foldid,
+            "key": foldid.lower(),
+            "bait_entry": bait_entry,
+            "prey_entry": prey_entry,
+            "bait_name": bait_name,
+            "prey_name": prey_name,
+            "window": window.group(1) if window else "",
+            "bait_chain": "A",
+            "prey_chain": "B",
+            "bait_type": bait_type,
+            "prey_type": prey_type,
+            "bait_sha1": bait_sha1,
+            "prey_sha1": prey_sha1,
+            "bait_tokens": bait_tokens,
+            "prey_tokens": prey_tokens,
+            "num_tokens": bait_tokens + prey_tokens if bait_tokens is not None and prey_tokens is not None else None,
+            "output_path": str(filepath),
+        })
+    
+    def write_manifest(self, manifest_file: Union[str, Path], mode: str, shard: Optional[Tuple[int, int]],
+                       path_prefix: Optional[str] = None) -> None:
+        """Write the combination records to an indexed SQLite table keyed by lowercased foldid.
+
+        The table is written to a temporary file that replaces the manifest, so no rows of an
+        earlier run survive. With path_prefix the output paths are stored as <path_prefix>/<file>.
+        Foldids that differ only by case share a key, so they raise a ValueError instead of one
+        row replacing the other.
+        """
+        records: Dict[str, Dict[str, Any]] = {}
+        for record in self.combination_records:
+            other = records.get(record["key"])
+            if other is not None and other["foldid"] != record["foldid"]:
+                raise ValueError(f"Foldids {other['foldid']} and {record['foldid']} differ only by case, "
+                                 f"rename one of the entries")
+            # An output written twice keeps its last record
+            records[record["key"]] = record
+
+        shard_label = f"{shard[0]}/{shard[1]}" if shard else ""
+        tmp_file = Path(f"{manifest_file}.tmp")
+        tmp_file.unlink(missing_ok=True)
+        with self.metrics.phase('write_manifest'), sqlite3.connect(tmp_file) as conn:
+            conn.execute(f"CREATE TABLE combinations ({', '.join(MANIFEST_COLUMNS)}, PRIMARY KEY (key))")
+            conn.execute("CREATE INDEX combinations_pair ON combinations (bait_entry, prey_entry)")
+            rows = []
+            for record in records.values():
+                output_path = record["output_path"]
+                if path_prefix:
+                    output_path = str(Path(path_prefix) / Path(output_path).name)
+                record = dict(record, mode=mode, shard=shard_label, output_path=output_path)
+                rows.append([record.get(column) for column in MANIFEST_COLUMNS])
+            conn.executemany(f"INSERT INTO combinations VALUES ({', '.join('?' * len(MANIFEST_COLUMNS))})", rows)
+        conn.close()
+        os.replace(tmp_file, manifest_file)
+        logging.info(f"Wrote {len(records)} combinations to {manifest_file}")
+    
+    def write_output(self, filepath: Path, text: str) -> Path:
+        """Write one JSON/FASTA input file, compressed with --compress, and count it in the metrics.
+
+        Returns the path written, which has the suffix of the compression appended.
+        """
+        filepath = add_compression(filepath, self.compression)
+        with self.metrics.phase('write'):
+            with open_text(filepath, 'w') as f:
+                f.write(text)
+        self.metrics.count('files_written')
+        self.metrics.count('bytes_written', len(text))
+        if self.compression:
+            self.metrics.count('bytes_compressed', filepath.stat().st_size)
+        return filepath
+    
     def create_json_for_combination(self, bait_entry: str, prey_entry: str, output_dir: Union[str, Path]) -> List[Path]:
         """Create JSON file(s) for a specific bait-prey combination."""
         created_files = []
@@ -483,9 +772,14 @@ class TSV2AFConverter:
         if not bait_sequences or not prey_sequences:
             raise RuntimeError(f"No valid sequences for combination {bait_entry}-{prey_entry}")
 
+        # Name each prey sequence and split long preys into windows
+        prey_items = self.expand_prey_windows(
+            [(seq_obj, self.get_entry_name_for_sequence(prey_entry, j)) for j, seq_obj in enumerate(prey_sequences)]
+        )
+
         # Generate all combinations for multi-entry FASTA files
         for i, bait_seq_obj in enumerate(bait_sequences):
-            for j, prey_seq_obj in enumerate(prey_sequences):
+            for prey_seq_obj, prey_name in prey_items:
                 # Reset sequence IDs for each JSON file: bait = "A", prey = "B"
                 bait_seq_corrected = bait_seq_obj.copy()
                 prey_seq_corrected = prey_seq_obj.copy()
@@ -501,7 +795,6 @@ class TSV2AFConverter:
 
                 # Create structure name using specific sequence names for FASTA files
                 bait_name = self.get_entry_name_for_sequence(bait_entry, i)
-                prey_name = self.get_entry_name_for_sequence(prey_entry, j)
 
                 # Create structure
                 structure = self.base_structure.copy()
@@ -509,16 +802,15 @@ class TSV2AFConverter:
                 structure["sequences"] = sequences
 
                 # Create filename using sequence name for FASTA files
-                safe_bait = re.sub(r'[^\w\-_.]', '_', bait_name)
-                safe_prey = re.sub(r'[^\w\-_.]', '_', prey_name)
-                filename = f"{safe_bait}_{safe_prey}.json"
+                filename = f"{self.output_stem(bait_name, prey_name)}.json"
                 filepath = Path(output_dir) / filename
 
                 # Write file
                 try:
-                    with open(filepath, 'w') as f:
-                        json.dump(structure, f, indent=2)
+                    filepath = self.write_output(filepath, json.dumps(structure, indent=2))
                     created_files.append(filepath)
+                    self.record_combination(bait_entry, prey_entry, bait_name, prey_name,
+                                            bait_seq_obj, prey_seq_obj, filepath)
                 except Exception as e:
                     raise RuntimeError(f"Error writing file {filepath}: {e}")
 
@@ -542,6 +834,13 @@ class TSV2AFConverter:
                 prey_name = self.get_entry_name(prey_entry)
                 prey_seqs = {prey_name: prey_seqs}
             
+            # Split long preys into windows
+            prey_seqs = {
+                window_name: window_seq
+                for prey_header, prey_seq in prey_seqs.items()
+                for window_name, window_seq in self.window_sequences(prey_header, prey_seq)
+            }
+            
             # Generate all combinations
             for bait_header, bait_seq in bait_seqs.items():
                 for prey_header, prey_seq in prey_seqs.items():
@@ -549,19 +848,18 @@ class TSV2AFConverter:
                     combined_sequence = f"{bait_seq}:{prey_seq}"
                     
                     # Create filename using sequence names
-                    safe_bait = re.sub(r'[^\w\-_.]', '_', bait_header)
-                    safe_prey = re.sub(r'[^\w\-_.]', '_', prey_header)
-                    filename = f"{safe_bait}_{safe_prey}.fasta"
+                    filename = f"{self.output_stem(bait_header, prey_header)}.fasta"
                     filepath = Path(output_dir) / filename
                     
-                    # Write FASTA file
-                    with open(filepath, 'w') as f:
-                        f.write(f">{bait_header}_{prey_header}\n")
-                        # Write sequence with line breaks every 80 characters
-                        for i in range(0, len(combined_sequence), 80):
-                            f.write(combined_sequence[i:i+80] + '\n')
+                    # Write FASTA file with line breaks every 80 characters
+                    lines = [f">{bait_header}_{prey_header}"]
+                    lines += [combined_sequence[i:i+80] for i in range(0, len(combined_sequence), 80)]
+                    filepath = self.write_output(filepath, '\n'.join(lines) + '\n')
                     
                     created_files.append(filepath)
+                    self.record_combination(bait_entry, prey_entry, bait_header, prey_header,
+                                            {"protein": {"sequence": bait_seq}}, {"protein": {"sequence": prey_seq}},
+                                            filepath)
             
             return created_files
             
@@ -595,9 +893,14 @@ class TSV2AFConverter:
         if not bait_sequences or not prey_sequences:
             raise RuntimeError(f"No valid sequences for combination {bait_entry}-{prey_entry}")
 
+        # Name each prey sequence and split long preys into windows
+        prey_items = self.expand_prey_windows(
+            [(seq_obj, self.get_entry_name_for_sequence(prey_entry, j)) for j, seq_obj in enumerate(prey_sequences)]
+        )
+
         # Generate all combinations for multi-entry FASTA files
         for i, bait_seq_obj in enumerate(bait_sequences):
-            for j, prey_seq_obj in enumerate(prey_sequences):
+            for prey_seq_obj, prey_name in prey_items:
                 # Start with sequence ID 'A' and increment
                 current_id = 'A'
                 fasta_content = []
@@ -614,6 +917,10 @@ class TSV2AFConverter:
                             if 'ccdCodes' in ligand_data:
                                 fasta_content.append(f">{current_id}|ccd")
                                 fasta_content.append(ligand_data['ccdCodes'][0])
+                            elif ligand_data.get('smiles') in self.ligand_codes:
+                                # Conformer cached by prepare_ligand_cache.py
+                                fasta_content.append(f">{current_id}|ccd")
+                                fasta_content.append(self.ligand_codes[ligand_data['smiles']])
                             elif 'smiles' in ligand_data:
                                 fasta_content.append(f">{current_id}|smiles")
                                 fasta_content.append(ligand_data['smiles'])
@@ -640,6 +947,10 @@ class TSV2AFConverter:
                             if 'ccdCodes' in ligand_data:
                                 fasta_content.append(f">{current_id}|ccd")
                                 fasta_content.append(ligand_data['ccdCodes'][0])
+                            elif ligand_data.get('smiles') in self.ligand_codes:
+                                # Conformer cached by prepare_ligand_cache.py
+                                fasta_content.append(f">{current_id}|ccd")
+                                fasta_content.append(self.ligand_codes[ligand_data['smiles']])
                             elif 'smiles' in ligand_data:
                                 fasta_content.append(f">{current_id}|smiles")
                                 fasta_content.append(ligand_data['smiles'])
@@ -655,82 +966,118 @@ class TSV2AFConverter:
                     
                 # Create filename using specific sequence names for FASTA files
                 bait_name = self.get_entry_name_for_sequence(bait_entry, i)
-                prey_name = self.get_entry_name_for_sequence(prey_entry, j)
 
-                safe_bait = re.sub(r'[^\w\-_.]', '_', bait_name)
-                safe_prey = re.sub(r'[^\w\-_.]', '_', prey_name)
-                filename = f"{safe_bait}_{safe_prey}.fasta"
+                filename = f"{self.output_stem(bait_name, prey_name)}.fasta"
                 filepath = Path(output_dir) / filename
 
                 # Write FASTA file
                 try:
-                    with open(filepath, 'w') as f:
-                        f.write('\n'.join(fasta_content) + '\n')
+                    filepath = self.write_output(filepath, '\n'.join(fasta_content) + '\n')
 
                     created_files.append(filepath)
+                    self.record_combination(bait_entry, prey_entry, bait_name, prey_name,
+                                            bait_seq_obj, prey_seq_obj, filepath)
                 except Exception as e:
                     raise RuntimeError(f"Error writing file {filepath}: {e}")
 
         return created_files
     
-    def convert(self, tsv_file: Union[str, Path], output_dir: str = "output", mode: str = "alphafold3") -> List[Path]:
-        """Convert TSV to multiple AlphaFold3 JSON files or ColabFold FASTA files."""
-        df = self.read_tsv(tsv_file)
+    def convert(self, tsv_file: Union[str, Path], output_dir: str = "output", mode: str = "alphafold3",
+                shard: Optional[Tuple[int, int]] = None, shard_manifest: Optional[Union[str, Path]] = None,
+                manifest: Optional[Union[str, Path]] = None, manifest_prefix: Optional[str] = None) -> List[Path]:
+        """Convert TSV to multiple AlphaFold3 JSON files or ColabFold FASTA files.
+        
+        Args:
+            shard: Optional (index, total) pair; only combinations hashed to this shard are written
+            shard_manifest: Optional TSV listing the combinations written by this shard
+            manifest: Optional SQLite file with one row of metadata per written output file
+            manifest_prefix: Optional directory the output paths in the manifest are relative to
+        """
+        rows = self.read_tsv(tsv_file)
         
         # Create output directory
         Path(output_dir).mkdir(exist_ok=True)
         
         # Validate data
-        if df['bait'].sum() == 0:
+        if not any(row['bait'] == 1 for row in rows):
             raise ValueError("No bait entries found (bait=1)")
         
-        if (df['bait'] == 0).sum() == 0:
+        if not any(row['bait'] == 0 for row in rows):
             raise ValueError("No prey entries found (bait=0)")
         
         # Validate entries for ColabFold mode
         if mode == "colabfold":
             invalid_entries = []
-            for entry in df['entry']:
-                if not self.validate_colabfold_entry(entry):
-                    invalid_entries.append(entry)
+            for row in rows:
+                if not self.validate_colabfold_entry(row['entry']):
+                    invalid_entries.append(row['entry'])
             
             if invalid_entries:
                 raise ValueError(f"ColabFold mode only supports UniProt IDs and FASTA files with protein sequences. "
                                 f"Invalid entries: {invalid_entries}")
         
         # Pre-fetch all UniProt sequences in batches
-        self.prefetch_uniprot_sequences(df)
+        self.prefetch_uniprot_sequences(rows)
         
         # Generate combinations
-        combinations = self.generate_combinations(df)
+        combinations = self.generate_combinations(rows)
         
         logging.info(f"Found {len(combinations)} bait-prey combinations")
         logging.info(f"Mode: {mode}")
         
+        if shard:
+            combinations = self.select_shard(combinations, shard)
+            logging.info(f"Shard {shard[0]}/{shard[1]}: {len(combinations)} combinations assigned")
+        
         # Process each combination
         created_files = []
-        for i, (bait, prey) in enumerate(combinations, 1):
+        outputs: Dict[Tuple[str, str], List[Path]] = {}
+        with self.metrics.phase('combinations'):
+            for i, (bait, prey) in enumerate(combinations, 1):
             
-            if mode == "alphafold3":
-                filepaths = self.create_json_for_combination(bait, prey, output_dir)
-                created_files.extend(filepaths)
-            elif mode == "colabfold":
-                filepaths = self.create_fasta_for_colab_combination(bait, prey, output_dir)
-                created_files.extend(filepaths)
-            elif mode == "boltz":
-                filepaths = self.create_fasta_for_boltz_combination(bait, prey, output_dir)
+                if mode == "alphafold3":
+                    filepaths = self.create_json_for_combination(bait, prey, output_dir)
+                elif mode == "colabfold":
+                    filepaths = self.create_fasta_for_colab_combination(bait, prey, output_dir)
+                elif mode == "boltz":
+                    filepaths = self.create_fasta_for_boltz_combination(bait, prey, output_dir)
+                else:
+                    raise ValueError(f"Unknown mode '{mode}'. Supported modes: alphafold3, colabfold, boltz")
                 created_files.extend(filepaths)
-            else:
-                raise ValueError(f"Unknown mode '{mode}'. Supported modes: alphafold3, colabfold, boltz")
+                outputs[(bait, prey)] = filepaths
             
-            # Minimal delay - no longer needed since we're using batch API
-            # Only add delay every 50 combinations for very large datasets
-            if i % 50 == 0:
-                time.sleep(0.1)
+                # Minimal delay - no longer needed since we're using batch API
+                # Only add delay every 50 combinations for very large datasets
+                if i % 50 == 0:
+                    time.sleep(0.1)
+        self.metrics.count('combinations', len(combinations))
+        
+        if shard and shard_manifest:
+            self.write_shard_manifest(shard_manifest, shard, outputs)
+        
+        if manifest:
+            self.write_manifest(manifest, mode, shard, manifest_prefix)
         
         file_type = "JSON" if mode == "alphafold3" else "FASTA"
         logging.info(f"Completed! Created {len(created_files)} {file_type} files in '{output_dir}' directory")
         return created_files
+    
+    def prefetch(self, tsv_file: Union[str, Path], cache_file: Union[str, Path]) -> None:
+        """Resolve every UniProt entry once and write the sequence cache."""
+        rows = self.read_tsv(tsv_file)
+        self.prefetch_uniprot_sequences(rows)
+        self.write_sequence_cache(cache_file)
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse an 'i/N' shard specification (1-based index)."""
+    try:
+        index, num_shards = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard must be given as i/N, got '{value}'")
+    if num_shards < 1 or not 1 <= index <= num_shards:
+        raise argparse.ArgumentTypeError(f"Shard index must be between 1 and N, got '{value}'")
+    return index, num_shards
 
 
 def main() -> None:
@@ -742,6 +1089,35 @@ def main() -> None:
                         help='Work directory for relative paths (default: .)')
     parser.add_argument('--mode', choices=['alphafold3', 'colabfold', 'boltz'], default='alphafold3',
                         help='Output mode: alphafold3 (JSON files) or colabfold (FASTA files) or boltz (FASTA files) (default: alphafold3)')
+    parser.add_argument('--sequence-cache',
+                        help='JSON file of prefetched UniProt sequences. Read if it exists, written with --prefetch-only')
+    parser.add_argument('--prefetch-only', action='store_true',
+                        help='Only fetch UniProt sequences and write them to --sequence-cache')
+    parser.add_argument('--shard', type=parse_shard,
+                        help='Only write combinations assigned to shard i of N (e.g. 1/4)')
+    parser.add_argument('--shard-manifest',
+                        help='TSV file listing the combinations written by this shard')
+    parser.add_argument('--window-size', type=int,
+                        help='Split protein preys longer than this into overlapping windows (default: off)')
+    parser.add_argument('--window-overlap', type=int, default=200,
+                        help='Overlap between prey windows in residues (default: 200)')
+    parser.add_argument('--domains',
+                        help='TSV with name, start, end columns of prey domains to use as windows')
+    parser.add_argument('--manifest',
+                        help='SQLite file with bait/prey entries, sequence hashes and token counts of every output')
+    parser.add_argument('--manifest-prefix',
+                        help='Store the output paths in the manifest as <prefix>/<file>, e.g. where the outputs are published')
+    parser.add_argument('--ligand-index',
+                        help='Ligand index from prepare_ligand_cache.py; cached SMILES are written as ccd codes (Boltz)')
+    parser.add_argument('--uniprot-url', default=UNIPROT_URL,
+                        help=f'Base URL of the UniProt REST API (default: {UNIPROT_URL})')
+    parser.add_argument('--metrics',
+                        help='JSON file with the wall/CPU time of each phase, counters and peak RSS of this run')
+    parser.add_argument('--profile',
+                        help='Write cProfile stats of this run to this file (read with python -m pstats)')
+    parser.add_argument('--compress', choices=sorted(COMPRESSION_SUFFIXES),
+                        help='Compress the JSON/FASTA outputs with gzip (.gz) or zstd (.zst) (default: off). '
+                             'The manifests and sequence cache are compressed if their name ends in .gz/.zst')
     
     args = parser.parse_args()
     
@@ -749,8 +1125,29 @@ def main() -> None:
         logging.error(f"Error: Input file {args.input_tsv} does not exist")
         sys.exit(1)
     
-    converter = TSV2AFConverter(args.workdir)
-    converter.convert(args.input_tsv, args.output_dir, args.mode)
+    if args.prefetch_only and not args.sequence_cache:
+        parser.error("--prefetch-only requires --sequence-cache")
+    
+    metrics = Metrics("tsv2json")
+    try:
+        with profiled(args.profile):
+            converter = TSV2AFConverter(args.workdir, args.window_size, args.window_overlap, args.domains,
+                                        args.ligand_index, args.uniprot_url, metrics, args.compress)
+            
+            if args.prefetch_only:
+                converter.prefetch(args.input_tsv, args.sequence_cache)
+                return
+            
+            if args.sequence_cache and Path(args.sequence_cache).exists():
+                converter.load_sequence_cache(args.sequence_cache)
+            
+            converter.convert(args.input_tsv, args.output_dir, args.mode,
+                              shard=args.shard, shard_manifest=args.shard_manifest, manifest=args.manifest,
+                              manifest_prefix=args.manifest_prefix)
+    finally:
+        # Also written for failed runs, with the phases completed so far
+        if args.metrics:
+            metrics.write(args.metrics)
 
 
 if __name__ == "__main__":
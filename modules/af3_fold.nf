@@ -1,7 +1,9 @@
 process AF3_FOLD {
     label 'gpu'
     label 'error_ignore'
-    publishDir "${params.outdir}/${params.mode}", mode: 'copy', pattern: "folds/*"
+    // Embeddings and distograms are published through the embedding store when it is enabled
+    publishDir "${params.outdir}/${params.mode}", mode: 'copy', pattern: "folds/**",
+        saveAs: { filename -> params.embedding_store && filename.endsWith('.npz') ? null : filename }
 
     container "docker://baldikacti/alphafold3:latest"
 
@@ -11,8 +13,10 @@ process AF3_FOLD {
     path af3_model
 
     output:
-    path "folds/*"
+    path "folds/**"
     path ("folds/*/*_summary_confidences.json") , emit: summary_json
+    path ("folds/*/*_model.cif")                , emit: model
+    path ("folds/*/seed-*/*.npz")               , emit: arrays, optional: true
 
     script:
     def args = task.ext.args ?: ''
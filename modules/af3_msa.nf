@@ -1,7 +1,9 @@
 process AF3_MSA {
     label 'process_high'
     label 'error_ignore'
-    publishDir "${params.outdir}/${params.mode}/msa", mode: 'copy', pattern: "*_data.json"
+    // The folds read the uncompressed file, only the published copy is compressed with msa_compress
+    publishDir "${params.outdir}/${params.mode}/msa", mode: 'copy', pattern: params.msa_compress ? "*_data.json.gz" : "*_data.json",
+        enabled: !params.msa_store
 
     container "docker://baldikacti/alphafold3:latest"
 
@@ -11,11 +13,14 @@ process AF3_MSA {
 
     output:
     path("*_data.json"), emit: af3_json_processed
+    path("*_data.json.gz"), optional: true
 
     script:
     def name = json.baseName
+    def compress = params.msa_compress && !params.msa_store ? "gzip -c ${name}_data.json > ${name}_data.json.gz" : ''
     """
     run_alphafold.py --norun_inference --json_path $json --output_dir msa --db_dir $af3_db
     ln -s \$(find msa -name "*.json" -type f) ${name}_data.json
+    $compress
     """
 }
\ No newline at end of file
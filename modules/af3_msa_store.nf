@@ -0,0 +1,18 @@
+process AF3_MSA_STORE {
+    label 'process_single'
+    publishDir "${params.outdir}/${params.mode}/msa_store", mode: 'copy'
+
+    container "docker://baldikacti/chienlab_proteinfold_py:latest"
+
+    input:
+    path ("msa/*")
+
+    output:
+    path ("store")      , emit: store
+    path ("manifests")  , emit: manifests
+
+    script:
+    """
+    af3_msa_store.py pack store msa/*_data.json --manifest-dir manifests
+    """
+}
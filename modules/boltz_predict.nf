@@ -1,7 +1,9 @@
 process BOLTZ_PREDICT {
     label 'gpu'
     label 'error_ignore'
-    publishDir "${params.outdir}/${params.mode}", mode: 'copy', pattern: "folds/**"
+    // Embeddings are published through the embedding store when it is enabled
+    publishDir "${params.outdir}/${params.mode}", mode: 'copy', pattern: "folds/**",
+        saveAs: { filename -> params.embedding_store && filename ==~ /.*\/embeddings_[^\/]*\.npz/ ? null : filename }
 
     container "docker://baldikacti/boltz:latest"
 
@@ -12,15 +14,17 @@ process BOLTZ_PREDICT {
     output:
     path ("folds/**")
     path ("folds/predictions/*/*_model_0.json"), emit: confidence_json
+    path ("folds/predictions/*/*_model_0.{cif,pdb}"), emit: model
+    path ("folds/predictions/*/embeddings_*.npz"), emit: arrays, optional: true
 
     script:
     def args = task.ext.args ?: ''
+    def kernel_cache = params.boltz_kernel_cache ?: '.'
     """
-    mkdir numba_cache
-    mkdir pytorch_kernel_cache
-    export NUMBA_CACHE_DIR=./numba_cache
-    export PYTORCH_KERNEL_CACHE_PATH=./pytorch_kernel_cache
-    boltz predict --out_dir . --cache $cache --num_workers $task.cpus $args input_fasta/
+    mkdir -p ${kernel_cache}/numba_cache ${kernel_cache}/pytorch_kernel_cache
+    export NUMBA_CACHE_DIR=${kernel_cache}/numba_cache
+    export PYTORCH_KERNEL_CACHE_PATH=${kernel_cache}/pytorch_kernel_cache
+    boltz predict --out_dir . --cache ${cache} --num_workers $task.cpus $args input_fasta/
     mv boltz_results_input_fasta folds
     """
 }
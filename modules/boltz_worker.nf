@@ -0,0 +1,62 @@
+process BOLTZ_ENQUEUE {
+    label 'process_single'
+
+    container "docker://baldikacti/chienlab_proteinfold_py:latest"
+
+    input:
+    path ("input_fasta/*")
+    val queue
+
+    output:
+    path ("jobs.txt") , emit: jobs
+
+    script:
+    // The queue lives outside the work directory, workers of retried and resumed tasks share it
+    """
+    boltz_worker.py enqueue ${queue} input_fasta/* --reset
+    ls input_fasta > jobs.txt
+    """
+}
+
+process BOLTZ_WORKER {
+    tag "worker ${worker}"
+    label 'gpu'
+    label 'error_ignore'
+    // Embeddings are published through the embedding store when it is enabled
+    publishDir "${params.outdir}/${params.mode}", mode: 'copy', pattern: "folds/**",
+        saveAs: { filename -> params.embedding_store && filename ==~ /.*\/embeddings_[^\/]*\.npz/ ? null : filename }
+
+    container "docker://baldikacti/boltz:latest"
+
+    input:
+    path jobs
+    val queue
+    path cache
+    each worker
+
+    output:
+    path ("folds/**"), optional: true
+    path ("folds/predictions/*/*_model_0.json"), emit: confidence_json, optional: true
+    path ("folds/predictions/*/*_model_0.{cif,pdb}"), emit: model, optional: true
+    path ("folds/predictions/*/embeddings_*.npz"), emit: arrays, optional: true
+    path ("failed/*.fasta"), emit: failed, optional: true
+    path ("claimed.tsv"), emit: claimed
+
+    script:
+    def args = task.ext.args ?: ''
+    def kernel_cache = params.boltz_kernel_cache ?: '.'
+    """
+    mkdir -p ${kernel_cache}/numba_cache ${kernel_cache}/pytorch_kernel_cache
+    export NUMBA_CACHE_DIR=${kernel_cache}/numba_cache
+    export PYTORCH_KERNEL_CACHE_PATH=${kernel_cache}/pytorch_kernel_cache
+    boltz_worker.py serve ${queue} \\
+        --out-dir folds \\
+        --cache ${cache} \\
+        --batch-size ${params.inf_batch} \\
+        --worker-id worker_${worker} \\
+        --idle-timeout 30 \\
+        --claimed claimed.tsv \\
+        --failed-dir failed \\
+        -- --num_workers ${task.cpus} $args
+    """
+}
@@ -0,0 +1,28 @@
+process CASCADE_PLAN {
+    label 'process_single'
+    publishDir "${params.outdir}/${params.mode}/cascade", mode: 'copy'
+
+    container "docker://baldikacti/chienlab_proteinfold_py:latest"
+
+    input:
+    path acc_file
+    path ranked_tsv
+    val mode
+
+    output:
+    // No accession files are written when no pair passes, which is a normal result of a weak screen
+    path ("cascade_[0-9]*.tsv") , emit: acc_files, optional: true
+    path ("cascade_selected.tsv"), emit: selected
+
+    script:
+    def args = task.ext.args ?: ''
+    """
+    cascade.py plan \\
+        --workdir ${workflow.launchDir} \\
+        --ranked ${ranked_tsv} \\
+        --mode ${mode} \\
+        --prefix cascade \\
+        $args \\
+        ${acc_file}
+    """
+}
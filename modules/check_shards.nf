@@ -0,0 +1,21 @@
+process CHECK_SHARDS {
+    label 'process_single'
+    publishDir "${params.outdir}/${params.mode}/preprocessing", mode: 'copy', pattern: 'shard_check.txt'
+
+    container "docker://baldikacti/chienlab_proteinfold_py:latest"
+
+    input:
+    path acc_file
+    path ("manifests/*")
+    val  num_shards
+
+    output:
+    path ("shard_check.txt") , emit: report
+
+    script:
+    """
+    check_shards.py --num-shards ${num_shards} ${acc_file} manifests/* > shard_check.txt || status=\$?
+    cat shard_check.txt
+    exit \${status:-0}
+    """
+}
@@ -0,0 +1,53 @@
+process CLUSTER_PREYS {
+    label 'process_single'
+    publishDir "${params.outdir}/${params.mode}/clusters", mode: 'copy'
+
+    container "docker://baldikacti/chienlab_proteinfold_py:latest"
+
+    input:
+    path acc_file
+    path sequence_cache
+
+    output:
+    path ("representatives.tsv") , emit: acc_file
+    path ("clusters.tsv")        , emit: clusters
+
+    script:
+    def args = task.ext.args ?: ''
+    """
+    cluster_preys.py cluster \\
+        --workdir ${workflow.launchDir} \\
+        --sequence-cache ${sequence_cache} \\
+        --output representatives.tsv \\
+        --clusters clusters.tsv \\
+        $args \\
+        ${acc_file}
+    """
+}
+
+process EXPAND_CLUSTERS {
+    label 'process_single'
+    publishDir "${params.outdir}/${params.mode}/clusters", mode: 'copy'
+
+    container "docker://baldikacti/chienlab_proteinfold_py:latest"
+
+    input:
+    path acc_file
+    path clusters
+    path ranked_tsv
+
+    output:
+    path ("expanded_*.tsv") , emit: acc_files, optional: true
+
+    script:
+    def args = task.ext.args ?: ''
+    """
+    cluster_preys.py expand \\
+        --workdir ${workflow.launchDir} \\
+        --clusters ${clusters} \\
+        --ranked ${ranked_tsv} \\
+        --prefix expanded \\
+        $args \\
+        ${acc_file}
+    """
+}
@@ -7,7 +7,7 @@ process COLABFOLD_BATCH {
     container "docker://ghcr.io/sokrypton/colabfold:1.5.5-cuda12.2.2"
 
     input:
-    tuple val(accID), path(fasta)
+    tuple val(accID), path(query)
     path ("params/*")
     val  numRec
     val  outDir
@@ -16,12 +16,14 @@ process COLABFOLD_BATCH {
     path ("*")                        , emit: pdb
     path ("*_toprank.json")           , emit: json
     path ("*.png")                    , emit: multiqc
+    path ("*_unrelaxed_rank_001_*.pdb"), emit: model
+    tuple val(accID), path ("*.a3m")  , emit: a3m, optional: true
 
     script:
     def args = task.ext.args ?: ''
     """
     colabfold_batch \\
-        ${fasta} \\
+        ${query} \\
         \$PWD \\
         --num-recycle ${numRec} \\
         --data \$PWD \\
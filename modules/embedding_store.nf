@@ -0,0 +1,19 @@
+process EMBEDDING_STORE {
+    label 'process_medium'
+    publishDir "${params.outdir}/${params.mode}", mode: 'copy'
+
+    container "docker://baldikacti/chienlab_proteinfold_py:latest"
+
+    input:
+    path ("arrays/*")
+
+    output:
+    path ("embedding_store"), emit: store
+
+    script:
+    def args = task.ext.args ?: ''
+    """
+    embedding_store.py pack embedding_store arrays/* $args
+    embedding_store.py verify embedding_store arrays/*
+    """
+}
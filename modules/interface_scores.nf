@@ -0,0 +1,26 @@
+process INTERFACE_SCORES {
+    label 'process_medium'
+    publishDir "${params.outdir}", mode: 'copy', pattern: "*interface*.tsv"
+
+    container "docker://baldikacti/chienlab_proteinfold_py:latest"
+
+    input:
+    path ("models/*")
+    path ranked_tsv
+    val mode
+
+    output:
+    path ("${mode}_interface_scores.tsv")          , emit: scores
+    path ("${mode}_interface_ranked_results.tsv")  , emit: tsv
+
+    script:
+    """
+    interface_scores.py \\
+        --input-dir models \\
+        --mode ${mode} \\
+        --workers ${task.cpus} \\
+        --output ${mode}_interface_scores.tsv \\
+        --ranked ${ranked_tsv} \\
+        --ranked-output ${mode}_interface_ranked_results.tsv
+    """
+}
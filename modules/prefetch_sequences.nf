@@ -0,0 +1,22 @@
+process PREFETCH_SEQUENCES {
+    label 'process_single'
+    publishDir "${params.outdir}/pipeline_info", mode: 'copy', pattern: 'metrics/*'
+
+    container "docker://baldikacti/chienlab_proteinfold_py:latest"
+
+    input:
+    path acc_file
+
+    output:
+    path ("sequences.json") , emit: cache
+    path ("metrics/*")      , emit: metrics
+
+    script:
+    def profile = params.profile_tools ? "--profile metrics/tsv2json_prefetch.prof" : ''
+    """
+    mkdir -p metrics
+    tsv2json.py --prefetch-only --sequence-cache sequences.json --workdir ${workflow.launchDir} \\
+        --metrics metrics/tsv2json_prefetch.json $profile \\
+        ${acc_file}
+    """
+}
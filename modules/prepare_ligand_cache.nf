@@ -0,0 +1,28 @@
+process PREPARE_LIGAND_CACHE {
+    label 'process_single'
+    publishDir "${params.outdir}/${params.mode}", mode: 'copy', pattern: "ligand_index.tsv"
+
+    container "docker://baldikacti/boltz:latest"
+
+    input:
+    path acc_file
+    path cache
+
+    output:
+    path ("merged_cache")     , emit: cache
+    path ("ligand_index.tsv") , emit: index
+
+    script:
+    """
+    prepare_ligand_cache.py \\
+        --output-dir ligand_cache \\
+        --index ligand_index.tsv \\
+        --boltz-cache ${cache} \\
+        ${acc_file}
+
+    # Overlay the cached ligands on the Boltz cache with symlinks once, the GPU tasks stage the merged cache
+    mkdir -p merged_cache/mols
+    cp -rs \$(readlink -f ${cache})/. merged_cache/
+    cp -rs \$(readlink -f ligand_cache)/mols/. merged_cache/mols/
+    """
+}
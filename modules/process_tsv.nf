@@ -1,18 +1,41 @@
 process PROCESS_TSV {
+    tag "shard ${shard}/${num_shards}"
     label 'process_single'
-    publishDir "${params.outdir}/${params.mode}/preprocessing", mode: 'copy', pattern: '*.{fasta,json}'
+    publishDir "${params.outdir}/${params.mode}/preprocessing", mode: 'copy', pattern: '*.{fasta,json,sqlite}'
+    publishDir "${params.outdir}/pipeline_info", mode: 'copy', pattern: 'metrics/*'
 
     container "docker://baldikacti/chienlab_proteinfold_py:latest"
 
     input:
     path acc_file
+    path sequence_cache
+    path ligand_index
     val mode
+    val num_shards
+    each shard
 
     output:
-    path ("*.{fasta,json}") , emit: processed_tsv_output
+    path ("*.{fasta,json}") , emit: processed_tsv_output, optional: true
+    path ("shard_*.tsv")    , emit: manifest
+    path ("combinations_*.sqlite"), emit: combinations
+    path ("metrics/*")      , emit: metrics
 
     script:
+    def args = task.ext.args ?: ''
+    def ligands = ligand_index ? "--ligand-index ${ligand_index}" : ''
+    def prefix = "metrics/tsv2json_${mode}_${shard}_of_${num_shards}"
+    def profile = params.profile_tools ? "--profile ${prefix}.prof" : ''
     """
-    tsv2json.py --output-dir . --workdir ${workflow.launchDir} --mode ${mode} ${acc_file}
+    mkdir -p metrics
+    tsv2json.py --output-dir . --workdir ${workflow.launchDir} --mode ${mode} \\
+        --sequence-cache ${sequence_cache} \\
+        --shard ${shard}/${num_shards} \\
+        --shard-manifest shard_${shard}_of_${num_shards}.tsv \\
+        --manifest combinations_${shard}_of_${num_shards}.sqlite \\
+        --manifest-prefix ${params.mode}/preprocessing \\
+        --metrics ${prefix}.json $profile \\
+        $ligands \\
+        $args \\
+        ${acc_file}
     """
-}
\ No newline at end of file
+}
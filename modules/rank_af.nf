@@ -1,18 +1,27 @@
 process RANK_AF {
     label 'process_single'
     publishDir "${params.outdir}", mode: 'copy', pattern: "*ranked_results.tsv"
+    publishDir "${params.outdir}/pipeline_info", mode: 'copy', pattern: 'metrics/*'
 
     container "docker://baldikacti/chienlab_proteinfold_py:latest"
 
     input:
     path summary_json
+    path ("manifests/*")
     val mode
 
     output:
     path ("*ranked_results.tsv"), emit: tsv
+    path ("metrics/*")          , emit: metrics
 
     script:
+    def args = task.ext.args ?: ''
+    def profile = params.profile_tools ? "--profile metrics/rank_af_${mode}.prof" : ''
     """
-    rank_af.py --output="${mode}_ranked_results.tsv" --mode $mode
+    mkdir -p metrics
+    rank_af.py --output="${mode}_ranked_results.tsv" --mode $mode \\
+        --metrics metrics/rank_af_${mode}.json $profile \\
+        \$(for manifest in manifests/*; do echo "--manifest \$manifest"; done) \\
+        $args
     """
 }
\ No newline at end of file
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The tools in bin/ import each other as top level modules, as they do on the PATH of a task
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "bin"))
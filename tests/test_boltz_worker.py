@@ -0,0 +1,126 @@
+from pathlib import Path
+
+from boltz_worker import ClaimedLog, JobQueue, StubBackend, serve
+
+SEQUENCES = {
+    "BAIT_PREY1": "MKTAYIAKQRQISFVKSHFSRQ",
+    "BAIT_PREY2": "MSDNGPQNQRNAPRITFGGPSD",
+    "BAIT_PREY3": "MADEEKLPPGWEKRMSRSSGRV",
+    "BAIT_PREY4": "MGSSHHHHHHSSGLVPRGSHMA",
+    "BAIT_PREY5": "MTEYKLVVVGAGGVGKSALTIQ",
+}
+
+
+class FailingBackend(StubBackend):
+    """Stub backend that fails the given foldids."""
+
+    def __init__(self, fail):
+        super().__init__()
+        self.fail = set(fail)
+
+    def predict(self, fasta_files, out_dir):
+        results = super().predict([fasta for fasta in fasta_files if fasta.stem not in self.fail], out_dir)
+        return {fasta: results.get(fasta, False) for fasta in fasta_files}
+
+
+def write_inputs(tmp_path):
+    inputs = tmp_path / "inputs"
+    inputs.mkdir()
+    for foldid, prey in SEQUENCES.items():
+        (inputs / f"{foldid}.fasta").write_text(f">A|protein\nMKVLAAGIVG\n>B|protein\n{prey}\n")
+    return sorted(str(path) for path in inputs.glob("*.fasta"))
+
+
+def run_worker(queue, backend, out_dir, worker_id, claimed=None):
+    (out_dir / "predictions").mkdir(parents=True, exist_ok=True)
+    queue.recover(worker_id)
+    queue.restore(worker_id, out_dir)
+    return serve(queue, backend, out_dir, worker_id, batch_size=2, idle_timeout=0, poll_interval=0, claimed=claimed)
+
+
+def read_claimed(path):
+    lines = path.read_text().splitlines()
+    assert lines[0] == "foldid\tstatus\tinput"
+    return [tuple(line.split("\t")) for line in lines[1:]]
+
+
+def test_claim_finish_and_report(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue"))
+    queue.enqueue(write_inputs(tmp_path))
+
+    out_dir = tmp_path / "worker_1" / "folds"
+    claimed = ClaimedLog(tmp_path / "claimed.tsv")
+    stats = run_worker(queue, FailingBackend(["BAIT_PREY3"]), out_dir, "worker_1", claimed)
+
+    assert stats["done"] == 4 and stats["failed"] == 1
+    assert queue.counts() == {"pending": 0, "done": 4, "failed": 1, "running": 0}
+    # Finished jobs are published to the shared folds directory before they move to done
+    for foldid in SEQUENCES:
+        shared = queue.queue_dir / "folds" / "predictions" / foldid / f"confidence_{foldid}_model_0.json"
+        assert shared.exists() == (foldid != "BAIT_PREY3")
+
+    # Every job is listed as running when claimed, then with its final status and queue file
+    rows = read_claimed(tmp_path / "claimed.tsv")
+    assert [foldid for foldid, status, _ in rows if status == "running"] == sorted(SEQUENCES)
+    final = {foldid: (status, path) for foldid, status, path in rows}
+    assert final["BAIT_PREY3"] == ("failed", str(queue.queue_dir.resolve() / "failed" / "BAIT_PREY3.fasta"))
+    assert final["BAIT_PREY1"][0] == "done"
+
+    assert queue.copy_failed("worker_1", tmp_path / "failed") == 1
+    assert [path.name for path in (tmp_path / "failed").iterdir()] == ["BAIT_PREY3.fasta"]
+
+
+def test_restarted_worker_requeues_running_jobs_and_restores_finished_ones(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue"))
+    queue.enqueue(write_inputs(tmp_path))
+
+    # The first attempt finishes one batch and is killed while predicting the second
+    first = tmp_path / "attempt_1" / "folds"
+    (first / "predictions").mkdir(parents=True)
+    finished = queue.claim("worker_1", 2)
+    StubBackend().predict(finished, first)
+    for fasta in finished:
+        queue.publish(first, fasta.stem)
+    queue.finish("worker_1", finished, ok=True)
+    queue.claim("worker_1", 2)
+    assert queue.counts() == {"pending": 1, "done": 2, "failed": 0, "running": 2}
+
+    # The retry starts in a new work directory with the same worker name
+    second = tmp_path / "attempt_2" / "folds"
+    (second / "predictions").mkdir(parents=True)
+    assert queue.recover("worker_1") == 2
+    assert sorted(path.name for path in queue.restore("worker_1", second)) == sorted(path.name for path in finished)
+    serve(queue, StubBackend(), second, "worker_1", batch_size=2, idle_timeout=0, poll_interval=0)
+
+    assert queue.counts() == {"pending": 0, "done": 5, "failed": 0, "running": 0}
+    assert sorted(path.name for path in (second / "predictions").iterdir()) == sorted(SEQUENCES)
+    assert queue.ledger("worker_1") == {foldid: "done" for foldid in SEQUENCES}
+
+
+def test_workers_emit_disjoint_jobs(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue"))
+    queue.enqueue(write_inputs(tmp_path))
+
+    batch = queue.claim("worker_1", 2)
+    queue.finish("worker_1", batch, ok=True)
+    run_worker(queue, StubBackend(), tmp_path / "worker_2" / "folds", "worker_2")
+
+    assert set(queue.ledger("worker_1")) == {path.stem for path in batch}
+    assert set(queue.ledger("worker_2")) == set(SEQUENCES) - {path.stem for path in batch}
+    # A worker that claims nothing reports an empty list
+    claimed = ClaimedLog(tmp_path / "claimed.tsv")
+    run_worker(queue, StubBackend(), tmp_path / "worker_3" / "folds", "worker_3", claimed)
+    assert read_claimed(tmp_path / "claimed.tsv") == []
+    assert queue.copy_failed("worker_3", tmp_path / "failed") == 0
+
+
+def test_reset_clears_an_earlier_run(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue"))
+    queue.enqueue(write_inputs(tmp_path))
+    run_worker(queue, StubBackend(), tmp_path / "folds", "worker_1")
+
+    queue.reset()
+    assert queue.counts() == {"pending": 0, "done": 0, "failed": 0, "running": 0}
+    assert queue.ledger("worker_1") == {}
+    assert not any((queue.queue_dir / "folds" / "predictions").iterdir())
+    assert Path(queue.queue_dir / "claimed").is_dir()
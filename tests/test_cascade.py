@@ -0,0 +1,36 @@
+import argparse
+
+from cascade import DEFAULT_THRESHOLDS, plan
+
+ACCESSIONS = "Entry\tBait\nP00001\t1\nQ00001\t0\nQ00002\t0\nQ00003\t0\n"
+RANKED = "foldid\tiptm\nP00001_Q00001\t0.45\nP00001_Q00002\t0.21\nP00001_Q00003\t0.12\n"
+
+
+def run_plan(tmp_path, monkeypatch, threshold=None, top_fraction=None):
+    (tmp_path / "acclist.tsv").write_text(ACCESSIONS)
+    (tmp_path / "ranked.tsv").write_text(RANKED)
+    monkeypatch.chdir(tmp_path)
+    thresholds = dict(DEFAULT_THRESHOLDS, colabfold=threshold) if threshold is not None else dict(DEFAULT_THRESHOLDS)
+    plan(argparse.Namespace(workdir=str(tmp_path), input_tsv="acclist.tsv", ranked="ranked.tsv", mode="colabfold",
+                            thresholds=thresholds, top_fraction=top_fraction, prefix="cascade", write_inputs=None))
+    return sorted(path.name for path in tmp_path.glob("cascade_[0-9]*.tsv"))
+
+
+def test_selected_pairs_are_written(tmp_path, monkeypatch):
+    assert run_plan(tmp_path, monkeypatch) == ["cascade_1.tsv"]
+    assert (tmp_path / "cascade_1.tsv").read_text() == "Entry\tBait\nP00001\t1\nQ00001\t0\n"
+    assert (tmp_path / "cascade_selected.tsv").read_text().splitlines()[1:] == ["P00001_Q00001\tP00001\tQ00001\t0.45"]
+
+
+def test_empty_selection_writes_no_accession_files(tmp_path, monkeypatch):
+    assert run_plan(tmp_path, monkeypatch, threshold=0.9) == []
+    assert (tmp_path / "cascade_selected.tsv").read_text() == "foldid\tbait\tprey\tcolabfold_iptm\n"
+
+
+def test_float_bait_flags_and_engine_foldids_match(tmp_path, monkeypatch):
+    (tmp_path / "acclist.tsv").write_text("Entry\tBait\nP00001\t1.0\nQ00001\t0.0\n")
+    (tmp_path / "ranked.tsv").write_text("foldid\tranking_score\np00001_q00001__w1-400_summary_confidences\t0.8\n")
+    monkeypatch.chdir(tmp_path)
+    plan(argparse.Namespace(workdir=str(tmp_path), input_tsv="acclist.tsv", ranked="ranked.tsv", mode="alphafold3",
+                            thresholds=dict(DEFAULT_THRESHOLDS), top_fraction=None, prefix="cascade", write_inputs=None))
+    assert (tmp_path / "cascade_1.tsv").read_text() == "Entry\tBait\nP00001\t1.0\nQ00001\t0.0\n"
@@ -0,0 +1,64 @@
+import importlib.util
+
+import pytest
+
+from compressed_io import add_compression, compression_of, open_text, strip_compression
+from rank_af import process_json_files
+from tool_metrics import Metrics
+
+HAS_ZSTD = importlib.util.find_spec("zstandard") is not None
+TEXT = "foldid\tiptm\r\nBAIT_PREY\t0.5\n" + "MKTAYIAKQRQISFVKSHFSRQ\n" * 1000
+
+
+@pytest.mark.parametrize("compression", [
+    None, "gzip", pytest.param("zstd", marks=pytest.mark.skipif(not HAS_ZSTD, reason="needs zstandard")),
+])
+def test_round_trip(tmp_path, compression):
+    path = add_compression(tmp_path / "inputs.tsv", compression)
+    with open_text(path, "w") as f:
+        f.write(TEXT)
+    assert compression_of(path) == compression
+    # Line endings are kept when reading, as with open(..., newline='')
+    with open_text(path) as f:
+        assert f.read() == TEXT
+    if compression:
+        assert path.stat().st_size < len(TEXT)
+
+
+@pytest.mark.skipif(HAS_ZSTD, reason="zstandard is installed")
+def test_zstd_without_the_package_raises(tmp_path):
+    with pytest.raises(RuntimeError, match="zstandard"):
+        open_text(tmp_path / "x.json.zst", "w")
+
+
+@pytest.mark.parametrize("name, foldid", [
+    ("BAIT_PREY_summary_confidences.json", "BAIT_PREY_summary_confidences"),
+    ("BAIT_PREY_summary_confidences.json.gz", "BAIT_PREY_summary_confidences"),
+    ("BAIT_PREY__w1-400_data.json.zst", "BAIT_PREY__w1-400_data"),
+    ("BAIT_PREY.1.fasta.gz", "BAIT_PREY.1"),
+    ("archive.tar", "archive"),
+])
+def test_strip_compression_keeps_the_foldid(name, foldid):
+    assert strip_compression(name).stem == foldid
+    assert str(strip_compression(add_compression(name, "gzip"))) == name
+
+
+def test_rank_af_skips_unreadable_summaries(tmp_path):
+    with open_text(tmp_path / "confidence_BAIT_P1_model_0.json.gz", "w") as f:
+        f.write('{"confidence_score": 0.7}')
+    (tmp_path / "confidence_BAIT_P2_model_0.json").write_text("{broken")
+    # Without zstandard the .zst summary cannot be opened, with it the JSON is broken
+    if HAS_ZSTD:
+        with open_text(tmp_path / "confidence_BAIT_P3_model_0.json.zst", "w") as f:
+            f.write("{broken")
+    else:
+        (tmp_path / "confidence_BAIT_P3_model_0.json.zst").write_bytes(b"\x28\xb5\x2f\xfd")
+
+    metrics = Metrics("rank_af")
+    output = tmp_path / "ranked.tsv"
+    process_json_files(str(tmp_path), str(output), "boltz", metrics=metrics)
+
+    assert metrics.counters["files_parsed"] == 1
+    assert metrics.counters["parse_errors"] == 2
+    lines = output.read_text().splitlines()
+    assert len(lines) == 2 and lines[1].startswith("BAIT_P1")
@@ -0,0 +1,37 @@
+import argparse
+
+import numpy as np
+import pytest
+
+from embedding_store import EmbeddingStore, pack_files, verify
+
+ARRAYS = {
+    "z": np.arange(24, dtype=np.float32).reshape(2, 3, 4),
+    "s": np.linspace(-1, 1, 40, dtype=np.float32).reshape(10, 4),
+    "empty_rows": np.zeros((0, 4), dtype=np.float32),
+    "empty_columns": np.zeros((3, 0), dtype=np.float32),
+    "scalar": np.array(7.5, dtype=np.float64),
+}
+
+
+@pytest.mark.parametrize("codec", ["zlib", "npy"])
+@pytest.mark.parametrize("float16", [False, True])
+def test_pack_verify_get_round_trip(tmp_path, codec, float16):
+    npz = tmp_path / "boltz" / "BAIT_PREY" / "embeddings_BAIT_PREY.npz"
+    npz.parent.mkdir(parents=True)
+    np.savez(npz, **ARRAYS)
+
+    store = EmbeddingStore(tmp_path / "store")
+    args = argparse.Namespace(float16=float16, codec=codec, level=6, chunk_mb=16 / (1 << 20), remove=False)
+    pack_files(store, [npz], args)
+
+    store = EmbeddingStore(tmp_path / "store")
+    assert verify(store, [npz], max_rel_error=1e-3)
+    for key, original in ARRAYS.items():
+        stored = np.asarray(store.read("bait_prey", f"embeddings/{key}"))
+        assert stored.shape == original.shape
+        np.testing.assert_allclose(stored, original, rtol=1e-3)
+    # Row ranges of chunked and empty arrays
+    np.testing.assert_allclose(store.read("BAIT_PREY", "embeddings/s", slice(3, 7)), ARRAYS["s"][3:7], rtol=1e-3)
+    assert store.read("BAIT_PREY", "embeddings/empty_rows", slice(0, 2)).shape == (0, 4)
+    assert store.read("BAIT_PREY", "embeddings/empty_columns", slice(1, 3)).shape == (2, 0)
@@ -0,0 +1,76 @@
+import numpy as np
+
+import interface_scores
+
+CIF_HEADER = """data_test
+#
+loop_
+_atom_site.group_PDB
+_atom_site.id
+_atom_site.label_atom_id
+_atom_site.label_comp_id
+_atom_site.label_asym_id
+_atom_site.label_seq_id
+_atom_site.Cartn_x
+_atom_site.Cartn_y
+_atom_site.Cartn_z
+_atom_site.B_iso_or_equiv
+_atom_site.auth_seq_id
+_atom_site.auth_asym_id
+_atom_site.pdbx_PDB_model_num
+"""
+
+
+def brute_force_contacts(coords, chain_index, cutoff):
+    pairs = set()
+    for i in range(len(coords)):
+        for j in range(i + 1, len(coords)):
+            if chain_index[i] != chain_index[j] and np.sum((coords[i] - coords[j]) ** 2) <= cutoff * cutoff:
+                pairs.add((i, j))
+    return pairs
+
+
+def test_cell_list_matches_brute_force():
+    rng = np.random.default_rng(0)
+    coords = rng.uniform(-20, 20, size=(300, 3))
+    chain_index = rng.integers(0, 3, size=300)
+    i, j = interface_scores.find_interchain_contacts(coords, chain_index, 8.0)
+    found = {(min(a, b), max(a, b)) for a, b in zip(i.tolist(), j.tolist())}
+    assert len(found) == len(i)
+    assert found == brute_force_contacts(coords, chain_index, 8.0)
+
+
+def test_parse_cif_reads_first_model(tmp_path):
+    path = tmp_path / "x_model.cif"
+    path.write_text(CIF_HEADER + "\n".join([
+        "ATOM 1 CB ALA A 1 0.0 0.0 0.0 90.0 1 A 1",
+        "ATOM 2 CB ALA B 1 4.0 0.0 0.0 80.0 1 B 1",
+        "HETATM 3 C1 LIG C . 50.0 0.0 0.0 70.0 7 C 1",
+        "ATOM 4 CB ALA A 1 9.0 9.0 9.0 10.0 1 A 2",
+    ]) + "\n#\n")
+    atoms = interface_scores.parse_cif_atoms(str(path))
+    assert atoms == [
+        ("A", "1", "ALA", "CB", 0.0, 0.0, 0.0, 90.0),
+        ("B", "1", "ALA", "CB", 4.0, 0.0, 0.0, 80.0),
+        ("C", "7", "LIG", "C1", 50.0, 0.0, 0.0, 70.0),
+    ]
+
+    scores = interface_scores.score_model(str(path))
+    assert scores["num_chains"] == 3
+    assert scores["num_contacts"] == 1
+    assert scores["interface_residues"] == 2
+    assert scores["interface_plddt"] == 85.0
+
+
+def test_join_ranked_keeps_the_score_last(tmp_path):
+    ranked = tmp_path / "ranked.tsv"
+    ranked.write_text("foldid\tiptm\tranking_score\nA_B_summary_confidences\t0.8\t0.9\nA_C_summary_confidences\t0.1\t0.2\n")
+    scores = [{"model": "folds/a_b/A_B_model.cif", "num_chains": 2, "num_contacts": 5, "interface_residues": 6,
+               "interface_plddt": 80.0, "pdockq": 0.5}]
+    output = tmp_path / "joined.tsv"
+    interface_scores.join_ranked(scores, str(ranked), str(output), "alphafold3")
+
+    lines = [line.split("\t") for line in output.read_text().splitlines()]
+    assert lines[0] == ["foldid", "iptm"] + interface_scores.SCORE_HEADERS + ["ranking_score"]
+    assert lines[1] == ["A_B_summary_confidences", "0.8", "2", "5", "6", "80.0", "0.5", "0.9"]
+    assert lines[2] == ["A_C_summary_confidences", "0.1", "", "", "", "", "", "0.2"]
@@ -0,0 +1,116 @@
+import io
+import json
+import sys
+import tarfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "benchmarks"))
+
+import msa_broker  # noqa: E402
+import servers  # noqa: E402
+
+BAIT = "MKTAYIAKQRQISFVKSHFSRQ"
+PREYS = ["MSEQNNTEMTFQIQRIYTKDI", "MGSSHHHHHHSSGLVPRGSHM", "MDKKYSIGLDIGTNSVGWAVI", "MAHHHHHHVDDDDKMLE"]
+
+
+@pytest.fixture
+def broker(tmp_path):
+    upstream = servers.start_msa_server(delay=0.05)
+    broker = msa_broker.MSABroker(servers.url(upstream), str(tmp_path / "cache"), 1 << 30, max_concurrent=2,
+                                  poll_interval=0.02)
+    handler = type("Handler", (msa_broker.BrokerHandler,), {"broker": broker})
+    server = msa_broker.BrokerServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield broker, servers.url(server), upstream.RequestHandlerClass
+    server.shutdown()
+    upstream.shutdown()
+
+
+def fetch(url, form=None):
+    data = urllib.parse.urlencode(form).encode() if form is not None else None
+    with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=10) as response:
+        return response.read()
+
+
+def run_query(url, query):
+    """Submit a query and poll it like the ColabFold client, returning the files of the result."""
+    ticket = json.loads(fetch(f"{url}/ticket/msa", {"q": query, "mode": "env"}))
+    deadline = time.time() + 10
+    while ticket["status"] != "COMPLETE":
+        assert ticket["status"] in ("PENDING", "RUNNING") and time.time() < deadline
+        time.sleep(0.02)
+        ticket = json.loads(fetch(f"{url}/ticket/{ticket['id']}"))
+    with tarfile.open(fileobj=io.BytesIO(fetch(f"{url}/result/download/{ticket['id']}"))) as tar:
+        return {member.name: tar.extractfile(member).read().decode() for member in tar.getmembers()}
+
+
+def test_shared_bait_is_searched_once(broker):
+    broker, url, upstream = broker
+    results = {}
+
+    def client(prey):
+        results[prey] = run_query(url, f">101\n{BAIT}\n>102\n{prey}\n")
+
+    threads = [threading.Thread(target=client, args=(prey,)) for prey in PREYS]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # One upstream job per unique sequence, not per pair
+    queries = sorted(query for _, query in upstream.submissions)
+    assert queries == sorted(f">101\n{seq}\n" for seq in [BAIT] + PREYS)
+    assert broker.stats["hits"] + broker.stats["coalesced"] == len(PREYS) - 1
+
+    for prey, files in results.items():
+        # The combined result is the result the upstream server gives for the whole query
+        expected = servers.MSAServerHandler.result(f">101\n{BAIT}\n>102\n{prey}\n")
+        with tarfile.open(fileobj=io.BytesIO(expected)) as tar:
+            expected_files = {member.name: tar.extractfile(member).read().decode() for member in tar.getmembers()}
+        assert files == expected_files
+
+
+def test_cached_sequences_are_not_resubmitted(broker):
+    broker, url, upstream = broker
+    run_query(url, f">101\n{BAIT}\n>102\n{PREYS[0]}\n")
+    run_query(url, f">101\n{PREYS[0]}\n>102\n{BAIT}\n")
+    assert len(upstream.submissions) == 2
+    assert broker.stats["hits"] == 2
+
+
+def test_lru_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(msa_broker, "EVICTION_GRACE_SECONDS", 0)
+    broker = msa_broker.MSABroker("http://127.0.0.1:1", str(tmp_path), max_cache_bytes=250, max_concurrent=1)
+    for key in ["a" * 64, "b" * 64]:
+        tmp = tmp_path / f"{key}.tmp"
+        tmp.write_bytes(b"x" * 100)
+        broker.add_to_cache(key, tmp)
+    # Using a makes b the least recently used entry
+    assert broker.lookup("a" * 64)
+    tmp = tmp_path / "c.tmp"
+    tmp.write_bytes(b"x" * 100)
+    broker.add_to_cache("c" * 64, tmp)
+
+    assert list(broker.cache_index) == ["a" * 64, "c" * 64]
+    assert not broker.cache_path("b" * 64).exists()
+    assert broker.stats["evictions"] == 1
+
+
+def test_unreachable_upstream_returns_502(tmp_path):
+    broker = msa_broker.MSABroker("http://127.0.0.1:1", str(tmp_path), 1 << 20, max_concurrent=1, timeout=1)
+    handler = type("Handler", (msa_broker.BrokerHandler,), {"broker": broker})
+    server = msa_broker.BrokerServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            fetch(f"{servers.url(server)}/template/abc")
+        assert error.value.code == 502
+    finally:
+        server.shutdown()
@@ -0,0 +1,20 @@
+import itertools
+
+import pytest
+
+pytest.importorskip("rdkit")
+
+from prepare_ligand_cache import CODE_ALPHABET, ligand_code  # noqa: E402
+
+
+def test_taken_codes_are_probed():
+    code = ligand_code("CCO", {})
+    assert code.startswith("Z") and len(code) == 5
+    assert ligand_code("CCO", {code: "CCO"}) == code
+    assert ligand_code("CCO", {code: None}) not in (code, None)
+
+
+def test_full_code_space_raises():
+    taken = {"Z" + "".join(chars): None for chars in itertools.product(CODE_ALPHABET, repeat=4)}
+    with pytest.raises(ValueError):
+        ligand_code("CCO", taken)
@@ -0,0 +1,74 @@
+import pytest
+
+from reconcile import MAX_GPU_TIER, classify, gpu_tier, group_pairs, regenerated
+
+
+def task(process="AF3_FOLD", status="FAILED", exit_code="1", attempt="1", workdir=None, queue="gpu"):
+    return {"process": process, "status": status, "exit": exit_code, "attempt": attempt,
+            "workdir": str(workdir) if workdir else "", "queue": queue}
+
+
+def record(bait, prey, tier=1, key=None):
+    return {"key": key or f"{bait}_{prey}".lower(), "bait_entry": bait, "prey_entry": prey, "gpu_tier": tier}
+
+
+def test_classify_without_trace_or_attempts():
+    assert classify(None, traced=False)["reason"] == "unknown"
+    assert classify(None, traced=True)["reason"] == "not_run"
+    # Only the MSA ran, and it completed
+    assert classify([task("AF3_MSA", "COMPLETED", "0")], traced=True)["reason"] == "not_run"
+
+
+def test_classify_msa_failure(tmp_path):
+    result = classify([task("AF3_MSA", exit_code="1"), task("AF3_MSA", exit_code="1", attempt="2")], traced=True)
+    assert result == {"reason": "msa_failure", "process": "AF3_MSA", "attempts": 2, "exit": "1"}
+
+    # A fold that failed on the MSA server is an MSA failure too
+    (tmp_path / ".command.err").write_text("Exception: MMseqs2 API is giving errors\n")
+    result = classify([task("BOLTZ_PREDICT", workdir=tmp_path)], traced=True)
+    assert result["reason"] == "msa_failure"
+    assert result["process"] == "BOLTZ_PREDICT"
+
+
+def test_classify_oom_escalates_the_tier():
+    attempts = [task(exit_code="137"), task(exit_code="137", attempt="2")]
+    result = dict(classify(attempts, traced=True))
+    assert result == {"reason": "oom", "process": "AF3_FOLD", "attempts": 2, "exit": "137"}
+    assert gpu_tier(result) == 3
+
+
+def test_classify_missing_output():
+    attempts = [task(exit_code="140"), task(status="COMPLETED", exit_code="0", attempt="2")]
+    assert classify(attempts, traced=True)["reason"] == "missing_output"
+    assert gpu_tier(classify(attempts, traced=True)) == 1
+
+
+@pytest.mark.parametrize("reason, attempts, tier", [
+    ("oom", 1, 2), ("cuda_oom", 2, 3), ("timeout", 3, MAX_GPU_TIER), ("oom", 10, MAX_GPU_TIER),
+    ("error", 3, 1), ("preempted", 2, 1), ("not_run", 0, 1),
+])
+def test_gpu_tier_is_capped(reason, attempts, tier):
+    assert gpu_tier({"reason": reason, "attempts": attempts}) == tier
+
+
+def test_group_pairs_shares_files_only_for_equal_preys():
+    records = [record("B1", "P1"), record("B1", "P2"), record("B2", "P2"), record("B2", "P1"),
+               record("B3", "P1"), record("B1", "P3", tier=2)]
+    groups = group_pairs(records)
+
+    assert groups == {
+        "tier1_1": {"gpu_tier": 1, "baits": ["B3"], "preys": ["P1"]},
+        "tier1_2": {"gpu_tier": 1, "baits": ["B1", "B2"], "preys": ["P1", "P2"]},
+        "tier2_1": {"gpu_tier": 2, "baits": ["B1"], "preys": ["P3"]},
+    }
+    assert [item["group"] for item in records] == ["tier1_2", "tier1_2", "tier1_2", "tier1_2", "tier1_1", "tier2_1"]
+
+
+def test_windowed_prey_is_regenerated_as_a_whole():
+    # Only the second window of P1 is missing, but its accession file writes every window
+    combinations = {key: record("B1", "P1", key=key) for key in ["b1_p1__w1-400", "b1_p1__w201-600", "b1_p1__w401-800"]}
+    combinations["b1_p2"] = record("B1", "P2")
+    missing = [record("B1", "P1", key="b1_p1__w201-600")]
+
+    groups = group_pairs(missing)
+    assert regenerated(groups["tier1_1"], combinations) == 3
@@ -0,0 +1,19 @@
+import pytest
+
+from screen import bait_flag, foldid_key, pair_key, split_window
+
+
+@pytest.mark.parametrize("value, flag", [("1", 1), ("0", 0), ("1.0", 1), ("0.0", 0), (" 0 ", 0), (1, 1)])
+def test_bait_flag_matches_tsv2json(value, flag):
+    assert bait_flag(value) == flag
+
+
+def test_split_window():
+    assert split_window("BAIT_PREY__w1-400") == ("BAIT_PREY", "1-400")
+    assert split_window("bait_prey__w201-600_summary_confidences") == ("bait_prey_summary_confidences", "201-600")
+    assert split_window("BAIT_PREY") == ("BAIT_PREY", "")
+
+
+def test_keys_of_all_engines_compare_equal():
+    assert foldid_key("BAIT_PREY__w1-400_summary_confidences") == "bait_prey__w1-400"
+    assert pair_key("BAIT_PREY__w1-400_summary_confidences") == pair_key("bait_prey__w201-600") == "bait_prey"
@@ -0,0 +1,82 @@
+import json
+import pstats
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from tool_metrics import Metrics, peak_rss_mb, profiled
+
+BIN_DIR = Path(__file__).resolve().parents[1] / "bin"
+
+
+def test_nested_and_repeated_phases_accumulate():
+    metrics = Metrics("test")
+    for _ in range(3):
+        with metrics.phase("outer"):
+            with metrics.phase("inner"):
+                time.sleep(0.01)
+    with pytest.raises(ValueError):
+        with metrics.phase("inner"):
+            raise ValueError("counted anyway")
+
+    assert metrics.phases["outer"]["calls"] == 3
+    assert metrics.phases["inner"]["calls"] == 4
+    # The time of a nested phase is also counted in its parent
+    assert metrics.phases["outer"]["wall_s"] >= 0.03
+    assert metrics.phases["outer"]["wall_s"] >= metrics.phases["inner"]["wall_s"] - 0.005
+
+
+def test_count():
+    metrics = Metrics("test")
+    metrics.count("files")
+    metrics.count("files")
+    metrics.count("bytes", 100)
+    assert metrics.counters == {"files": 2, "bytes": 100}
+
+
+def test_write_schema(tmp_path):
+    metrics = Metrics("test")
+    with metrics.phase("parse"):
+        metrics.count("zeta", 2)
+        metrics.count("alpha")
+    metrics.write(tmp_path / "metrics.json")
+
+    data = json.loads((tmp_path / "metrics.json").read_text())
+    assert set(data) == {"tool", "started", "argv", "python", "wall_s", "cpu_s", "peak_rss_mb", "phases", "counters"}
+    assert data["tool"] == "test"
+    assert set(data["phases"]["parse"]) == {"wall_s", "cpu_s", "calls"}
+    assert list(data["counters"]) == ["alpha", "zeta"]
+    assert data["peak_rss_mb"] > 0
+
+
+def test_peak_rss_grows_with_allocations():
+    before = peak_rss_mb()
+    block = bytearray(64 << 20)
+    block[::4096] = b"x" * len(block[::4096])
+    assert peak_rss_mb() >= before
+    assert peak_rss_mb() > 32
+
+
+def test_profiled_dumps_stats(tmp_path):
+    with profiled(tmp_path / "run.prof"):
+        sum(range(1000))
+    assert pstats.Stats(str(tmp_path / "run.prof")).total_calls > 0
+    with profiled(None):
+        pass
+
+
+def test_metrics_written_when_the_run_fails(tmp_path):
+    # No bait in the accession file makes tsv2json.py fail after it started
+    (tmp_path / "acclist.tsv").write_text("Entry\tBait\nP00001\t0\n")
+    result = subprocess.run([sys.executable, str(BIN_DIR / "tsv2json.py"), str(tmp_path / "acclist.tsv"),
+                             "--output-dir", str(tmp_path / "out"), "--metrics", str(tmp_path / "metrics.json")],
+                            capture_output=True, text=True)
+    assert result.returncode != 0
+    data = json.loads((tmp_path / "metrics.json").read_text())
+    assert data["tool"] == "tsv2json"
+    # With the phases completed before the error
+    assert data["phases"]["read_tsv"]["calls"] == 1
+    assert data["counters"] == {"tsv_rows": 1}
@@ -0,0 +1,19 @@
+from trace_report import task_inputs
+
+
+def test_worker_attempts_use_their_claimed_jobs(tmp_path):
+    queue_file = tmp_path / "queue" / "done" / "BAIT_P1.fasta"
+    queue_file.parent.mkdir(parents=True)
+    queue_file.write_text(">A|protein\nMKV\n")
+    workdir = tmp_path / "work"
+    workdir.mkdir()
+    (workdir / "claimed.tsv").write_text(
+        "foldid\tstatus\tinput\n"
+        f"BAIT_P0\trestored\t{tmp_path}/queue/done/BAIT_P0.fasta\n"
+        f"BAIT_P1\trunning\t{tmp_path}/queue/running/worker_1/BAIT_P1.fasta\n"
+        f"BAIT_P2\trunning\t{tmp_path}/queue/running/worker_1/BAIT_P2.fasta\n"
+        f"BAIT_P1\tdone\t{queue_file}\n"
+    )
+    # Another worker's outputs in the shared queue are not attributed to this attempt
+    inputs = task_inputs({"process": "BOLTZ_WORKER", "workdir": str(workdir), "tag": "worker 1"})
+    assert inputs == [("bait_p1", queue_file), ("bait_p2", None)]
@@ -0,0 +1,46 @@
+import sqlite3
+
+import pytest
+
+from tsv2json import TSV2AFConverter
+
+
+def manifest_record(foldid):
+    return {"foldid": foldid, "key": foldid.lower(), "bait_entry": "BAIT", "prey_entry": foldid.split("_")[1],
+            "output_path": f"./{foldid}.fasta"}
+
+
+def test_manifest_replaces_earlier_runs(tmp_path):
+    manifest = tmp_path / "combinations_1_of_1.sqlite"
+    converter = TSV2AFConverter()
+    converter.combination_records = [manifest_record("BAIT_P1"), manifest_record("BAIT_P2")]
+    converter.write_manifest(manifest, "boltz", (1, 1))
+
+    converter.combination_records = [manifest_record("BAIT_P3")]
+    converter.write_manifest(manifest, "boltz", (1, 1), "boltz/preprocessing")
+
+    with sqlite3.connect(manifest) as conn:
+        rows = conn.execute("SELECT key, shard, output_path FROM combinations").fetchall()
+    conn.close()
+    assert rows == [("bait_p3", "1/1", "boltz/preprocessing/BAIT_P3.fasta")]
+    assert not (tmp_path / "combinations_1_of_1.sqlite.tmp").exists()
+
+
+def test_manifest_rejects_foldids_differing_by_case(tmp_path):
+    manifest = tmp_path / "combinations_1_of_1.sqlite"
+    converter = TSV2AFConverter()
+    converter.combination_records = [manifest_record("BAIT_AbcA"), manifest_record("BAIT_abcA")]
+    with pytest.raises(ValueError, match="BAIT_AbcA and BAIT_abcA"):
+        converter.write_manifest(manifest, "boltz", (1, 1))
+    assert not manifest.exists()
+
+
+def test_manifest_keeps_the_last_record_of_a_repeated_output(tmp_path):
+    manifest = tmp_path / "combinations_1_of_1.sqlite"
+    converter = TSV2AFConverter()
+    converter.combination_records = [manifest_record("BAIT_P1"), dict(manifest_record("BAIT_P1"), prey_entry="P1b")]
+    converter.write_manifest(manifest, "boltz", (1, 1))
+    with sqlite3.connect(manifest) as conn:
+        rows = conn.execute("SELECT key, prey_entry FROM combinations").fetchall()
+    conn.close()
+    assert rows == [("bait_p1", "P1b")]
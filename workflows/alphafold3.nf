@@ -4,10 +4,14 @@
 ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 */
 
-include { PROCESS_TSV       } from '../modules/process_tsv'
+include { PREPROCESS        } from './preprocess'
 include { AF3_MSA           } from '../modules/af3_msa'
+include { AF3_MSA_STORE     } from '../modules/af3_msa_store'
 include { AF3_FOLD          } from '../modules/af3_fold'
 include { RANK_AF           } from '../modules/rank_af'
+include { INTERFACE_SCORES  } from '../modules/interface_scores'
+include { EXPAND_CLUSTERS   } from '../modules/cluster_preys'
+include { EMBEDDING_STORE   } from '../modules/embedding_store'
 
 /*
 ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -22,8 +26,8 @@ workflow ALPHAFOLD3 {
 
     main:
 
-    PROCESS_TSV (accession_file, 'alphafold3')
-    ch_json_raw = PROCESS_TSV.out.processed_tsv_output.flatten()
+    PREPROCESS (accession_file, 'alphafold3', [])
+    ch_json_raw = PREPROCESS.out.inputs
 
     AF3_MSA (
         ch_json_raw,
@@ -31,6 +35,11 @@ workflow ALPHAFOLD3 {
     )
     msa_json = AF3_MSA.out.af3_json_processed
 
+    // Publish deduplicated MSA blocks instead of a full copy per pair
+    if (params.msa_store) {
+        AF3_MSA_STORE (msa_json.collect())
+    }
+
     ch_msa_json = msa_json
         .collate( params.inf_batch )
 
@@ -41,8 +50,31 @@ workflow ALPHAFOLD3 {
     )
     ch_json_confidence = AF3_FOLD.out.summary_json.collect()
 
+    // Pack embeddings and distograms into one compressed store instead of publishing the npz files
+    if (params.embedding_store) {
+        EMBEDDING_STORE (AF3_FOLD.out.arrays.collect())
+    }
+
     RANK_AF (
         ch_json_confidence,
+        PREPROCESS.out.combinations,
         'alphafold3'
     )
+
+    // Second round accession files with the members of clusters whose representative scored high
+    if (params.cluster_identity) {
+        EXPAND_CLUSTERS (
+            accession_file,
+            PREPROCESS.out.clusters,
+            RANK_AF.out.tsv
+        )
+    }
+
+    if (params.interface_analysis) {
+        INTERFACE_SCORES (
+            AF3_FOLD.out.model.collect(),
+            RANK_AF.out.tsv,
+            'alphafold3'
+        )
+    }
 }
@@ -4,10 +4,18 @@
 ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 */
 
-include { PROCESS_TSV           } from '../modules/process_tsv'
+include { PREPROCESS            } from './preprocess'
 include { PREPARE_BOLTZ_CACHE   } from '../modules/prepare_boltz_cache'
+include { PREPARE_LIGAND_CACHE  } from '../modules/prepare_ligand_cache'
 include { BOLTZ_PREDICT         } from '../modules/boltz_predict'
+include { BOLTZ_PREDICT as BOLTZ_PREDICT_FAILED } from '../modules/boltz_predict'
+include { BOLTZ_ENQUEUE         } from '../modules/boltz_worker'
+include { BOLTZ_WORKER          } from '../modules/boltz_worker'
 include { RANK_AF               } from '../modules/rank_af'
+include { INTERFACE_SCORES      } from '../modules/interface_scores'
+include { EXPAND_CLUSTERS       } from '../modules/cluster_preys'
+include { CASCADE_PLAN          } from '../modules/cascade_plan'
+include { EMBEDDING_STORE       } from '../modules/embedding_store'
 
 workflow BOLTZ {
     take:
@@ -16,19 +24,82 @@ workflow BOLTZ {
 
     main:
 
-    PROCESS_TSV(ch_input, 'boltz')
-    ch_fasta = PROCESS_TSV.out.processed_tsv_output.flatten()
-
     PREPARE_BOLTZ_CACHE(boltz_model)
     boltz_cache = PREPARE_BOLTZ_CACHE.out.cache
+
+    // Conformers of SMILES ligands are generated once and read from the mols directory (Boltz2 only)
+    ligand_index = []
+    if (params.ligand_cache && params.model != 'boltz1') {
+        PREPARE_LIGAND_CACHE(ch_input, boltz_cache)
+        boltz_cache = PREPARE_LIGAND_CACHE.out.cache.first()
+        ligand_index = PREPARE_LIGAND_CACHE.out.index.first()
+    }
+
+    PREPROCESS(ch_input, 'boltz', ligand_index)
+    ch_fasta = PREPROCESS.out.inputs
     
-    BOLTZ_PREDICT (
-        ch_fasta.collate( params.inf_batch ),
-        boltz_cache
-    )
+    if (params.boltz_workers) {
+        // Long-lived workers load the model once and share a queue of inputs outside the work directory
+        def queue = file(params.boltz_queue ?: "${params.outdir}/${params.mode}/worker_queue").toString()
+        BOLTZ_ENQUEUE (ch_fasta.collect(), queue)
+        BOLTZ_WORKER (
+            BOLTZ_ENQUEUE.out.jobs,
+            queue,
+            boltz_cache,
+            1..params.boltz_workers
+        )
+        // Inputs that failed in a worker are predicted again in batches on the next GPU tier
+        BOLTZ_PREDICT_FAILED (
+            BOLTZ_WORKER.out.failed.flatten().collate( params.inf_batch ),
+            boltz_cache
+        )
+        ch_confidence_json = BOLTZ_WORKER.out.confidence_json.mix(BOLTZ_PREDICT_FAILED.out.confidence_json)
+        ch_model = BOLTZ_WORKER.out.model.mix(BOLTZ_PREDICT_FAILED.out.model)
+        ch_arrays = BOLTZ_WORKER.out.arrays.mix(BOLTZ_PREDICT_FAILED.out.arrays)
+    } else {
+        BOLTZ_PREDICT (
+            ch_fasta.collate( params.inf_batch ),
+            boltz_cache
+        )
+        ch_confidence_json = BOLTZ_PREDICT.out.confidence_json
+        ch_model = BOLTZ_PREDICT.out.model
+        ch_arrays = BOLTZ_PREDICT.out.arrays
+    }
+
+    // Pack the embeddings into one compressed store instead of publishing the npz files
+    if (params.embedding_store) {
+        EMBEDDING_STORE (ch_arrays.collect())
+    }
 
     RANK_AF (
-        BOLTZ_PREDICT.out.confidence_json.collect(),
+        ch_confidence_json.collect(),
+        PREPROCESS.out.combinations,
         'boltz'
     )
+
+    // Second round accession files with the members of clusters whose representative scored high
+    if (params.cluster_identity) {
+        EXPAND_CLUSTERS (
+            ch_input,
+            PREPROCESS.out.clusters,
+            RANK_AF.out.tsv
+        )
+    }
+
+    // Reduced accession files for the next, more expensive engine
+    if (params.cascade) {
+        CASCADE_PLAN (
+            ch_input,
+            RANK_AF.out.tsv,
+            'boltz'
+        )
+    }
+
+    if (params.interface_analysis) {
+        INTERFACE_SCORES (
+            ch_model.collect(),
+            RANK_AF.out.tsv,
+            'boltz'
+        )
+    }
 }
\ No newline at end of file
@@ -7,8 +7,11 @@
 include { COLABFOLD_BATCH                       } from '../modules/colabfold_batch'
 include { COLABFOLD_BATCH as COLABFOLD_BATCH_TOP} from '../modules/colabfold_batch'
 include { PREPARE_COLABFOLD_CACHE               } from '../modules/prepare_colabfold_cache'
-include { PROCESS_TSV                           } from '../modules/process_tsv'
+include { PREPROCESS                            } from './preprocess'
 include { RANK_AF                               } from '../modules/rank_af'
+include { INTERFACE_SCORES                      } from '../modules/interface_scores'
+include { EXPAND_CLUSTERS                       } from '../modules/cluster_preys'
+include { CASCADE_PLAN                          } from '../modules/cascade_plan'
 
 
 workflow COLABFOLD {
@@ -21,9 +24,8 @@ workflow COLABFOLD {
     //
     // Create input channel from input file provided through params.input
     //
-    PROCESS_TSV(accession_file, 'colabfold')
-    ch_fasta = PROCESS_TSV.out.processed_tsv_output
-        .flatten()
+    PREPROCESS(accession_file, 'colabfold', [])
+    ch_fasta = PREPROCESS.out.inputs
         .map { tuple(it.getBaseName(), it) }
 
     PREPARE_COLABFOLD_CACHE()
@@ -38,22 +40,52 @@ workflow COLABFOLD {
 
     RANK_AF(
         COLABFOLD_BATCH.out.json.collect(),
+        PREPROCESS.out.combinations,
         'colabfold'
         )
     ch_ranked = RANK_AF.out.tsv
 
+    // Second round accession files with the members of clusters whose representative scored high
+    if (params.cluster_identity) {
+        EXPAND_CLUSTERS (
+            accession_file,
+            PREPROCESS.out.clusters,
+            ch_ranked
+        )
+    }
+
+    // Reduced accession files for the next, more expensive engine
+    if (params.cascade) {
+        CASCADE_PLAN (
+            accession_file,
+            ch_ranked,
+            'colabfold'
+        )
+    }
+
+    if (params.interface_analysis) {
+        INTERFACE_SCORES(
+            COLABFOLD_BATCH.out.model.collect(),
+            ch_ranked,
+            'colabfold'
+            )
+    }
+
     if (params.top_rank) {        
 
         ch_ranked_fasta = ch_ranked
             .splitCsv(header: true, sep: "\t", limit: params.top_rank)
-            .map { tuple(it.foldid) }
+            .map { tuple(it.window_foldid ?: it.foldid) }
 
-        // Filter ch_fasta based on ch_ranked_fasta
-        ch_filtered_fasta = ch_fasta
+        // Filter ch_fasta based on ch_ranked_fasta and reuse the screen MSA when there is one
+        ch_top_query = ch_fasta
             .join(ch_ranked_fasta)
+            .join(COLABFOLD_BATCH.out.a3m, remainder: true)
+            .filter { accID, fasta, a3m -> fasta != null }
+            .map { accID, fasta, a3m -> tuple(accID, a3m ?: fasta) }
         
         COLABFOLD_BATCH_TOP(
-            ch_filtered_fasta,
+            ch_top_query,
             colabfold_cache,
             20,
             "toprank"
@@ -0,0 +1,68 @@
+/*
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    IMPORT FUNCTIONS / MODULES / WORKFLOWS
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+*/
+
+include { PREFETCH_SEQUENCES    } from '../modules/prefetch_sequences'
+include { PROCESS_TSV           } from '../modules/process_tsv'
+include { CHECK_SHARDS          } from '../modules/check_shards'
+include { CLUSTER_PREYS         } from '../modules/cluster_preys'
+
+/*
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+    WORKFLOW
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+*/
+workflow PREPROCESS {
+    take:
+    accession_file
+    mode
+    ligand_index    // prepare_ligand_cache.py index, [] if not used
+
+    main:
+
+    // Resolve UniProt sequences once so the shards do not query UniProt again
+    PREFETCH_SEQUENCES (accession_file)
+
+    // Fold only cluster representatives of redundant preys in the first round
+    ch_clusters = Channel.empty()
+    ch_accession = accession_file
+    if (params.cluster_identity) {
+        CLUSTER_PREYS (
+            accession_file,
+            PREFETCH_SEQUENCES.out.cache
+        )
+        ch_accession = CLUSTER_PREYS.out.acc_file
+        ch_clusters = CLUSTER_PREYS.out.clusters
+    }
+
+    num_shards = params.shards ?: 1
+
+    PROCESS_TSV (
+        ch_accession,
+        PREFETCH_SEQUENCES.out.cache,
+        ligand_index,
+        mode,
+        num_shards,
+        1..num_shards
+    )
+
+    // Every combination must be written by exactly one shard
+    CHECK_SHARDS (
+        ch_accession,
+        PROCESS_TSV.out.manifest.collect(),
+        num_shards
+    )
+
+    // Folding starts only once the shard check passed
+    ch_inputs = PROCESS_TSV.out.processed_tsv_output
+        .flatten()
+        .combine(CHECK_SHARDS.out.report)
+        .map { input, report -> input }
+
+    emit:
+    inputs       = ch_inputs
+    clusters     = ch_clusters
+    combinations = PROCESS_TSV.out.combinations.collect()  // SQLite combination manifests of all shards
+}